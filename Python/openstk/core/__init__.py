@@ -1,27 +1,33 @@
 from openstk.core.poly.find import findType
 import openstk.core.poly.log as log
 from openstk.core.poly.poly import Byte2, Int2, Byte3, Int3, Float3, Float4
-from openstk.core.poly.pool import parallelFor, AsyncCoroutineQueue, CoroutineQueue, IGenericPool, GenericPool, SinglePool, StaticPool
-from openstk.core.poly.reader import BinaryReader
+from openstk.core.poly.pool import CancellationToken, parallelIter, parallelFor, CoroutineQueueBase, AsyncCoroutineQueue, CoroutineQueue, IGenericPool, PoolLease, GenericPool, SinglePool, StaticPool
+from openstk.core.poly.reader import BinaryReader, MemoryReader, StructView
+from openstk.core.poly.schema import Schema, schema
 from openstk.core.poly.system import getExtrema, changeRange
 import openstk.core.poly.unsafe as unsafe
 from openstk.core.poly.writer import Writer
+from openstk.core.cache import DiskCache
 from openstk.core.core import ISource, IHaveSource, IStream, IWriteToStream, X_LumpON, X_LumpNO, X_LumpNO2, X_Lump2NO
-from openstk.core.manager import IDatabase, ICellDatabase, CellManager, CellBuilder
+from openstk.core.manager import IDatabase, ICellDatabase, CellManager, CachedQuery, CellPrefetcher, CellBuilder
 from openstk.core.platform import Platform, PlatformX
+from openstk.core.profiler import Histogram, Span, Metrics
 from openstk.core.stream import StreamIterators, ForwardStream, SeekableStream
 from openstk.core.util import _throw, _pathExtension, _pathTempFile, decodePath, _int_tryParse, YamlDict
 __all__ = [
     'findType',
     'log',
     'Byte2', 'Int2', 'Byte3', 'Int3', 'Float3', 'Float4',
-    'parallelFor', 'AsyncCoroutineQueue', 'CoroutineQueue', 'IGenericPool', 'GenericPool', 'SinglePool', 'StaticPool',
-    'BinaryReader',
+    'CancellationToken', 'parallelIter', 'parallelFor', 'CoroutineQueueBase', 'AsyncCoroutineQueue', 'CoroutineQueue', 'IGenericPool', 'PoolLease', 'GenericPool', 'SinglePool', 'StaticPool',
+    'BinaryReader', 'MemoryReader', 'StructView',
+    'Schema', 'schema',
     'getExtrema', 'changeRange',
     'unsafe',
     'Writer',
+    'DiskCache',
     'ISource', 'IHaveSource', 'IStream', 'IWriteToStream', 'X_LumpON', 'X_LumpNO', 'X_LumpNO2', 'X_Lump2NO',
-    'IDatabase', 'ICellDatabase', 'CellManager', 'CellBuilder',
+    'IDatabase', 'ICellDatabase', 'CellManager', 'CachedQuery', 'CellPrefetcher', 'CellBuilder',
     'Platform', 'PlatformX',
+    'Histogram', 'Span', 'Metrics',
     'StreamIterators', 'ForwardStream', 'SeekableStream',
     '_throw', '_pathExtension', '_pathTempFile', 'decodePath', '_int_tryParse', 'YamlDict']
@@ -0,0 +1,85 @@
+from __future__ import annotations
+import os, json, mmap, hashlib, tempfile
+from struct import Struct, error as StructError
+
+# DiskCache - optional persistent cache of decoded assets. Each entry is one memory-mappable file: a header, the entry key, json meta and
+# the 16-aligned payload. Files are named by a hash of the kind, the archive's path, mtime and size, the asset path and the converter
+# version; entries are validated lazily when read, and stale or corrupt ones are misses overwritten by the next put. current is the
+# process wide cache, set by configure() or from the OPENSTK_CACHE directory
+class DiskCache:
+    MAGIC = 0x4354534F # OSTC
+    VERSION = 1
+    _header = Struct('<4IQ') # magic, version, keyLength, metaLength, dataLength
+    current: DiskCache = None
+
+    def __init__(self, path: str, version: str = ''):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.version = version
+        self.hits = 0; self.misses = 0
+        os.makedirs(self.path, exist_ok=True)
+    def __repr__(self): return f'DiskCache({self.path}, hits={self.hits}, misses={self.misses})'
+
+    @staticmethod
+    def configure(path: str, version: str = '') -> DiskCache: DiskCache.current = DiskCache(path, version) if path else None; return DiskCache.current
+
+    # the archive file an asset source reads from, which its entries are validated against
+    @staticmethod
+    def archiveOf(source: object) -> str:
+        for s in ('pakPath', 'filePath', 'path'):
+            if isinstance(z := getattr(source, s, None), str): return z
+        return None
+
+    def key(self, archive: str, path: str, kind: str = '', version: str = '') -> str:
+        stat = ''
+        if archive:
+            try: s = os.stat(archive); stat = f'{s.st_mtime_ns}:{s.st_size}'
+            except OSError: pass
+        return f'{kind}|{archive or ''}|{stat}|{path}|{self.version}|{version}'
+
+    def _file(self, key: str) -> str: h = hashlib.sha1(key.encode()).hexdigest(); return os.path.join(self.path, h[:2], f'{h[2:]}.bin')
+
+    def get(self, archive: str, path: str, kind: str = '', version: str = '') -> tuple[dict, memoryview]:
+        key = self.key(archive, path, kind, version)
+        try:
+            with open(self._file(key), 'rb') as f: m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError): self.misses += 1; return None
+        try:
+            magic, ver, keyLength, metaLength, dataLength = self._header.unpack_from(m)
+            o = self._header.size
+            if magic != self.MAGIC or ver != self.VERSION or m[o:o+keyLength] != key.encode(): raise ValueError('stale')
+            o += keyLength; meta = json.loads(m[o:o+metaLength]); o += metaLength; o += -o % 16
+            if o + dataLength != len(m): raise ValueError('truncated')
+        except (ValueError, StructError): m.close(); self.misses += 1; return None
+        self.hits += 1
+        return (meta, memoryview(m)[o:])
+
+    def put(self, archive: str, path: str, data: bytes, meta: dict = None, kind: str = '', version: str = '') -> None:
+        key = self.key(archive, path, kind, version).encode(); metaBytes = json.dumps(meta or {}).encode()
+        file = self._file(key.decode()); dir = os.path.dirname(file); os.makedirs(dir, exist_ok=True)
+        o = self._header.size + len(key) + len(metaBytes)
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._header.pack(self.MAGIC, self.VERSION, len(key), len(metaBytes), memoryview(data).nbytes))
+                f.write(key); f.write(metaBytes); f.write(bytes(-o % 16)); f.write(data)
+            os.replace(tmp, file)
+        except OSError:
+            # best effort: a reader holding the old entry mapped (windows) or a full disk just leaves the entry uncached
+            if os.path.exists(tmp): os.remove(tmp)
+
+    def getOrCreate(self, archive: str, path: str, factory: callable, kind: str = '', version: str = '') -> tuple[dict, memoryview]:
+        if (z := self.get(archive, path, kind, version)): return z
+        meta, data = factory()
+        self.put(archive, path, data, meta, kind, version)
+        return (meta, data)
+
+    def remove(self, archive: str, path: str, kind: str = '', version: str = '') -> None:
+        try: os.remove(self._file(self.key(archive, path, kind, version)))
+        except OSError: pass
+
+    def clear(self) -> None:
+        for root, _, files in os.walk(self.path):
+            for s in files:
+                if s.endswith(('.bin', '.tmp')): os.remove(os.path.join(root, s))
+
+if os.environ.get('OPENSTK_CACHE'): DiskCache.configure(os.environ['OPENSTK_CACHE'])
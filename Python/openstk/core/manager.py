@@ -1,12 +1,14 @@
 from __future__ import annotations
-import os, math
-from numpy import ndarray, array, zeros
+import os, math, asyncio
+from time import perf_counter_ns, monotonic
+from collections import deque
+from numpy import ndarray, array, asarray, zeros, eye, indices, unique, where, float64, int32
 from openstk.core.core import ISource
 from openstk.core.poly.pool import CoroutineQueue
+from openstk.core.profiler import Metrics
 from openstk.core.poly.poly import Int3, Float3, Float4
-from openstk.core.poly.system import getExtrema, changeRange
 import openstk.core.poly.log as log
-from openstk.gfx.gfx import GfX, GfxTerrainLayer, GfxAttach
+from openstk.gfx.gfx import GfX, GfxTerrainLayer, GfxAttach, TerrainLayerManager
 from openstk.sys.drawing import Color
 
 # types
@@ -35,11 +37,13 @@ class ICellDatabase:
 # CellManager
 class CellManager:
     class Cell:
-        def __init__(self, obj: object, objectsObj: object, record: object, task: Enumerator):
+        def __init__(self, obj: object, objectsObj: object, record: object, task: Enumerator, assets: list = None):
             self.obj = obj
             self.objectsObj = objectsObj
             self.record = record
             self.task = task
+            self.assets = assets if assets is not None else []
+            self.streamed: tuple[Int3, int] = None # the center and asset count its textures were last requested for
    
     class CellRef:
         def __init__(self, obj: ICellXref, record: object, modelPath: str):
@@ -88,11 +92,16 @@ class CellManager:
         def setWorld(self, world: int) -> None: pass
         def getCellId(self, point: Vector3) -> Int3: pass
         def findAnyByName(self, name: str) -> object: pass
+        def findAnyByNames(self, names: list[str]) -> list[object]: pass
         def findCell(self, cell: Int3) -> ICell: pass
+        def findCells(self, cells: list[Int3]) -> list[ICell]: pass
         def findCellByName(self, name: str) -> ICell: pass
         def findLand(self, cell: Int3) -> ILand: pass
+        def findLands(self, cells: list[Int3]) -> list[ILand]: pass
         def findLtex(self, index: int) -> ILtex: pass
 
+    unloadMargin: int = 1
+
     def __init__(self, query: IQuery, queue: CoroutineQueue, builder: CellBuilderX):
         self.query: IQuery = query
         self.queue: CoroutineQueue = queue
@@ -100,71 +109,240 @@ class CellManager:
         self.cells: dict[Int3, Cell] = {}
         self.radius: int = query.radius[0]
         self.radius2: int = query.radius[1]
+        self._plan: tuple[Int3, int, int] = None # center, radius, world of the last updateCells
+        self._missing: set[Int3] = set() # in range points without a cell record
+        self._strays: set[Int3] = set() # cells the incremental unload does not visit: begun directly, or of another world
+        self._points: dict[object, Int3] = {} # task: point, to re-prioritize pending loads
+        self.prefetcher: CellPrefetcher = None
 
-    def beginCell(self, point: Int3) -> Cell:
+    def beginCell(self, point: Int3, priority: float = 0) -> Cell:
         record = self.query.findCell(point)
         if not record: return None
-        cell = self.buildCell(record); self.cells[point] = cell
+        cell = self.buildCell(record, priority); self.cells[point] = cell; self._points[cell.task] = point; self._strays.add(point)
         return cell
 
     def beginCellByName(self, name: str) -> Cell:
         record = self.query.findCellByName(name)
         if not record: return None
-        cell = self.buildCell(record); self.cells[Int3.zero] = cell
+        cell = self.buildCell(record); self.cells[Int3.zero] = cell; self._strays.add(Int3.zero)
         return cell
     
+    # the points of square a = (minX, minY, maxX, maxY) outside square b
+    @staticmethod
+    def _squareDiff(a: tuple[int, int, int, int], b: tuple[int, int, int, int] = None) -> Iterator[tuple[int, int]]:
+        minX, minY, maxX, maxY = a
+        for x in range(minX, maxX + 1):
+            if not b or x < b[0] or x > b[2]: yield from ((x, y) for y in range(minY, maxY + 1)); continue
+            yield from ((x, y) for y in range(minY, min(maxY, b[1] - 1) + 1))
+            yield from ((x, y) for y in range(max(minY, b[3] + 1), maxY + 1))
+
+    @staticmethod
+    def _square(point: Int3, r: int) -> tuple[int, int, int, int]: return (point.x - r, point.y - r, point.x + r, point.y + r)
+
+    def findCells(self, points: list[Int3]) -> list[ICell]:
+        f = getattr(self.query, 'findCells', None)
+        return (f(points) if f and points else None) or [self.query.findCell(s) for s in points]
+
+    def findLands(self, points: list[Int3]) -> list[ILand]:
+        f = getattr(self.query, 'findLands', None)
+        return (f(points) if f and points else None) or [self.query.findLand(s) for s in points]
+
+    # Streams cells around position incrementally: crossing a cell boundary only visits the rows and columns entering or leaving range,
+    # plus the cells outside the plan (begun directly, or left from another world), which are checked by distance. Cells load within
+    # radius, nearest first with batched lookups, and only unload past radius + unloadMargin so a player walking along a border does not
+    # thrash.
     async def updateCells(self, position: Vector3, immediate: bool = False, radius: int = -1) -> None:
+        await self._updateCells(position, immediate, radius)
+        self._streamCells()
+        if self.prefetcher: self.prefetcher.update(position)
+
+    async def _updateCells(self, position: Vector3, immediate: bool, radius: int) -> None:
         if radius < 0: radius = self.radius
-        point = self.query.getCellId(position)
-        minX = point.x - radius; maxX = point.x + radius; minY = point.y - radius; maxY = point.y + radius
-
-        # destroy out of range cells
-        outOfRange: list[Int3] = []
-        for s in self.cells.keys():
-            if s.x < minX or s.x > maxX or s.y < minY or s.y > maxY: outOfRange.append(s)
-        for s in outOfRange: self.destroyCell(s)
-
-        # create new cells
-        world = self.query.world
-        for r in range(radius + 1):
-            for x in range(minX, maxX + 1):
-                for y in range(minY, maxY + 1):
-                    p = Int3(x, y, world); d = max(abs(point.x - p.x), abs(point.y - p.y))
-                    if d == r and p not in self.cells:
-                        cell = self.beginCell(p)
-                        if cell and immediate: await self.queue.waitFor(cell.task)
-
-        # update LODs
-        for p, cell in self.cells.items(): d = max(abs(point.x - p.x), abs(point.y - p.y)); self.builder.setVisible(cell.objectsObj, d <= self.radius2)
-
-    def buildCell(self, cell: ICell) -> CellManager.Cell:
+        point = self.query.getCellId(position); world = self.query.world
+        last = self._plan if self._plan and self._plan[1:] == (radius, world) else None
+        if last and last[0] == point: return
+        if not last: self._missing.clear()
+        self._plan = (point, radius, world); center = last[0] if last else None
+        keep = radius + self.unloadMargin; radius2 = self.radius2
+        distance = lambda p: max(abs(point.x - p.x), abs(point.y - p.y))
+
+        # destroy cells past the unload margin
+        if last:
+            outOfRange = [Int3(x, y, world) for x, y in self._squareDiff(self._square(center, keep), self._square(point, keep))]
+            for s in outOfRange: self._missing.discard(s)
+            outOfRange += [s for s in self._strays if distance(s) > keep]
+        else: outOfRange = [s for s in self.cells if distance(s) > keep]
+        for s in outOfRange:
+            if s in self.cells: self.destroyCell(s)
+        if not last: self._strays = {s for s in self.cells if s.z != world}
+
+        # create new cells, nearest first
+        points = sorted((p for x, y in self._squareDiff(self._square(point, radius), self._square(center, radius) if last else None)
+            if (p := Int3(x, y, world)) not in self.cells and p not in self._missing), key=lambda p: (distance(p), (point.x - p.x) ** 2 + (point.y - p.y) ** 2))
+        records = self.findCells(points)
+        exterior = [i for i, s in enumerate(records) if s and not s.isInterior]
+        lands = dict(zip(exterior, self.findLands([records[i].gridId for i in exterior])))
+        began = []
+        for i, (p, record) in enumerate(zip(points, records)):
+            if not record: self._missing.add(p); continue
+            d = distance(p); cell = self.buildCell(record, d, lands.get(i)); self.cells[p] = cell; self._points[cell.task] = p
+            self.builder.setVisible(cell.objectsObj, d <= radius2); began.append(cell)
+        if immediate:
+            for s in began: await self.queue.waitFor(s.task)
+
+        # update LODs crossing radius2, and load the nearest pending cells first
+        if last:
+            for visible, a, b in ((True, point, center), (False, center, point)):
+                for x, y in self._squareDiff(self._square(a, radius2), self._square(b, radius2)):
+                    if (cell := self.cells.get(Int3(x, y, world))): self.builder.setVisible(cell.objectsObj, visible)
+        else:
+            for p, cell in self.cells.items(): self.builder.setVisible(cell.objectsObj, distance(p) <= radius2)
+        for task in self.queue.tasks:
+            if (p := self._points.get(task)): self.queue.setPriority(task, distance(p))
+
+    # requests each cell's streamed textures by its distance, again once the center moves or the cell has loaded more assets
+    def _streamCells(self) -> None:
+        if not self._plan: return
+        point = self._plan[0]
+        for p, cell in self.cells.items():
+            if cell.streamed == (z := (point, len(cell.assets))): continue
+            cell.streamed = z; self.builder.streamCell(cell, max(abs(point.x - p.x), abs(point.y - p.y)))
+
+    # land: the cell's land when already looked up, by updateCells' batched findLands
+    def buildCell(self, cell: ICell, priority: float = 0, land: ILand = ...) -> CellManager.Cell:
         assert(cell)
         cellName: str
-        land: ILand = None
-        if not cell.isInterior: cellName = f'cell {cell.gridId}'; land = self.query.findLand(cell.gridId)
-        else: cellName = cell.name
-        (objectsObj, obj) = self.builder.createContainers(cellName)
-        task = self.builder.coroutine(cell, land, objectsObj, obj); self.queue.add(task)
-        return CellManager.Cell(objectsObj, obj, cell, task)
+        if not cell.isInterior: cellName = f'cell {cell.gridId}'; land = self.query.findLand(cell.gridId) if land is ... else land
+        else: cellName = cell.name; land = None
+        (objectsObj, obj) = self.builder.createContainers(cellName); assets = []
+        task = self.builder.coroutine(cell, land, objectsObj, obj, assets); self.queue.add(task, priority, lambda: self.builder.prefetch(cell, land))
+        return CellManager.Cell(objectsObj, obj, cell, task, assets)
+
+    def _destroy(self, cell: CellManager.Cell) -> None:
+        self.queue.cancel(cell.task); self.builder.destroy(cell.obj); self._points.pop(cell.task, None)
+        for s in cell.assets: s.release()
+        cell.assets.clear()
 
     def destroyCell(self, point: Int3) -> None:
-        if point in self.cells: s = self.cells[point]; self.queue.cancel(s.task); self.builder.destroy(s.obj); self.cells.pop(point)
+        self._strays.discard(point)
+        if point in self.cells: self._destroy(self.cells.pop(point))
         else: log.error('Tried to destroy a cell that is not created.')
 
     def destroyAllCells(self) -> None:
-        for s in self.cells.values(): self.queue.cancel(s.task); self.builder.destroy(s.obj)
-        self.cells.clear()
+        for s in self.cells.values(): self._destroy(s)
+        self.cells.clear(); self._strays.clear(); self._plan = None
+
+    # frees assets released by destroyed cells, within the frame budget
+    def drain(self, desiredWorkTime: float) -> None: self.builder.drain(desiredWorkTime)
+
+# CachedQuery - IQuery decorator keeping a name index per world: findAnyByNames resolves a cell's refs in one call, looking up only names
+# not yet indexed (batched when the query has findAnyByNames), and findLtex results are memoized. Everything else goes to the query.
+class CachedQuery:
+    def __init__(self, query: CellManager.IQuery):
+        self.query: CellManager.IQuery = query
+        self._names: dict[object, dict[str, object]] = {}
+        self._ltexs: dict[object, dict[int, CellManager.ILtex]] = {}
+    def __getattr__(self, name: str) -> object: return getattr(self.query, name)
+
+    def findAnyByName(self, name: str) -> object: return self.findAnyByNames([name])[0]
+    def findAnyByNames(self, names: list[str]) -> list[object]:
+        index = self._names.setdefault(getattr(self.query, 'world', None), {})
+        missing = [s for s in dict.fromkeys(names) if s not in index]
+        if missing:
+            f = getattr(self.query, 'findAnyByNames', None)
+            index.update(zip(missing, (f(missing) if f else None) or [self.query.findAnyByName(s) for s in missing]))
+        return [index[s] for s in names]
+
+    def findLtex(self, index: int) -> CellManager.ILtex:
+        ltexs = self._ltexs.setdefault(getattr(self.query, 'world', None), {})
+        if index not in ltexs: ltexs[index] = self.query.findLtex(index)
+        return ltexs[index]
+
+    def clear(self) -> None: self._names.clear(); self._ltexs.clear()
+
+# CellPrefetcher - warms the cells the player is about to enter: the velocity over the recent positions is projected lookAhead seconds
+# ahead, and the cells around that point not yet in range have their land textures and models preloaded without being instantiated, at
+# most maxInFlight loads at a time. A change of direction cancels the loads of cells no longer ahead; the managers count preload
+# requesters, so an asset another cell still wants keeps loading.
+class CellPrefetcher:
+    lookAhead: float = 2.
+    minSpeed: float = 1.
+    maxInFlight: int = 8
+    history: int = 8
+
+    def __init__(self, manager: CellManager, radius: int = 1, lookAhead: float = None, maxInFlight: int = None):
+        self.manager: CellManager = manager
+        self.radius: int = radius
+        self.lookAhead: float = CellPrefetcher.lookAhead if lookAhead is None else lookAhead
+        self.maxInFlight: int = CellPrefetcher.maxInFlight if maxInFlight is None else maxInFlight
+        self._positions: deque[tuple[float, ndarray]] = deque(maxlen=CellPrefetcher.history)
+        self._cells: dict[Int3, list[tuple[str, object, object]]] = {} # point: [(kind, path, task)]
+        self._queued: deque[tuple[Int3, str, object]] = deque()
+        self._inFlight: set[object] = set()
+
+    @property
+    def inFlight(self) -> int: return len(self._inFlight)
+
+    def velocity(self) -> ndarray:
+        if len(self._positions) < 2: return None
+        (t0, p0), (t1, p1) = self._positions[0], self._positions[-1]
+        return (p1 - p0) / (t1 - t0) if t1 > t0 else None
+
+    def update(self, position: Vector3, now: float = None) -> list[Int3]:
+        try: asyncio.get_running_loop()
+        except RuntimeError: return []
+        manager = self.manager; query = manager.query
+        position = asarray(position, dtype=float64); self._positions.append((monotonic() if now is None else now, position))
+        velocity = self.velocity(); center = query.getCellId(position); wanted = []
+        if velocity is not None and (velocity @ velocity) ** .5 >= self.minSpeed:
+            target = query.getCellId(position + velocity * self.lookAhead); world = query.world; r = manager.radius
+            if target != center:
+                wanted = sorted((p for x, y in CellManager._squareDiff(CellManager._square(target, self.radius), CellManager._square(center, r))
+                    if (p := Int3(x, y, world)) not in manager.cells), key=lambda p: max(abs(target.x - p.x), abs(target.y - p.y)))
+        self._retarget(wanted)
+        self._pump()
+        return wanted
+
+    def cancel(self) -> None: self._positions.clear(); self._retarget([])
+
+    def _retarget(self, wanted: list[Int3]) -> None:
+        keep = set(wanted)
+        for p in [s for s in self._cells if s not in keep]:
+            if p in self.manager.cells: del self._cells[p]; continue
+            for kind, path, task in self._cells.pop(p):
+                if task and not task.done(): self.manager.builder.cancelPreload(kind, path)
+        self._queued = deque(s for s in self._queued if s[0] in keep)
+        points = [s for s in wanted if s not in self._cells]
+        records = self.manager.findCells(points)
+        exterior = [i for i, s in enumerate(records) if s and not s.isInterior]
+        lands = dict(zip(exterior, self.manager.findLands([records[i].gridId for i in exterior])))
+        for i, (p, record) in enumerate(zip(points, records)):
+            self._cells[p] = []
+            if record: self._queued.extend((p, kind, path) for kind, path in self.manager.builder.getCellAssets(record, lands.get(i)))
+
+    def _pump(self) -> None:
+        while self._queued and len(self._inFlight) < self.maxInFlight:
+            p, kind, path = self._queued.popleft()
+            task = self.manager.builder.preload(kind, path)
+            if isinstance(task, asyncio.Future) and not task.done(): self._inFlight.add(task); task.add_done_callback(self._done)
+            self._cells[p].append((kind, path, task if isinstance(task, asyncio.Future) else None))
+    def _done(self, task: object) -> None: self._inFlight.discard(task); self._pump()
 
 # CellBuilder
 class CellBuilderX:
     def createContainers(self, name: str) -> tuple[object, object]: pass
     def setVisible(self, src: object, visible: bool) -> None: pass
-    def coroutine(self, cell: ICell, land: ILand, obj: object, objectsObj: object) -> Enumerator: pass
+    def prefetch(self, cell: ICell, land: ILand) -> list[object]: return []
+    def getCellAssets(self, cell: ICell, land: ILand) -> list[tuple[str, object]]: return []
+    def preload(self, kind: str, path: object) -> object: return None
+    def cancelPreload(self, kind: str, path: object) -> bool: return False
+    def coroutine(self, cell: ICell, land: ILand, obj: object, objectsObj: object, assets: list = None) -> Enumerator: pass
+    def streamCell(self, cell: CellManager.Cell, distance: int) -> None: pass
+    def drain(self, desiredWorkTime: float) -> None: pass
 
 # CellBuilder
 class CellBuilder(CellBuilderX):
     defaultLandTexturePath: str = 'textures/_land_default.dds'
-    terrainLayers: dict[Texture, GfxTerrainLayer[Texture]] = {}
 
     def __init__(self, source: ISource, query: IQuery, gfx: list[IOpenGfx]):
         self.source = source
@@ -175,6 +353,8 @@ class CellBuilder(CellBuilderX):
         self.gfxTerrain = gfx[GfX.XTerrain]
         self.meterInUnits = query.meterInUnits
         self.cellLengthInMeters = query.cellLengthInMeters
+        textureManager = getattr(self.gfxModel, 'textureManager', None)
+        self.terrainLayers = TerrainLayerManager(textureManager) if textureManager else None
 
     def createContainers(self, name: str) -> tuple[object, object]:
         obj = self.gfxApi.createObject(name, 'Cell')
@@ -184,27 +364,64 @@ class CellBuilder(CellBuilderX):
     def setVisible(self, src: object, visible: bool) -> None: self.gfxApi.setVisible(src, visible)
     def destroy(self, src: object) -> None: self.gfxApi.destroy(src)
 
+    def drain(self, desiredWorkTime: float) -> None:
+        deadline = perf_counter_ns() + int(desiredWorkTime * 1e9)
+        for s in ('objectManager', 'materialManager', 'textureManager'):
+            manager = getattr(self.gfxModel, s, None)
+            if manager: manager.drain(deadline)
+        if self.terrainLayers: self.terrainLayers.drain(deadline)
+
+    # Requests the mips of a cell's streamed textures, its models' too, for its distance in cells.
+    def streamCell(self, cell: CellManager.Cell, distance: int) -> None:
+        streamer = getattr(getattr(self.gfxModel, 'textureManager', None), 'streamer', None)
+        if streamer is not None: streamer.requestOwned(cell.assets, distance * self.cellLengthInMeters)
+
+    # Starts loading the land textures and referenced models of a cell in the background, returning the load tasks.
+    def prefetch(self, cell: ICell, land: ILand) -> list[object]: return [s for s in (self.preload(k, p) for k, p in self.getCellAssets(cell, land)) if s]
+
+    # The (kind, path) of the land textures and referenced models of a cell.
+    def getCellAssets(self, cell: ICell, land: ILand) -> list[tuple[str, object]]:
+        assets = []
+        if land and self.gfxTerrain: assets += [('texture', s) for s in self.getLandTextures(land) or []]
+        if cell: assets += [('object', s.modelPath) for s in self.getCellRefs(cell) if s.modelPath]
+        return assets
+
+    def preload(self, kind: str, path: object) -> object:
+        match kind:
+            case 'texture': return self.gfxModel.textureManager.preloadTexture(self.source, path)
+            case 'object': return self.gfxModel.objectManager.preloadObject(self.source, path)
+            case _: raise Exception(f'Unknown asset kind: {kind}')
+
+    def cancelPreload(self, kind: str, path: object) -> bool:
+        match kind:
+            case 'texture': return self.gfxModel.textureManager.cancelPreload(self.source, path)
+            case 'object': return self.gfxModel.objectManager.cancelPreload(self.source, path)
+            case _: raise Exception(f'Unknown asset kind: {kind}')
+
     # A coroutine that instantiates the terrain for, and all objects in, a cell.
-    async def coroutine(self, cell: ICell, land: ILand, obj: object, objectsObj: object) -> Enumerator:
+    async def coroutine(self, cell: ICell, land: ILand, obj: object, objectsObj: object, assets: list = None) -> Enumerator:
         if not cell and not land: return
         cellRefs = self.getCellRefs(cell)
-        if land and self.gfxTerrain: yield None; await self.createLand(land, obj); yield None
-        for s in cellRefs: await self.createCell(cell, objectsObj, s); yield None
+        if land and self.gfxTerrain:
+            yield None
+            with Metrics.span('cell.land'): await self.createLand(land, obj, assets)
+            yield None
+        for s in cellRefs:
+            with Metrics.span('cell.ref', name=s.obj.name): await self.createCell(cell, objectsObj, s, assets)
+            yield None
+        Metrics.count('cell.builds')
         if self.gfxLight: await self.createReflectionProbe(cell, obj)
 
     def getCellRefs(self, cell: ICell) -> list[CellRef]:
-        @staticmethod
-        def _(s):
-            record = self.query.findAnyByName(s.name)
-            modelPath = record.modelPath if record and isinstance(record, CellManager.ICellXrefModel) else None
-            return CellManager.CellRef(obj=s, record=record, modelPath=modelPath)
-        return [_(s) for s in cell.Xrefs]
+        xrefs = cell.Xrefs; f = getattr(self.query, 'findAnyByNames', None)
+        records = (f([s.name for s in xrefs]) if f and xrefs else None) or [self.query.findAnyByName(s.name) for s in xrefs]
+        return [CellManager.CellRef(obj=s, record=r, modelPath=r.modelPath if r and isinstance(r, CellManager.ICellXrefModel) else None) for s, r in zip(xrefs, records)]
 
     # Instantiates an object in a cell. Called by InstantiateCellObjectsCoroutine after the object's assets have been pre-loaded.
-    async def createCell(self, cell: ICell, parent: object, r: CellRef) -> None:
+    async def createCell(self, cell: ICell, parent: object, r: CellRef, assets: list = None) -> None:
         if not r.record: return #log.info(f'Unknown Object: {r.obj.name}'); return
         modelObj: object = None; obj = r.obj
-        if r.modelPath: modelObj, _ = await self.gfxModel.createObject(self.source, r.modelPath, True); self.gfxModel.postObject(modelObj, obj.position, obj.eulerAngles, obj.scale, parent)
+        if r.modelPath: modelObj, _ = await self.gfxModel.objectManager.createObject(self.source, r.modelPath, True, owner=assets); self.gfxModel.postObject(modelObj, obj.position, obj.eulerAngles, obj.scale, parent)
         if self.gfxLight and isinstance(r.record, CellManager.ILigh):
             ligh = r.record
             s = self.gfxLight.createLight('Light', None, ligh.radius, ligh.lightColor, cell.isInterior)
@@ -228,69 +445,65 @@ class CellBuilder(CellBuilderX):
     LAND_TEXTUREINDICES: int = 256
     VTEX_ROWS: int = 16
     VTEX_COLUMNS: int = VTEX_ROWS
-
-    async def createLand(self, land: ILand, parent: object):
-        heights = land.heights
-        if not heights: return
-
-        # Read in the heights in Morrowind units.
-        newHeights = zeros((CellBuilder.LAND_SIDELENGTH_IN_SAMPLES, CellBuilder.LAND_SIDELENGTH_IN_SAMPLES), dtype=float) 
-        rowOffset = land.heightOffset
-        for y in range(CellBuilder.LAND_SIDELENGTH_IN_SAMPLES):
-            rowOffset += heights[y * CellBuilder.LAND_SIDELENGTH_IN_SAMPLES]
-            newHeights[y, 0] = rowOffset * CellBuilder.VHGTIncrementToUnits
-            colOffset = rowOffset
-            for x in range(1, CellBuilder.LAND_SIDELENGTH_IN_SAMPLES):
-                colOffset += heights[(y * CellBuilder.LAND_SIDELENGTH_IN_SAMPLES) + x]
-                newHeights[y, x] = colOffset * CellBuilder.VHGTIncrementToUnits
-
-        # Change the heights to percentages.
-        minHeight, maxHeight = getExtrema(newHeights)
-        for y in range(CellBuilder.LAND_SIDELENGTH_IN_SAMPLES):
-            for x in range(CellBuilder.LAND_SIDELENGTH_IN_SAMPLES):
-                newHeights[y, x] = changeRange(newHeights[y, x], minHeight, maxHeight, 0, 1)
+    # vtex is stored as 4x4 blocks of 4x4 texels: the vtex index of each alpha-map texel
+    _vtexOrder: ndarray = (lambda y, x: (y // 4) * 64 + (x // 4) * 16 + (y % 4) * 4 + x % 4)(*indices((VTEX_ROWS, VTEX_COLUMNS)))
+
+    # Decodes many cells' lands at once: the heights normalized to 0..1 (n, 65, 65), the min and max heights in Morrowind units (n),
+    # and the texture index of each alpha-map texel, -1 being the default texture (n, 16, 16).
+    @staticmethod
+    def decodeLands(lands: list[ILand]) -> tuple[ndarray, ndarray, ndarray, ndarray]:
+        n = CellBuilder.LAND_SIDELENGTH_IN_SAMPLES
+        heights = asarray([s.heights for s in lands], dtype=float64).reshape(-1, n, n)
+        heights[:, :, 0] = heights[:, :, 0].cumsum(axis=1) + asarray([s.heightOffset for s in lands], dtype=float64)[:, None]
+        heights = heights.cumsum(axis=2); heights *= CellBuilder.VHGTIncrementToUnits
+        minHeights = heights.min(axis=(1, 2)); maxHeights = heights.max(axis=(1, 2)); ranges = maxHeights - minHeights
+        heights -= minHeights[:, None, None]; heights /= where(ranges != 0, ranges, 1)[:, None, None]
+        vtex = asarray([s.vtex or [0]*CellBuilder.LAND_TEXTUREINDICES for s in lands], dtype=int32)[:, CellBuilder._vtexOrder] - 1
+        return heights, minHeights, maxHeights, vtex
+
+    @staticmethod
+    def decodeLand(land: ILand) -> tuple[ndarray, float, float, ndarray]: return tuple(s[0] for s in CellBuilder.decodeLands([land]))
+
+    async def createLand(self, land: ILand, parent: object, assets: list = None, decoded: tuple = None):
+        if not land.heights: return
+        with Metrics.span('land.decode'): newHeights, minHeight, maxHeight, texIndexs = decoded or CellBuilder.decodeLand(land)
 
         # Texture the terrain.
         textureManager = self.gfxModel.textureManager
-        indexs = land.vtex or [0]*CellBuilder.LAND_TEXTUREINDICES; layers = []; layerIndexs = {}
-        for i in range(len(indexs)):
-            index = indexs[i] - 1
-            if index in layerIndexs: continue
+        layers = []; layerIndexs = {}
+        for index in dict.fromkeys(land.vtex or [0]):
+            index -= 1
             # Load terrain texture.
             path = self.query.findLtex(index).path if index >= 0 else CellBuilder.defaultLandTexturePath
-            tex, _ = await self.gfxModel.createTexture(self.source, path)
-            layer = CellBuilder.terrainLayers.get(tex)
-            if not layer:
-                layer = GfxTerrainLayer[Texture](
-                    texture=tex,
-                    smoothness=.3,
-                    metallic=.2,
-                    specular=Color.black,
-                    tileSize=array([6, 6]))
-                layer.maskMapTexture = textureManager.createSolidTexture(1, 1, [layer.metallic, .0, .0, layer.smoothness])
-                layer.normalMapTexture = textureManager.createNormalMapTexture(tex)
-                CellBuilder.terrainLayers[tex] = layer
-            layerIndex = len(layers); layers.append(layer); layerIndexs[index] = layerIndex
+            tex, tag = await textureManager.createTexture(self.source, path, owner=assets)
+            layer = self.terrainLayers.createLayer(tex, tag, self.createTerrainLayer)
+            layerIndexs[index] = len(layers); layers.append(layer)
         newlayers = layers
 
         # Create the alpha map.
-        alphaMap = zeros((CellBuilder.VTEX_ROWS, CellBuilder.VTEX_COLUMNS, len(newlayers)))
-        for y in range(CellBuilder.VTEX_ROWS):
-            yMajor = y // 4; yMinor = y - (yMajor * 4)
-            for x in range(CellBuilder.VTEX_COLUMNS):
-                xMajor = x // 4; xMinor = x - (xMajor * 4)
-                texIndex = indexs[(yMajor * 64) + (xMajor * 16) + (yMinor * 4) + xMinor] - 1
-                alphaMap[y, x, layerIndexs[texIndex] if texIndex >= 0 else 0] = 1
-    
+        keys, inverse = unique(texIndexs, return_inverse=True)
+        layerGrid = asarray([layerIndexs[k] if k >= 0 else 0 for k in keys.tolist()])[inverse.reshape(texIndexs.shape)]
+        alphaMap = eye(len(newlayers))[layerGrid]
+
         # Create the terrain.
         heightRange = (maxHeight - minHeight) / self.meterInUnits
         position = array([land.gridId.y * self.cellLengthInMeters, land.gridId.y * self.cellLengthInMeters, minHeight / self.meterInUnits])
         sampleDistance = self.cellLengthInMeters / (CellBuilder.LAND_SIDELENGTH_IN_SAMPLES - 1)
-        data = self.gfxTerrain.createTerrainData(-1, newHeights, heightRange, sampleDistance, newlayers, alphaMap)
-        self.gfxTerrain.createTerrain('terrain', position, data, parent)
+        with Metrics.span('land.terrain'):
+            data = self.gfxTerrain.createTerrainData(-1, newHeights, heightRange, sampleDistance, newlayers, alphaMap)
+            self.gfxTerrain.createTerrain('terrain', position, data, parent)
         # _terrainError: 5
         # _treeDistance: 80
 
+    @staticmethod
+    def createTerrainLayer(tex: Texture) -> GfxTerrainLayer[Texture]:
+        return GfxTerrainLayer[Texture](
+            texture=tex,
+            smoothness=.3,
+            metallic=.2,
+            specular=Color.black,
+            tileSize=array([6, 6]))
+
     async def createReflectionProbe(self, cell: ICell, parent: Object) -> None:
         if cell.isInterior: return
         gridId = cell.gridId
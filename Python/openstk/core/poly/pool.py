@@ -1,100 +1,368 @@
-import time, asyncio
+import os, time, asyncio, inspect, threading
+from time import perf_counter_ns
+from collections import deque
+from heapq import heappush, heappop, heapify
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, CancelledError, FIRST_COMPLETED, wait
 from typing import Iterator, Generic, TypeVar # https://stackoverflow.com/questions/74472798/how-to-define-python-generic-classes
 T = TypeVar('T')
 
-# async def _parallelForTask(f: int, t: int, s: int, c: callable) -> list[object]: [await c(idx) for idx in range(f, t, s)]
-# async def parallelFor(f: int, t: int, o: set, c: callable) -> list[object]: await asyncio.gather(*[_parallelForTask(f, t, i + 1, c) for i in range(o['max'] or 1)])
+#region parallel
 
-async def parallelFor(f: int, t: int, options: set, func: callable) -> list[any]:
-    semaphore = asyncio.Semaphore(options['max'] or 1)
+# CancellationToken - cooperative cancellation shared with parallel workers
+class CancellationToken:
+    def __init__(self): self._event = threading.Event()
+    def cancel(self) -> None: self._event.set()
+    @property
+    def isCancelled(self) -> bool: return self._event.is_set()
+    def throwIfCancelled(self) -> None:
+        if self._event.is_set(): raise CancelledError()
+
+# per-worker handles: options['local'] is a factory run once in each worker thread or process (e.g. opening a BinaryReader over the
+# archive), and is passed to func as its second argument
+_worker = threading.local()
+def _workerInit(factory: callable, handles: list) -> None:
+    _worker.local = z = factory()
+    if handles is not None: handles.append(z)
+def _workerCall(func: callable, i: int) -> object: return func(i, _worker.local) if hasattr(_worker, 'local') else func(i)
+def _workerClose(handles: list) -> None:
+    for s in handles or []:
+        if hasattr(s, '__exit__'): s.__exit__(None, None, None)
+        elif hasattr(s, 'close'): s.close()
+
+def _parallelErrors(errors: list[BaseException], count: int) -> BaseExceptionGroup: return BaseExceptionGroup(f'parallelFor: {len(errors)} of {count} failed', errors)
+
+# parallelIter - runs func(i) for i in [f, t) on a thread or process pool, yielding (i, result) in index order or as completed.
+# options: max (workers, defaults to the cpu count), executor ('thread' | 'process'), ordered (default True), local (per-worker
+# factory), cancel (a CancellationToken). At most 2 * max items are in flight; failures are collected and raised as an ExceptionGroup
+# once the rest have run. For the process executor func and local must be picklable (module level).
+def parallelIter(f: int, t: int, func: callable, options: dict = None) -> Iterator[tuple[int, object]]:
+    options = options or {}
+    workers = options.get('max') or os.cpu_count() or 1; ordered = options.get('ordered', True); cancel = options.get('cancel'); local = options.get('local')
+    process = options.get('executor') == 'process'
+    handles = None if process or not local else []
+    executor = (ProcessPoolExecutor if process else ThreadPoolExecutor)(workers, initializer=_workerInit if local else None, initargs=(local, handles) if local else ())
+    items = iter(range(f, t)); pending = deque(); errors = []
+    def submit():
+        while len(pending) < workers * 2 and not (cancel and cancel.isCancelled):
+            i = next(items, None)
+            if i is None: return
+            pending.append((i, executor.submit(_workerCall, func, i)))
+    try:
+        submit()
+        while pending:
+            if ordered: i, s = pending.popleft()
+            else:
+                done = wait([s for _, s in pending], return_when=FIRST_COMPLETED).done
+                i, s = next(z for z in pending if z[1] in done); pending.remove((i, s))
+            if cancel and cancel.isCancelled:
+                for _, z in pending: z.cancel()
+                if s.cancelled(): continue
+            try: result = s.result()
+            except CancelledError: continue
+            except Exception as e: errors.append(e); continue
+            finally: submit()
+            yield (i, result)
+        if errors: raise _parallelErrors(errors, t - f)
+    finally:
+        for _, z in pending: z.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
+        _workerClose(handles)
+
+# parallelFor - runs func(i) for i in [f, t) returning the results in order: by default on the event loop, limited to options['max'] at a
+# time, awaiting each result that is awaitable; with options['executor'] ('thread' | 'process') on parallelIter's pools instead
+async def parallelFor(f: int, t: int, options: dict, func: callable) -> list[object]:
+    options = options or {}
+    if options.get('executor'): return [s for _, s in await asyncio.to_thread(lambda: list(parallelIter(f, t, func, options | {'ordered': True})))]
+    semaphore = asyncio.Semaphore(options.get('max') or 1)
     async def _func(i):
-        async with semaphore: return await func(i)
-    tasks = [_func(i) for i in range(f, t)]
-    for s in asyncio.as_completed(tasks): await s
+        async with semaphore: z = func(i); return await z if inspect.isawaitable(z) else z
+    results = await asyncio.gather(*[_func(i) for i in range(f, t)], return_exceptions=True)
+    errors = [s for s in results if isinstance(s, BaseException)]
+    if (cancelled := next((s for s in errors if isinstance(s, asyncio.CancelledError)), None)): raise cancelled
+    if errors: raise _parallelErrors(errors, t - f)
+    return results
 
-# async def parallelFor(f: int, t: int, options: set, func: callable) -> list[any]:
-#     for i in range(f, t): await func(i)
+#endregion
 
 class IGenericPool(Generic[T]):
-    def get(self) -> None: pass
+    def get(self, timeout: float = None) -> T: pass
+    async def getAsync(self, timeout: float = None) -> T: pass
     def release(self, item: T) -> None: pass
+    def acquire(self, timeout: float = None) -> 'PoolLease': pass
     def action(self, action: callable) -> None: pass
     def func(self, action: callable) -> object: pass
 
+def _poolClose(item: object) -> None:
+    if hasattr(item, '__exit__'): item.__exit__(None, None, None)
+    elif hasattr(item, 'close'): item.close()
+
+# PoolLease - with / async with wrapper pairing get and release
+class PoolLease(Generic[T]):
+    def __init__(self, pool: IGenericPool, timeout: float = None): self.pool = pool; self.timeout = timeout; self.item: T = None
+    def __enter__(self) -> T: self.item = self.pool.get(self.timeout); return self.item
+    def __exit__(self, *args): self.pool.release(self.item)
+    async def __aenter__(self) -> T: self.item = await self.pool.getAsync(self.timeout); return self.item
+    async def __aexit__(self, *args): self.pool.release(self.item)
+
+# GenericPool - thread-safe pool: maxSize caps the outstanding plus idle items (get blocks until a release), retainInPool caps the
+# idle items, idleTimeout evicts items idle that long, and check(item) is run on reuse to discard unhealthy items. getAsync waits on a
+# loop future, which release hands the item (or the slot) to directly, ahead of the blocking getters
 class GenericPool(Generic[T]):
-    def __init__(self, factory: callable, reset: callable = None, retainInPool: int = 10):
+    def __init__(self, factory: callable, reset: callable = None, retainInPool: int = 10, maxSize: int = None, idleTimeout: float = None, check: callable = None):
         self.items: list[T] = []
         self.factory: callable = factory
         self.reset: callable = reset
         self.retainInPool: int = retainInPool
+        self.maxSize: int = maxSize
+        self.idleTimeout: float = idleTimeout
+        self.check: callable = check
+        self.hits = self.misses = self.waits = self.evictions = self.outstanding = self.peak = 0
+        self._released: list[float] = []
+        self._cond = threading.Condition()
+        self._waiters: deque[asyncio.Future] = deque()
     def __enter__(self): return self
     def __exit__(self, *args):
-        for s in self.items: s.__exit__(*args)
-    
-    def get(self) -> None: return self.items.pop() if self.items else self.factory()
+        with self._cond: items = self.items; self.items = []; self._released = []
+        for s in items: _poolClose(s)
+    @property
+    def stats(self) -> dict[str, int]: return {'hits': self.hits, 'misses': self.misses, 'waits': self.waits, 'evictions': self.evictions, 'outstanding': self.outstanding, 'idle': len(self.items), 'peak': self.peak}
+
+    def _evict(self) -> list[T]:
+        if not self.idleTimeout or not self.items: return []
+        cutoff = time.monotonic() - self.idleTimeout; n = 0
+        while n < len(self._released) and self._released[n] < cutoff: n += 1
+        evicted = self.items[:n]; del self.items[:n]; del self._released[:n]; self.evictions += n
+        return evicted
+
+    def evict(self) -> None:
+        with self._cond: evicted = self._evict()
+        for s in evicted: _poolClose(s)
+
+    def _take(self, timeout: float = None, block: bool = True, waiter: asyncio.Future = None) -> tuple[bool, T]:
+        closing = []; deadline = None if timeout is None else time.monotonic() + timeout; waited = False
+        try:
+            with self._cond:
+                closing += self._evict()
+                while True:
+                    while self.items:
+                        item = self.items.pop(); self._released.pop()
+                        if self.check and not self.check(item): closing.append(item); continue
+                        self.hits += 1; self.outstanding += 1; return (True, item)
+                    if self.maxSize is None or self.outstanding < self.maxSize:
+                        self.misses += 1; self.outstanding += 1; self.peak = max(self.peak, self.outstanding + len(self.items)); return (False, None)
+                    if not block:
+                        if waiter: self._waiters.append(waiter); self.waits += 1
+                        return (None, None)
+                    if not waited: self.waits += 1; waited = True
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0: raise TimeoutError('GenericPool: timed out waiting for an item')
+                    self._cond.wait(remaining)
+        finally:
+            for s in closing: _poolClose(s)
+
+    def _forfeit(self) -> None:
+        with self._cond:
+            if self._handoff(False, None): return
+            self.outstanding -= 1; self._cond.notify()
+
+    # passes a released item, or a freed slot, to the first async waiter whose loop is still running; called under the lock
+    def _handoff(self, found: bool, item: T) -> bool:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            try: waiter.get_loop().call_soon_threadsafe(self._resolve, waiter, found, item)
+            except RuntimeError: continue
+            if found: self.hits += 1
+            else: self.misses += 1; self.peak = max(self.peak, self.outstanding + len(self.items))
+            return True
+        return False
+
+    # runs on the waiter's loop: a waiter cancelled or timed out meanwhile gives the item or slot back
+    def _resolve(self, waiter: asyncio.Future, found: bool, item: T) -> None:
+        if waiter.done(): self.release(item) if found else self._forfeit(); return
+        if found and self.reset: self.reset(item)
+        waiter.set_result((found, item))
+
+    def _create(self) -> T:
+        try: return self.factory()
+        except BaseException: self._forfeit(); raise
+
+    def get(self, timeout: float = None) -> T:
+        found, item = self._take(timeout)
+        return item if found else self._create()
+
+    async def getAsync(self, timeout: float = None) -> T:
+        waiter = asyncio.get_running_loop().create_future()
+        found, item = self._take(block=False, waiter=waiter)
+        if found is None:
+            try: found, item = await asyncio.wait_for(waiter, timeout)
+            except (asyncio.CancelledError, TimeoutError) as e:
+                with self._cond:
+                    if waiter in self._waiters: self._waiters.remove(waiter)
+                if waiter.done() and not waiter.cancelled(): found, item = waiter.result(); self.release(item) if found else self._forfeit()
+                if isinstance(e, TimeoutError): raise TimeoutError('GenericPool: timed out waiting for an item') from None
+                raise
+        return item if found else self._create()
 
     def release(self, item: T) -> None:
-        if len(self.items) < self.retainInPool: self.reset and self.reset(item); self.items.append(item)
-        else: item.__exit__(None, None, None)
+        with self._cond:
+            if self._handoff(True, item): return
+            self.outstanding -= 1
+            keep = len(self.items) < self.retainInPool
+            if keep: self.reset and self.reset(item); self.items.append(item); self._released.append(time.monotonic())
+            self._cond.notify()
+        if not keep: _poolClose(item)
+
+    def acquire(self, timeout: float = None) -> PoolLease: return PoolLease(self, timeout)
 
     def action(self, action: callable) -> None:
-        item = self.get()
-        try: action(item)
-        finally: self.release(item)
+        with self.acquire() as item: action(item)
 
     def func(self, action: callable) -> object:
-        item = self.get()
-        try: return action(item)
-        finally: self.release(item)
+        with self.acquire() as item: return action(item)
 
 class SinglePool(GenericPool, Generic[T]):
     def __init__(self, single: T, reset: callable = None): super().__init__(None, reset); self.single: T = single
-    def get(self) -> None: return self.single
-    def release(self, item: T) -> None: self.reset and self.reset(item); self.single.__exit__(None, None, None)
+    def __exit__(self, *args): _poolClose(self.single)
+    def get(self, timeout: float = None) -> T: self.hits += 1; return self.single
+    async def getAsync(self, timeout: float = None) -> T: return self.get(timeout)
+    def release(self, item: T) -> None: self.reset and self.reset(item)
 
 class StaticPool(GenericPool, Generic[T]):
-    def __init__(self, single: T, reset: callable = None): super().__init__(None, reset); self.static: T = static
-    def get(self) -> None: return self.static
+    def __init__(self, static: T, reset: callable = None): super().__init__(None, reset); self.static: T = static
+    def __exit__(self, *args): pass
+    def get(self, timeout: float = None) -> T: self.hits += 1; return self.static
+    async def getAsync(self, timeout: float = None) -> T: return self.get(timeout)
     def release(self, item: T) -> None: self.reset and self.reset(item)
 
-class AsyncCoroutineQueue:
-    def __init__(self):
-        self.tasks: list[Iterator] = []
+#region queue
+
+class _QueueEntry:
+    __slots__ = ('task', 'priority', 'seq', 'time', 'steps', 'alive', 'prefetch', 'depends', 'admitted')
+    def __init__(self, task: Iterator, priority: float, prefetch: callable = None):
+        self.task = task; self.priority = priority; self.seq = 0; self.time = 0; self.steps = 0; self.alive = True
+        self.prefetch = prefetch; self.depends = None; self.admitted = False
+
+# CoroutineQueueBase - cooperative scheduler state: tasks are stepped lowest priority first and round-robin within a priority, cancel
+# and setPriority are O(1) (stale heap entries are skipped and compacted), and each task's stepped time is accounted in nanoseconds.
+# Steps longer than the frame budget are recorded in overruns and reported to onOverrun(task, ns).
+class CoroutineQueueBase:
+    def __init__(self, maxOverruns: int = 64):
+        self._heap: list[tuple[float, int, _QueueEntry]] = []
+        self._entries: dict[Iterator, _QueueEntry] = {}
+        self._seq = 0
         self.time = None
-    def add(self, task: Iterator) -> Iterator: self.tasks.append(task); return task
-    def cancel(self, task: Iterator) -> None: return self.tasks.remove(task) if task in self.tasks else None
-    def clear(self) -> None: return self.tasks.clear()
+        self.overruns: deque[tuple[Iterator, int]] = deque(maxlen=maxOverruns)
+        self.onOverrun: callable = None
+    def __len__(self) -> int: return len(self._entries)
+    def __contains__(self, task: Iterator) -> bool: return task in self._entries
+    @property
+    def tasks(self) -> list[Iterator]: return [s.task for s in sorted(self._entries.values(), key=lambda s: s.priority)]
+    def _push(self, entry: _QueueEntry) -> None:
+        if len(self._heap) > 2 * len(self._entries) + 32: self._heap = [s for s in self._heap if s[2].alive and s[2].seq == s[1]]; heapify(self._heap)
+        self._seq += 1; entry.seq = self._seq; heappush(self._heap, (entry.priority, self._seq, entry))
+    def _pop(self) -> _QueueEntry:
+        while self._heap:
+            _, seq, entry = heappop(self._heap)
+            if entry.alive and entry.seq == seq: return entry
+        return None
+    def _finish(self, entry: _QueueEntry) -> None: entry.alive = False; self._entries.pop(entry.task, None)
+    def _account(self, entry: _QueueEntry, elapsed: int, budget: int = 0) -> None:
+        entry.time += elapsed; entry.steps += 1
+        if budget and elapsed > budget:
+            self.overruns.append((entry.task, elapsed))
+            if self.onOverrun: self.onOverrun(entry.task, elapsed)
+    def add(self, task: Iterator, priority: float = 0, prefetch: callable = None) -> Iterator:
+        self.cancel(task); entry = self._entries[task] = _QueueEntry(task, priority, prefetch); self._push(entry); return task
+    def cancel(self, task: Iterator) -> None:
+        entry = self._entries.get(task)
+        if entry: self._finish(entry)
+    def setPriority(self, task: Iterator, priority: float) -> None:
+        entry = self._entries.get(task)
+        if not entry or entry.priority == priority: return
+        entry.priority = priority; self._push(entry)
+    def clear(self) -> None:
+        for s in list(self._entries.values()): self._finish(s)
+        self._heap.clear()
+    def stats(self, task: Iterator) -> tuple[int, int]: entry = self._entries.get(task); return (entry.time, entry.steps) if entry else (0, 0)
+
+# AsyncCoroutineQueue - asyncio loader: up to concurrency tasks are admitted at once, each starting its prefetch() awaitables (asset
+# loads through ISource.getAsset) as background tasks. A task is only stepped, under the frame budget, once its prefetches are done,
+# so frames never block on I/O. Admission stops while maxInFlight prefetches are pending (saturated).
+class AsyncCoroutineQueue(CoroutineQueueBase):
+    def __init__(self, concurrency: int = 4, maxInFlight: int = 64, maxOverruns: int = 64):
+        super().__init__(maxOverruns)
+        self.concurrency = concurrency
+        self.maxInFlight = maxInFlight
+        self._admitted = 0
+        self._inFlight: set[asyncio.Future] = set()
+    @property
+    def inFlight(self) -> int: return len(self._inFlight)
+    @property
+    def saturated(self) -> bool: return len(self._inFlight) >= self.maxInFlight
+    def _finish(self, entry: _QueueEntry) -> None:
+        super()._finish(entry)
+        if entry.admitted: entry.admitted = False; self._admitted -= 1
+    def _admit(self, entry: _QueueEntry, force: bool = False) -> bool:
+        if entry.admitted: return True
+        if not force and (self._admitted >= self.concurrency or self.saturated): return False
+        entry.admitted = True; self._admitted += 1
+        entry.depends = [asyncio.ensure_future(s) for s in (entry.prefetch() or []) if inspect.isawaitable(s)] if entry.prefetch else []
+        for s in entry.depends:
+            if not s.done(): self._inFlight.add(s); s.add_done_callback(self._inFlight.discard)
+        return True
+    def _ready(self, entry: _QueueEntry) -> bool: return self._admit(entry) and all(s.done() for s in entry.depends)
+    async def _prefetched(self, entry: _QueueEntry) -> None:
+        self._admit(entry, True)
+        if entry.depends: await asyncio.gather(*entry.depends, return_exceptions=True)
+    async def _step(self, entry: _QueueEntry, budget: int = 0) -> bool:
+        t = perf_counter_ns()
+        try: done = await anext(entry.task, self) is self
+        except BaseException: self._finish(entry); raise
+        self._account(entry, perf_counter_ns() - t, budget)
+        if done: self._finish(entry)
+        return done
     async def run(self, desiredWorkTime: float) -> None:
-        if len(self.tasks) == 0: return
-        self.time = time.time()
-        while len(self.tasks) > 0 and (time.time() - self.time) < desiredWorkTime:
-            if await anext(self.tasks[0], self) == self: self.tasks.pop(0)
+        if not self._entries: return
+        self.time = perf_counter_ns(); budget = int(desiredWorkTime * 1e9); waiting = []
+        try:
+            while (entry := self._pop()):
+                if not self._ready(entry): waiting.append(entry); continue
+                if not await self._step(entry, budget) and entry.alive: self._push(entry)
+                if perf_counter_ns() - self.time >= budget: break
+        finally:
+            for s in waiting:
+                if s.alive: self._push(s)
     async def waitFor(self, task: object) -> None:
-        assert(task in self.tasks)
-        while await anext(task, self) != self: pass
-        if task in self.tasks: self.tasks.remove(task)
+        assert(task in self._entries)
+        entry = self._entries[task]
+        await self._prefetched(entry)
+        while not await self._step(entry): pass
     async def waitForAll(self):
-        for task in self.tasks:
-            while await anext(task, self) != self: pass
-        self.tasks.clear()
+        while (entry := self._pop()):
+            await self._prefetched(entry)
+            while not await self._step(entry): pass
 
-class CoroutineQueue:
-    def __init__(self):
-        self.tasks: list[Iterator] = []
-        self.time = None
-    def add(self, task: Iterator) -> Iterator: self.tasks.append(task); return task
-    def cancel(self, task: Iterator) -> None: return self.tasks.remove(task) if task in self.tasks else None
-    def clear(self) -> None: return self.tasks.clear()
+# CoroutineQueue - synchronous queue, prefetch is not used
+class CoroutineQueue(CoroutineQueueBase):
+    def _step(self, entry: _QueueEntry, budget: int = 0) -> bool:
+        t = perf_counter_ns()
+        try: done = next(entry.task, self) is self
+        except BaseException: self._finish(entry); raise
+        self._account(entry, perf_counter_ns() - t, budget)
+        if done: self._finish(entry)
+        return done
     def run(self, desiredWorkTime: float) -> None:
-        if len(self.tasks) == 0: return
-        self.time = time.time()
-        while len(self.tasks) > 0 and (time.time() - self.time) < desiredWorkTime:
-            if next(self.tasks[0], self) == self: self.tasks.pop(0)
+        if not self._entries: return
+        self.time = perf_counter_ns(); budget = int(desiredWorkTime * 1e9)
+        while (entry := self._pop()):
+            if not self._step(entry, budget) and entry.alive: self._push(entry)
+            if perf_counter_ns() - self.time >= budget: break
     def waitFor(self, task: object) -> None:
-        assert(task in self.tasks)
-        while next(task, self) != self: pass
-        if task in self.tasks: self.tasks.remove(task)
+        assert(task in self._entries)
+        entry = self._entries[task]
+        while not self._step(entry): pass
     def waitForAll(self):
-        for task in self.tasks:
-            while next(task, self) != self: pass
-        self.tasks.clear()
\ No newline at end of file
+        while (entry := self._pop()):
+            while not self._step(entry): pass
+
+#endregion
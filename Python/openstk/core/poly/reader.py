@@ -1,19 +1,87 @@
-import os, sys
-from numpy import ndarray, array
+import os, sys, mmap
+from numpy import ndarray, array, dtype, empty, frombuffer, uint8
 from quaternion import quaternion
-from struct import calcsize, unpack, iter_unpack
+from struct import Struct, calcsize, unpack, unpack_from, iter_unpack
 from io import BytesIO
 from openstk.core.util import _throw
+from openstk.core.profiler import Metrics
 from decimal import Decimal
 
 def _structGet(cls, sizeOf: int) -> tuple:
     if isinstance(cls._struct, tuple): return cls._struct
     elif isinstance(cls._struct, dict): return (cls._struct[sizeOf], sizeOf)
 
+# compiles and caches the Struct for a class, preferring its schema
+_structs: dict[object, Struct] = {}
+def _structCompile(cls, sizeOf: int) -> Struct:
+    key = (cls, sizeOf)
+    if key in _structs: return _structs[key]
+    schema = getattr(cls, '_schema', None)
+    z = _structs[key] = schema.struct if schema else Struct(_structGet(cls, sizeOf)[0])
+    return z
+
+# maps a struct pattern to a numpy dtype, expanding repeats into fields so a record's item() matches unpack()
+_dtypeCodes = {'b': 'i1', 'B': 'u1', '?': '?', 'h': 'i2', 'H': 'u2', 'i': 'i4', 'I': 'u4', 'l': 'i4', 'L': 'u4', 'q': 'i8', 'Q': 'u8', 'e': 'f2', 'f': 'f4', 'd': 'f8'}
+def _patternDtype(pat: str) -> dtype:
+    bo = '>' if pat[:1] in '>!' else '<'
+    fields = []; offset = 0; cnt = 0
+    for c in pat.lstrip('@=<>!'):
+        if c.isdigit(): cnt = cnt * 10 + ord(c) - 0x30; continue
+        n = cnt if cnt else 1; cnt = 0
+        if c in 'sc': fields.append((f'V{n}', offset)); offset += n
+        elif c == 'x': offset += n
+        elif c in _dtypeCodes:
+            code = bo + _dtypeCodes[c]; size = dtype(code).itemsize
+            for i in range(n): fields.append((code, offset)); offset += size
+        elif not c.isspace(): raise Exception(f'Unsupported pattern symbol: {c}')
+    if offset != calcsize(pat): raise Exception(f'Pattern has native alignment: {pat}')
+    codes = set(s[0] for s in fields)
+    if len(codes) == 1 and not next(iter(codes)).startswith('V') and len(fields) * dtype(fields[0][0]).itemsize == offset:
+        return dtype(fields[0][0]) if len(fields) == 1 else dtype((fields[0][0], (len(fields),)))
+    return dtype({'names': [f'f{i}' for i in range(len(fields))], 'formats': [s[0] for s in fields], 'offsets': [s[1] for s in fields], 'itemsize': offset})
+
+_dtypes: dict[object, dtype] = {}
+def _dtypeGet(cls: object, sizeOf: int = 0) -> dtype:
+    key = (cls, sizeOf)
+    if key in _dtypes: return _dtypes[key]
+    z = _dtypes[key] = _patternDtype(cls) if isinstance(cls, str) else \
+        cls._schema.dtype if hasattr(cls, '_schema') else \
+        _patternDtype(_structGet(cls, sizeOf)[0]) if hasattr(cls, '_struct') else \
+        dtype(cls)
+    return z
+
+# StructView - a lazy sequence of cls records over a numpy array, creating each record on access
+class StructView:
+    def __init__(self, cls: object, data: ndarray): self.cls = cls; self.data = data
+    def __repr__(self): return f'StructView[{self.cls.__name__}]({len(self.data)})'
+    def __len__(self) -> int: return len(self.data)
+    def __iter__(self): cls = self.cls; return (cls(z[0] if len(z) == 1 else z) for z in self._rows(self.data))
+    def __getitem__(self, index: int | slice) -> object:
+        if isinstance(index, slice): return StructView(self.cls, self.data[index])
+        z = self._rows(self.data[index:index+1 or None])[0]
+        return self.cls(z[0] if len(z) == 1 else z)
+    @staticmethod
+    def _rows(data: ndarray) -> list[tuple]:
+        z = data.tolist()
+        return z if data.dtype.names else [s if isinstance(s, list) else (s,) for s in z]
+
 # BinaryReader
 _brn = 0
+# CountingStream - stream proxy reporting the bytes read to Metrics, wrapped around a BinaryReader's stream while Metrics is enabled;
+# a MemoryFile is not wrapped, as MemoryReader moves its position directly: it counts its own reads
+class CountingStream:
+    def __init__(self, f): self.f = f
+    def __getattr__(self, name: str) -> object: return getattr(self.f, name)
+    def read(self, size: int = -1) -> bytes: z = self.f.read(size); Metrics.count('reader.bytes', len(z)); return z
+    def readinto(self, b: bytearray) -> int: n = self.f.readinto(b); Metrics.count('reader.bytes', n or 0); return n
+    def readline(self, size: int = -1) -> bytes: z = self.f.readline(size); Metrics.count('reader.bytes', len(z)); return z
+
 class BinaryReader:
-    def __init__(self, f, length: int = None, leaveOpen: bool = False): self.f = f; self.length = length; self.leaveOpen = leaveOpen; self.__update()
+    def __init__(self, f, length: int = None, leaveOpen: bool = False):
+        self.f = f; self.length = length; self.leaveOpen = leaveOpen; self.__update()
+        if Metrics.enabled:
+            Metrics.count('reader.opens')
+            if not isinstance(f, MemoryFile): self.f = CountingStream(f)
     def __enter__(self): return self
     def __exit__(self, type, value, traceback):
         if not self.leaveOpen: self.f.close()
@@ -191,7 +259,7 @@ class BinaryReader:
     # struct : single  - https://docs.python.org/3/library/struct.html 
     def readF(self, factory: callable) -> object: return factory(self)
     def readP(self, cls: callable, pat: str) -> object: cls = cls or (lambda s: s[0]); z = unpack(pat, self.f.read(calcsize(pat))); return cls(z[0] if len(z) == 1 else z)
-    def readS(self, cls: object, sizeOf: int = -1) -> object: pat, size = _structGet(cls, sizeOf); z = unpack(pat, self.f.read(size)); return cls(z[0] if len(z) == 1 else z)
+    def readS(self, cls: object, sizeOf: int = -1) -> object: s = _structCompile(cls, sizeOf); z = s.unpack(self.f.read(s.size)); return cls(z[0] if len(z) == 1 else z)
 
     # struct : array - factory
     def readL8FArray(self, factory: callable, endian: bool = False, obj: list[object] = None) -> list[object]: return self.readFArray(factory, self.readByte(), obj)
@@ -231,11 +299,33 @@ class BinaryReader:
     def readLV7SArray(self, cls: object, sizeOf: int = 0, endian: bool = False, obj: list[object] = None) -> list[object]: return self.readSArray(cls, self.readIntV7X(endian), sizeOf, obj)
     def readLV8SArray(self, cls: object, sizeOf: int = 0, endian: bool = False, obj: list[object] = None) -> list[object]: return self.readSArray(cls, self.readUIntV8X(endian), sizeOf, obj)
     def readSArray(self, cls: object, count: int, sizeOf: int = 0, obj: list[object] = None) -> list[object]:
-        if not obj: return [self.readS(cls) for i in range(count)] if count else []
-        if count > 0:
-            for i in range(count): obj[i] = self.readS(cls)
+        if not count: return obj if obj else []
+        st = _structCompile(cls, sizeOf or -1)
+        if not obj: return [cls(s[0] if len(s) == 1 else s) for s in st.iter_unpack(self.readBytes(st.size * count))]
+        for i, s in enumerate(st.iter_unpack(self.readBytes(st.size * count))): obj[i] = cls(s[0] if len(s) == 1 else s)
         return obj
 
+    # struct : array - numpy
+    def readL8NArray(self, cls: object, sizeOf: int = 0, obj: ndarray = None) -> ndarray: return self.readNArray(cls, self.readByte(), sizeOf, obj)
+    def readL16NArray(self, cls: object, sizeOf: int = 0, endian: bool = False, obj: ndarray = None) -> ndarray: return self.readNArray(cls, self.readUInt16X(endian), sizeOf, obj)
+    def readL32NArray(self, cls: object, sizeOf: int = 0, endian: bool = False, obj: ndarray = None) -> ndarray: return self.readNArray(cls, self.readUInt32X(endian), sizeOf, obj)
+    def readLV7NArray(self, cls: object, sizeOf: int = 0, endian: bool = False, obj: ndarray = None) -> ndarray: return self.readNArray(cls, self.readIntV7X(endian), sizeOf, obj)
+    def readLV8NArray(self, cls: object, sizeOf: int = 0, endian: bool = False, obj: ndarray = None) -> ndarray: return self.readNArray(cls, self.readUIntV8X(endian), sizeOf, obj)
+    def readNArray(self, cls: object, count: int, sizeOf: int = 0, obj: ndarray = None) -> ndarray:
+        dt = _dtypeGet(cls, sizeOf or -1)
+        if obj is None: obj = empty(count, dtype=dt)
+        # a non-contiguous obj would reshape to a copy, so read into a scratch array and assign through
+        elif not obj.flags.c_contiguous: obj.flat[:count] = self.readNArray(cls, count, sizeOf); return obj
+        size = dt.itemsize * count
+        if size and self.f.readinto(obj.reshape(-1).view(uint8)[:size]) != size: raise Exception('read past end of stream')
+        return obj
+
+    # struct : array - view
+    def readL8SView(self, cls: object, sizeOf: int = 0) -> StructView: return StructView(cls, self.readNArray(cls, self.readByte(), sizeOf))
+    def readL16SView(self, cls: object, sizeOf: int = 0, endian: bool = False) -> StructView: return StructView(cls, self.readNArray(cls, self.readUInt16X(endian), sizeOf))
+    def readL32SView(self, cls: object, sizeOf: int = 0, endian: bool = False) -> StructView: return StructView(cls, self.readNArray(cls, self.readUInt32X(endian), sizeOf))
+    def readSView(self, cls: object, count: int, sizeOf: int = 0) -> StructView: return StructView(cls, self.readNArray(cls, count, sizeOf))
+
     # struct : array - each
     def readSEach(self, cls: object, count: int) -> list[object]: return [self.readS(cls) for i in range(count)] if count else []
     def readTEach(self, cls: object, sizeOf: int, count: int) -> list[object]: return [self.readT(cls, sizeOf) for i in range(count)] if count else []
@@ -288,11 +378,7 @@ class BinaryReader:
     def readL32SList(self, cls: object, sizeOf: int = 0, endian: bool = False, obj: list[object] = None) -> list[object]: return self.readSList(cls, self.readUInt32X(endian), sizeOf, obj)
     def readLV7SList(self, cls: object, sizeOf: int = 0, endian: bool = False, obj: list[object] = None) -> list[object]: return self.readSList(cls, self.readIntV7X(endian), sizeOf, obj)
     def readLV8SList(self, cls: object, sizeOf: int = 0, endian: bool = False, obj: list[object] = None) -> list[object]: return self.readSList(cls, self.readUIntV8X(endian), sizeOf, obj)
-    def readSList(self, cls: object, count: int, sizeOf: int = 0, obj: list[object] = None) -> list[object]:
-        if not obj: return [self.readS(cls) for i in range(count)] if count else []
-        if count > 0:
-            for i in range(count): obj[i] = self.readS(cls)
-        return obj
+    def readSList(self, cls: object, count: int, sizeOf: int = 0, obj: list[object] = None) -> list[object]: return self.readSArray(cls, count, sizeOf, obj)
 
     # struct : many - factory
     def readL8FMany(self, clsKey: object, keyFactory: callable, valueFactory: callable, endian: bool = False, obj: object = None) -> dict[object, object]: return self.readFMany(clsKey, keyFactory, valueFactory, self.readByte(), obj)
@@ -377,3 +463,170 @@ class BinaryReader:
     def readQuaternion(self) -> quaternion: v = [self.readSingle(), self.readSingle(), self.readSingle(), self.readSingle()]; return quaternion(v[3], v[0], v[1], v[2])
     def readQuaternionWFirst(self) -> quaternion: return quaternion(self.readSingle(), self.readSingle(), self.readSingle(), self.readSingle())
     def readHalfQuaternion(self) -> quaternion: v = [self.readHalf(), self.readHalf(), self.readHalf(), self.readHalf()]; return quaternion(v[3], v[0], v[1], v[2])
+
+#region MemoryReader
+
+# MemoryFile - a minimal file object over a buffer with an integer cursor
+class MemoryFile:
+    def __init__(self, buf: memoryview, owner: mmap.mmap = None): self.buf = buf; self.pos = 0; self.owner = owner
+    def readable(self) -> bool: return True
+    def seekable(self) -> bool: return True
+    def tell(self) -> int: return self.pos
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET: self.pos = offset
+        elif whence == os.SEEK_CUR: self.pos += offset
+        elif whence == os.SEEK_END: self.pos = len(self.buf) + offset
+        return self.pos
+    def read(self, size: int = -1) -> bytes:
+        p = self.pos; end = len(self.buf) if size is None or size < 0 else min(p + size, len(self.buf))
+        if end <= p: return b''
+        if Metrics.enabled: Metrics.count('reader.bytes', end - p)
+        self.pos = end; return bytes(self.buf[p:end])
+    def readinto(self, data: bytearray) -> int:
+        p = self.pos; n = max(0, min(len(data), len(self.buf) - p))
+        memoryview(data)[:n] = self.buf[p:p+n]; self.pos = p + n
+        if Metrics.enabled: Metrics.count('reader.bytes', n)
+        return n
+    def readline(self) -> bytes:
+        p = self.pos; buf = self.buf; end = p
+        while end < len(buf):
+            i = bytes(buf[end:end+256]).find(b'\n')
+            if i >= 0: end += i + 1; break
+            end += 256
+        return self.read(end - p)
+    def close(self) -> None:
+        self.buf.release()
+        # slices handed out by readBytes keep the mapping alive; it is then unmapped when they are collected
+        if self.owner:
+            try: self.owner.close()
+            except BufferError: pass
+
+def _memRead(s: Struct) -> callable:
+    size = s.size; unpackFrom = s.unpack_from
+    def _(self):
+        f = self.f; p = f.pos; f.pos = p + size
+        return unpackFrom(f.buf, p)[0]
+    return _
+
+def _memReadX(le: Struct, be: Struct) -> callable:
+    size = le.size; leUnpackFrom = le.unpack_from; beUnpackFrom = be.unpack_from
+    def _(self, endian: bool):
+        f = self.f; p = f.pos; f.pos = p + size
+        return (beUnpackFrom if endian else leUnpackFrom)(f.buf, p)[0]
+    return _
+
+_b = Struct('<b'); _B = Struct('<B')
+_h = Struct('<h'); _H = Struct('<H'); _i = Struct('<i'); _I = Struct('<I'); _q = Struct('<q'); _Q = Struct('<Q'); _f = Struct('<f'); _d = Struct('<d')
+_hE = Struct('>h'); _HE = Struct('>H'); _iE = Struct('>i'); _IE = Struct('>I'); _qE = Struct('>q'); _QE = Struct('>Q'); _fE = Struct('>f'); _dE = Struct('>d')
+
+# MemoryReader - a BinaryReader over an in-memory buffer or a memory-mapped file.
+# Primitives unpack in place with a cursor, and readBytes/readToEnd return zero-copy memoryview slices of the mapping.
+class MemoryReader(BinaryReader):
+    def __init__(self, f, length: int = None, leaveOpen: bool = False):
+        self.source = None; owner = None
+        if isinstance(f, (bytes, bytearray, memoryview, mmap.mmap)): buf = memoryview(f)
+        elif isinstance(f, BytesIO): buf = f.getbuffer()
+        else:
+            self.source = f
+            owner = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else None
+            buf = memoryview(owner) if owner else memoryview(b'')
+        buf = buf.cast('B') if buf.format != 'B' or buf.ndim != 1 else buf
+        super().__init__(MemoryFile(buf, owner), len(buf) if length is None else length, leaveOpen)
+    def __exit__(self, type, value, traceback): self.dispose()
+    def dispose(self):
+        self.f.close()
+        if not self.leaveOpen and self.source: self.source.close()
+
+    # position
+    def tell(self) -> int: return self.f.pos
+    def seek(self, offset: int) -> 'MemoryReader': self.f.pos = offset; return self
+    def skip(self, count: int) -> 'MemoryReader': self.f.pos += count; return self
+    def align(self, align: int = 4) -> 'MemoryReader': align -= 1; self.f.pos = (self.f.pos + align) & ~align; return self
+    def atEnd(self, end: int = None) -> bool: return self.f.pos >= (end or self.length)
+
+    # bytes
+    def readBytes(self, size: int) -> memoryview:
+        f = self.f; p = f.pos; f.pos = p + size; z = f.buf[p:p+size]
+        if Metrics.enabled: Metrics.count('reader.bytes', len(z))
+        return z
+    def readL8Bytes(self, maxLength: int = 0, endian: bool = False) -> memoryview:
+        length = self.readByte()
+        if maxLength > 0 and length > maxLength: raise Exception('byte length exceeds maximum length')
+        return self.readBytes(length) if length > 0 else None
+    def readL16Bytes(self, maxLength: int = 0, endian: bool = False) -> memoryview:
+        length = self.readUInt16X(endian)
+        if maxLength > 0 and length > maxLength: raise Exception('byte length exceeds maximum length')
+        return self.readBytes(length) if length > 0 else None
+    def readL32Bytes(self, maxLength: int = 0, endian: bool = False) -> memoryview:
+        length = self.readUInt32X(endian)
+        if maxLength > 0 and length > maxLength: raise Exception('byte length exceeds maximum length')
+        return self.readBytes(length) if length > 0 else None
+    def readToEnd(self) -> memoryview: return self.readBytes(self.length - self.f.pos)
+
+    # primatives : normal
+    def readBoolean(self) -> bool: f = self.f; p = f.pos; f.pos = p + 1; return f.buf[p] != 0
+    def readByte(self) -> int: f = self.f; p = f.pos; f.pos = p + 1; return f.buf[p]
+    readDouble = _memRead(_d)
+    readSByte = _memRead(_b)
+    readInt16 = _memRead(_h)
+    readInt32 = _memRead(_i)
+    readInt64 = _memRead(_q)
+    readSingle = _memRead(_f)
+    readUInt16 = _memRead(_H)
+    readUInt32 = _memRead(_I)
+    readUInt64 = _memRead(_Q)
+
+    # primatives : endian
+    readDoubleE = _memRead(_dE)
+    readInt16E = _memRead(_hE)
+    readInt32E = _memRead(_iE)
+    readInt64E = _memRead(_qE)
+    readSingleE = _memRead(_fE)
+    readUInt16E = _memRead(_HE)
+    readUInt32E = _memRead(_IE)
+    readUInt64E = _memRead(_QE)
+
+    # primatives : endianX
+    readDoubleX = _memReadX(_d, _dE)
+    readInt16X = _memReadX(_h, _hE)
+    readInt32X = _memReadX(_i, _iE)
+    readInt64X = _memReadX(_q, _qE)
+    readSingleX = _memReadX(_f, _fE)
+    readUInt16X = _memReadX(_H, _HE)
+    readUInt32X = _memReadX(_I, _IE)
+    readUInt64X = _memReadX(_Q, _QE)
+
+    # primatives : specialized
+    def readIntV7(self) -> int:
+        f = self.f; buf = f.buf; p = f.pos; r = 0; b = 0
+        while True:
+            v = buf[p]; p += 1; r |= (v & 0x7f) << b; b += 7
+            if (v & 0x80) == 0: break
+        f.pos = p
+        return r
+    def readUIntV8(self) -> int:
+        f = self.f; buf = f.buf; p = f.pos; b0 = buf[p]
+        if (b0 & 0x80) == 0: f.pos = p + 1; return b0
+        b1 = buf[p + 1]
+        if (b0 & 0x40) == 0: f.pos = p + 2; return ((b0 & 0x7F) << 8) | b1
+        f.pos = p + 4; return ((((b0 & 0x3F) << 8) | b1) << 16) | _H.unpack_from(buf, p + 2)[0]
+    def readBool32(self) -> bool: return self.readUInt32() != 0
+    def readGuid(self) -> bytes: return bytes(self.readBytes(16))
+
+    # struct : single
+    def readP(self, cls: callable, pat: str) -> object: cls = cls or (lambda s: s[0]); f = self.f; z = unpack_from(pat, f.buf, f.pos); f.pos += calcsize(pat); return cls(z[0] if len(z) == 1 else z)
+    def readS(self, cls: object, sizeOf: int = -1) -> object: s = _structCompile(cls, sizeOf); f = self.f; z = s.unpack_from(f.buf, f.pos); f.pos += s.size; return cls(z[0] if len(z) == 1 else z)
+
+    # struct : array - numpy
+    def readNArray(self, cls: object, count: int, sizeOf: int = 0, obj: ndarray = None) -> ndarray:
+        dt = _dtypeGet(cls, sizeOf or -1); f = self.f; p = f.pos; f.pos = p + dt.itemsize * count
+        z = frombuffer(f.buf, dtype=dt, count=count, offset=p)
+        if obj is None: return z
+        obj[:count] = z; return obj
+
+    # numerics
+    def readVector2(self) -> ndarray: f = self.f; p = f.pos; f.pos = p + 8; return array(unpack_from('<2f', f.buf, p))
+    def readVector3(self) -> ndarray: f = self.f; p = f.pos; f.pos = p + 12; return array(unpack_from('<3f', f.buf, p))
+    def readVector4(self) -> ndarray: f = self.f; p = f.pos; f.pos = p + 16; return array(unpack_from('<4f', f.buf, p))
+
+#endregion
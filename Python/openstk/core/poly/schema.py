@@ -0,0 +1,61 @@
+from enum import Enum
+from struct import Struct
+from numpy import ndarray, dtype
+from openstk.core.poly.reader import _patternDtype, StructView
+
+# Schema - a class's struct layout compiled once: the Struct, the numpy dtype and the record fields
+class Schema:
+    def __init__(self, cls: type, pattern: str, fields: tuple[str]):
+        self.cls = cls
+        self.pattern = pattern
+        self.struct = Struct(pattern)
+        self.size = self.struct.size
+        self.fields = fields
+        z = _patternDtype(pattern)
+        self.dtype = dtype({'names': list(fields), 'formats': [z.fields[s][0] for s in z.names], 'offsets': [z.fields[s][1] for s in z.names], 'itemsize': z.itemsize}) \
+            if z.names and len(z.names) == len(fields) else z
+        self._toTuple = getattr(cls, 'toTuple', None)
+    def __repr__(self): return f'Schema[{self.cls.__name__}]({self.pattern})'
+
+    # values
+    def unpack(self, data: bytes, offset: int = 0) -> object: z = self.struct.unpack_from(data, offset); return self.cls(z[0] if len(z) == 1 else z)
+    def tuple(self, value: object) -> tuple:
+        z = self._toTuple(value) if self._toTuple else (getattr(value, f) for f in self.fields)
+        return tuple(s.value if isinstance(s, Enum) else s for s in z)
+    def pack(self, value: object) -> bytes: return self.struct.pack(*self.tuple(value))
+    def packInto(self, data: bytearray, offset: int, value: object) -> None: self.struct.pack_into(data, offset, *self.tuple(value))
+
+    # reader / writer
+    def read(self, r: object) -> object: return self.unpack(r.readBytes(self.size))
+    def readArray(self, r: object, count: int) -> ndarray: return r.readNArray(self.cls, count)
+    def readView(self, r: object, count: int) -> StructView: return StructView(self.cls, r.readNArray(self.cls, count))
+    def write(self, w: object, value: object) -> None: w.write(self.pack(value))
+    def writeArray(self, w: object, values: object) -> None:
+        if isinstance(values, StructView): values = values.data
+        if isinstance(values, ndarray): w.write(values.astype(self.dtype, copy=False).tobytes()); return
+        data = bytearray(self.size * len(values)); packInto = self.struct.pack_into; size = self.size
+        for i, s in enumerate(values): packInto(data, i * size, *self.tuple(s))
+        w.write(data)
+
+# schema - class decorator compiling the class's layout into a Schema, and rebuilding the class with __slots__ for its fields.
+# Classes without an __init__ get one assigning the unpacked tuple to the fields in order; classes whose fields are not a flat
+# mapping of the tuple (nested records, remapped enums) keep their own __init__ and may define toTuple() for writing.
+def schema(pattern: str, *fields: str, slots: tuple[str] = ()) -> callable:
+    def _(cls: type) -> type:
+        body = dict(cls.__dict__)
+        for s in ('__dict__', '__weakref__'): body.pop(s, None)
+        names = tuple(dict.fromkeys(fields + tuple(slots)))
+        for s in names:
+            if s in body: raise Exception(f'{cls.__name__}.{s} conflicts with a schema field')
+        body['__slots__'] = names
+        if '__init__' not in body:
+            def __init__(self, tuple: tuple = None):
+                if tuple is None: return
+                if len(fields) == 1: tuple = (tuple,)
+                for f, v in zip(fields, tuple): setattr(self, f, v)
+            body['__init__'] = __init__
+        klass = type(cls)(cls.__name__, cls.__bases__, body)
+        klass._schema = Schema(klass, pattern, fields)
+        klass._struct = (pattern, klass._schema.size)
+        return klass
+    return _
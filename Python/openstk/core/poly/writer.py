@@ -1,147 +1,271 @@
-import os, numpy as np
-from struct import unpack
+import os, sys
+from numpy import ndarray, array, asarray, uint8
+from quaternion import quaternion
+from struct import Struct, calcsize
 from io import BytesIO
+from decimal import Decimal
+from openstk.core.util import _throw
+from openstk.core.poly.reader import _structCompile, _dtypeGet, StructView, _b, _B, _h, _H, _i, _I, _q, _Q, _f, _d, _hE, _HE, _iE, _IE, _qE, _QE, _fE, _dE
 
-# Writer
+def _write(s: Struct) -> callable:
+    size = s.size; packInto = s.pack_into
+    def _(self, value):
+        n = self._n
+        if n + size > len(self._buf): self.flush(); n = 0
+        packInto(self._buf, n, value); self._n = n + size
+    return _
+
+def _writeX(le: Struct, be: Struct) -> callable:
+    size = le.size; lePackInto = le.pack_into; bePackInto = be.pack_into
+    def _(self, value, endian: bool = True):
+        n = self._n
+        if n + size > len(self._buf): self.flush(); n = 0
+        (bePackInto if endian else lePackInto)(self._buf, n, value); self._n = n + size
+    return _
+
+_patStructs: dict[str, Struct] = {}
+def _patStruct(pat: str) -> Struct:
+    if pat in _patStructs: return _patStructs[pat]
+    z = _patStructs[pat] = Struct(pat); return z
+
+_e = Struct('<e')
+_2f = Struct('<2f'); _3f = Struct('<3f'); _4f = Struct('<4f'); _2e = Struct('<2e'); _3e = Struct('<3e'); _4e = Struct('<4e')
+
+# Writer - mirrors BinaryReader, packing into an internal buffer that is flushed to the stream in large writes
 class Writer:
-    def __init__(self, f): self.f = f; self.__update()
+    def __init__(self, f, leaveOpen: bool = False, bufferSize: int = 65536): self.f = f; self.leaveOpen = leaveOpen; self._buf = bytearray(max(bufferSize, 64)); self._n = 0
     def __enter__(self): return self
-    def __exit__(self, type, value, traceback): self.f.close()
-    def __update(self):
-        f = self.f
-        pos = f.tell()
-        self.length = f.seek(0, os.SEEK_END)
-        f.seek(pos, os.SEEK_SET)
+    def __exit__(self, type, value, traceback): self.dispose()
+    def dispose(self):
+        self.flush()
+        if not self.leaveOpen: self.f.close()
+    def flush(self) -> None:
+        if self._n: self.f.write(memoryview(self._buf)[:self._n]); self._n = 0
+    def _reserve(self, size: int) -> int:
+        n = self._n
+        if n + size > len(self._buf):
+            self.flush(); n = 0
+            if size > len(self._buf): self._buf = bytearray(size)
+        self._n = n + size
+        return n
 
     # base
-    def write(self, bytes: bytearray): return self.f.write(size)
-    def length(self): return self.length
-    def copyTo(self, destination: BytesIO, resetAfter: bool = False): raise NotImplementedError()
-    # def writeLine(self, value) -> str: return self.f.writeline(value.decode('utf-8'))
+    @property
+    def length(self) -> int: self.flush(); f = self.f; pos = f.tell(); end = f.seek(0, os.SEEK_END); f.seek(pos, os.SEEK_SET); return end
+    def copyTo(self, destination: BytesIO, resetAfter: bool = False) -> None: raise NotImplementedError()
+
+    # string
+    def writeChar(self, value: chr) -> None: self.write(value.encode('utf-8'))
+    def writeChars(self, value: list[chr]) -> None: self.write(''.join(value).encode('utf-8'))
+    def writeString(self, value: str) -> None:
+        data = value.encode('utf-8') if value else b''
+        self.writeIntV7(len(data)); self.write(data)
+    def writeLine(self, value: str) -> None: self.write(f'{value}\n'.encode('utf-8'))
+
+    # position
+    def align(self, align: int = 4) -> 'Writer': pad = -self.tell() % align; self.write(bytes(pad)) if pad else None; return self
+    def tell(self) -> int: return self.f.tell() + self._n
+    def seek(self, offset: int) -> 'Writer': self.flush(); self.f.seek(offset, os.SEEK_SET); return self
+    def seekAndAlign(self, offset: int, align: int = 4) -> 'Writer': return self.seek(offset + align - (offset % align) if offset % align else offset)
+    def skip(self, count: int) -> 'Writer': self.flush(); self.f.seek(count, os.SEEK_CUR); return self
+    def skipAndAlign(self, count: int, align: int = 4) -> 'Writer': offset = self.tell() + count; return self.seek(offset + align - (offset % align) if offset % align else offset)
+    def end(self, offset: int) -> 'Writer': self.flush(); self.f.seek(offset, os.SEEK_END); return self
+
+    # bytes
+    def write(self, data: bytes) -> None:
+        size = len(data)
+        if size >= len(self._buf) >> 1: self.flush(); self.f.write(data); return
+        n = self._reserve(size); self._buf[n:n+size] = data
+    def writeBytes(self, data: bytes) -> None: self.write(data)
+    def writeL8Bytes(self, data: bytes, endian: bool = False) -> None: self.writeByte(len(data) if data else 0); self.write(data) if data else None
+    def writeL16Bytes(self, data: bytes, endian: bool = False) -> None: self.writeUInt16X(len(data) if data else 0, endian); self.write(data) if data else None
+    def writeL32Bytes(self, data: bytes, endian: bool = False) -> None: self.writeUInt32X(len(data) if data else 0, endian); self.write(data) if data else None
 
     # primatives : normal
-    def writeDouble(self, value: float): self.f.write(value.to_bytes(8, 'little'))
-    def writeSByte(self, value: int): self.f.write(value.to_bytes(1, 'little', signed=True))
-    def writeInt16(self, value: int): self.f.write(value.to_bytes(2, 'little', signed=True))
-    def writeInt32(self, value: int): self.f.write(value.to_bytes(4, 'little', signed=True))
-    def writeInt64(self, value: int): self.f.write(value.to_bytes(8, 'little', signed=True))
-    def writeSingle(self, value: float): self.f.write(value.to_bytes(4, 'little'))
-    def writeByte(self, value: int): self.f.write(value.to_bytes(1, 'little', signed=False))
-    def writeUInt16(self, value: int): self.f.write(value.to_bytes(2, 'little', signed=False))
-    def writeUInt32(self, value: int): self.f.write(value.to_bytes(4, 'little', signed=False))
-    def writeUInt64(self, value: int): self.f.write(value.to_bytes(8, 'little', signed=False))
+    def writeBoolean(self, value: bool) -> None: self.writeByte(1 if value else 0)
+    writeByte = _write(_B)
+    writeDouble = _write(_d)
+    writeSByte = _write(_b)
+    writeInt16 = _write(_h)
+    writeInt32 = _write(_i)
+    writeInt64 = _write(_q)
+    writeSingle = _write(_f)
+    writeUInt16 = _write(_H)
+    writeUInt32 = _write(_I)
+    writeUInt64 = _write(_Q)
+    def writeDecimal(self, value: Decimal) -> None: raise Exception('not implemented')
 
     # primatives : endian
-    def writeDoubleE(self, value: float): self.f.write(value.to_bytes(8, 'big'))
-    def writeInt16E(self, value: int): self.f.write(value.to_bytes(2, 'big', signed=True))
-    def writeInt32E(self, value: int): self.f.write(value.to_bytes(4, 'big', signed=True))
-    def writeInt64E(self, value: int): self.f.write(value.to_bytes(8, 'big', signed=True))
-    def writeSingleE(self, value: float): self.f.write(value.to_bytes(4, 'big'))
-    def writeUInt16E(self, value: int): self.f.write(value.to_bytes(2, 'big', signed=False))
-    def writeUInt32E(self, value: int): self.f.write(value.to_bytes(4, 'big', signed=False))
-    def writeUInt64E(self, value: int): self.f.write(value.to_bytes(8, 'big', signed=False))
+    writeDoubleE = _write(_dE)
+    writeInt16E = _write(_hE)
+    writeInt32E = _write(_iE)
+    writeInt64E = _write(_qE)
+    writeSingleE = _write(_fE)
+    writeUInt16E = _write(_HE)
+    writeUInt32E = _write(_IE)
+    writeUInt64E = _write(_QE)
+    def writeDecimalE(self, value: Decimal) -> None: raise Exception('not implemented')
 
     # primatives : endianX
-    def writeDoubleX(self, value: float, endian: bool = True): self.f.write(value.to_bytes(8, 'big' if endian else 'little'))
-    def writeInt16X(self, value: int, endian: bool = True): self.f.write(value.to_bytes(2, 'big' if endian else 'little', signed=True))
-    def writeInt32X(self, value: int, endian: bool = True): self.f.write(value.to_bytes(4, 'big' if endian else 'little', signed=True))
-    def writeInt64X(self, value: int, endian: bool = True): self.f.write(value.to_bytes(8, 'big' if endian else 'little', signed=True))
-    def writeSingleX(self, value: float, endian: bool = True): self.f.write(value.to_bytes(4, 'big' if endian else 'little'))
-    def writeUInt16X(self, value: int, endian: bool = True): self.f.write(value.to_bytes(2, 'big' if endian else 'little', signed=False))
-    def writeUInt32X(self, value: int, endian: bool = True): self.f.write(value.to_bytes(4, 'big' if endian else 'little', signed=False))
-    def writeUInt64X(self, value: int, endian: bool = True): self.f.write(value.to_bytes(8, 'big' if endian else 'little', signed=False))
+    writeDoubleX = _writeX(_d, _dE)
+    writeInt16X = _writeX(_h, _hE)
+    writeInt32X = _writeX(_i, _iE)
+    writeInt64X = _writeX(_q, _qE)
+    writeSingleX = _writeX(_f, _fE)
+    writeUInt16X = _writeX(_H, _HE)
+    writeUInt32X = _writeX(_I, _IE)
+    writeUInt64X = _writeX(_Q, _QE)
+    def writeDecimalX(self, value: Decimal, endian: bool = True) -> None: raise Exception('not implemented')
 
     # primatives : specialized
-    def writeBool32(self, value: bool): elf.f.write((1 if value else 0).to_bytes(4, 'little', signed=False))
-    def writeGuid(self, value: bytearray): return self.f.write(value)
-    def writeCInt32(self, value: int): raise NotImplementedError()
+    def writeIntV7(self, value: int) -> None:
+        data = bytearray()
+        while value >= 0x80: data.append((value & 0x7f) | 0x80); value >>= 7
+        data.append(value); self.write(data)
+    def writeIntV7X(self, value: int, endian: bool) -> None: self.writeIntV7(value) if not endian else _throw('NotImplementedError')
+    def writeUIntV8(self, value: int) -> None:
+        if value < 0x80: self.writeByte(value)
+        elif value < 0x4000: self.writeByte(0x80 | (value >> 8)); self.writeByte(value & 0xFF)
+        elif value < 0x40000000: self.writeByte(0xC0 | (value >> 24)); self.writeByte((value >> 16) & 0xFF); self.writeUInt16(value & 0xFFFF)
+        else: raise Exception('value exceeds UIntV8 range')
+    def writeUIntV8X(self, value: int, endian: bool) -> None: self.writeUIntV8(value) if not endian else _throw('NotImplementedError')
+    def writeUIntV8a(self, value: int) -> None:
+        if value < 0xFF: self.writeByte(value)
+        else: self.writeByte(0xFF); self.writeUInt32(value)
+    def writeUIntV8aX(self, value: int, endian: bool) -> None:
+        if value < 0xFF: self.writeByte(value)
+        else: self.writeByte(0xFF); self.writeUInt32X(value, endian)
+    def writeBool32(self, value: bool) -> None: self.writeUInt32(1 if value else 0)
+    def writeGuid(self, value: bytes) -> None: self.write(value)
 
+    # string : fixed / variable / length-prefixed
+    def writeFXString(self, encoding: str, value: str, length: int) -> None: data = value.encode(encoding) if value else b''; self.write(data[:length].ljust(length, b'\x00'))
+    def writeVXString(self, encoding: str, value: str, stopValue: bytes = b'\x00') -> None: self.write(value.encode(encoding) + stopValue)
+    def writeL8XString(self, encoding: str, value: str, endian: bool = False) -> None: self.writeL8Bytes(value.encode(encoding) if value else None, endian)
+    def writeL16XString(self, encoding: str, value: str, endian: bool = False) -> None: self.writeL16Bytes(value.encode(encoding) if value else None, endian)
+    def writeL32XString(self, encoding: str, value: str, endian: bool = False) -> None: self.writeL32Bytes(value.encode(encoding) if value else None, endian)
 
-    # position
-    def align(self, align: int = 4): align -= 1; self.f.seek((self.f.tell() + align) & ~align, os.SEEK_SET); return self
-    def tell(self): return self.f.tell()
-    def seek(self, offset: int): self.f.seek(offset, os.SEEK_SET); return self
-    def seekAndAlign(self, offset: int, align: int = 4): self.f.seek(offset + align - (offset % align) if offset % align else offset, os.SEEK_SET); return self
-    def skip(self, count: int): self.f.seek(count, os.SEEK_CUR); return self
-    def skipAndAlign(self, count: int, align: int = 4): offset = self.f.tell() + count; self.f.seek(offset + align - (offset % align) if offset % align else offset, os.SEEK_CUR); return self
-    def end(self, offset: int): self.f.seek(offset, os.SEEK_END); return self
-
-
-    # string : chars
-    def writeCString(self, value: str) -> None: pass
-    def writeFString(self, value: str, length: int, zstring: bool = False) -> None: pass
-    def writeZAString(self, value: str, length: int = 65535) -> None: pass
-    # string : encoding
-    # def writeL8Encoding(self, encoding: str = None): return self.f.write(int.from_bytes(self.f.write(1), 'little')).decode('ascii' if not encoding else encoding)
-    # def writeL16Encoding(self, encoding: str = None): return self.f.write(int.from_bytes(self.f.write(2), 'little')).decode('ascii' if not encoding else encoding)
-    # def writeL32Encoding(self, encoding: str = None): return self.f.write(int.from_bytes(self.f.write(4), 'little')).decode('ascii' if not encoding else encoding)
-
-    
-    # struct : single  - https://docs.python.org/3/library/struct.html 
-    def writeF(self, cls: object, value: object, factory: callable) -> object: self.f.write(factory(self))
-    def writeS(self, cls: object, value: object) -> object: pattern, size = cls._struct; cls(unpack(pattern, self.f.write(size)))
-    def writeSAndVerify(self, cls: object, value: object, sizeOf: int) -> object: pattern, size = cls._struct; cls(unpack(pattern, self.f.write(size)))
-    def writeT(self, cls: object, value: object, sizeOf: int) -> object: unpack(cls, self.f.write(sizeOf))[0]
+    # string : wide
+    def writeFWString(self, value: str, length: int) -> None: self.writeFXString('utf-16-le', value, length)
+    def writeVWString(self, value: str, stopValue: bytes = b'\x00') -> None: self.writeVXString('utf-32-le', value, stopValue * 4 if len(stopValue) == 1 else stopValue)
+    def writeL8WString(self, value: str, endian: bool = False) -> None: self.writeL8XString('utf-16-le', value, endian)
+    def writeL16WString(self, value: str, endian: bool = False) -> None: self.writeL16XString('utf-16-le', value, endian)
+    def writeL32WString(self, value: str, endian: bool = False) -> None: self.writeL32XString('utf-16-le', value, endian)
+
+    # string : utf8
+    def writeFUString(self, value: str, length: int) -> None: self.writeFXString('utf-8', value, length)
+    def writeVUString(self, value: str, stopValue: bytes = b'\x00') -> None: self.writeVXString('utf-8', value, stopValue)
+    def writeL8UString(self, value: str, endian: bool = False) -> None: self.writeL8XString('utf-8', value, endian)
+    def writeL16UString(self, value: str, endian: bool = False) -> None: self.writeL16XString('utf-8', value, endian)
+    def writeL32UString(self, value: str, endian: bool = False) -> None: self.writeL32XString('utf-8', value, endian)
+
+    # string : ascii (latin1)
+    def writeFAString(self, value: str, length: int) -> None: self.writeFXString('latin1', value, length)
+    def writeVAString(self, value: str, stopValue: bytes = b'\x00') -> None: self.writeVXString('latin1', value, stopValue)
+    def writeL8AString(self, value: str, endian: bool = False) -> None: self.writeL8XString('latin1', value, endian)
+    def writeL16AString(self, value: str, endian: bool = False) -> None: self.writeL16XString('latin1', value, endian)
+    def writeL32AString(self, value: str, endian: bool = False) -> None: self.writeL32XString('latin1', value, endian)
+    def writeVAStringList(self, value: list[str], stopValue: bytes = b'\x00') -> None: self.write(b''.join(s.encode('latin1') + stopValue for s in value))
+
+    # struct : single
+    def writeF(self, factory: callable, value: object) -> None: factory(self, value)
+    def writeP(self, pat: str, value: object) -> None: s = _patStruct(pat); n = self._reserve(s.size); s.pack_into(self._buf, n, *(value if isinstance(value, (tuple, list)) else (value,)))
+    def writeS(self, cls: object, value: object, sizeOf: int = -1) -> None:
+        s = _structCompile(cls, sizeOf); schema = getattr(cls, '_schema', None)
+        n = self._reserve(s.size); s.pack_into(self._buf, n, *(schema.tuple(value) if schema else value if isinstance(value, tuple) else (value,)))
 
     # struct : array - factory
-    def writeL8FArray(self, cls: object, value: object, factory: callable, endian: bool = False) -> list[object]: return self.writeFArray(cls, factory, source.writeByte())
-    def writeL16FArray(self, cls: object, value: object, factory: callable, endian: bool = False) -> list[object]: return self.writeFArray(cls, factory, source.writeUInt16E(endian))
-    def writeL32FArray(self, cls: object, value: object, factory: callable, endian: bool = False) -> list[object]: return self.writeFArray(cls, factory, source.writeUInt32E(endian))
-    def writeC32FArray(self, cls: object, value: object, factory: callable, endian: bool = False) -> list[object]: return self.writeFArray(cls, factory, source.writeCInt32E(endian))
-    def writeFArray(self, cls: object, value: object, factory: callable, count: int) -> list[object]: return [self.writeF(cls, factory) for x in range(count)] if count else []
+    def writeL8FArray(self, factory: callable, value: list[object], endian: bool = False) -> None: self.writeByte(len(value)); self.writeFArray(factory, value)
+    def writeL16FArray(self, factory: callable, value: list[object], endian: bool = False) -> None: self.writeUInt16X(len(value), endian); self.writeFArray(factory, value)
+    def writeL32FArray(self, factory: callable, value: list[object], endian: bool = False) -> None: self.writeUInt32X(len(value), endian); self.writeFArray(factory, value)
+    def writeLV7FArray(self, factory: callable, value: list[object], endian: bool = False) -> None: self.writeIntV7X(len(value), endian); self.writeFArray(factory, value)
+    def writeLV8FArray(self, factory: callable, value: list[object], endian: bool = False) -> None: self.writeUIntV8X(len(value), endian); self.writeFArray(factory, value)
+    def writeFArray(self, factory: callable, value: list[object]) -> None:
+        for s in value: factory(self, s)
+    def writeFIArray(self, factory: callable, value: list[object]) -> None:
+        for i, s in enumerate(value): factory(self, s, i)
+
+    # struct : array - pattern / primative
+    def writeL8PArray(self, pat: str, value: list[object]) -> None: self.writeByte(len(value)); self.writePArray(pat, value)
+    def writeL16PArray(self, pat: str, value: list[object], endian: bool = False) -> None: self.writeUInt16X(len(value), endian); self.writePArray(pat, value)
+    def writeL32PArray(self, pat: str, value: list[object], endian: bool = False) -> None: self.writeUInt32X(len(value), endian); self.writePArray(pat, value)
+    def writeLV7PArray(self, pat: str, value: list[object], endian: bool = False) -> None: self.writeIntV7X(len(value), endian); self.writePArray(pat, value)
+    def writeLV8PArray(self, pat: str, value: list[object], endian: bool = False) -> None: self.writeUIntV8X(len(value), endian); self.writePArray(pat, value)
+    def writePArray(self, pat: str, value: list[object]) -> None:
+        if isinstance(value, ndarray): self.writeNArray(pat, value); return
+        s = _patStruct(pat); size = s.size; packInto = s.pack_into; data = bytearray(size * len(value))
+        for i, v in enumerate(value): packInto(data, i * size, *(v if isinstance(v, (tuple, list)) else (v,)))
+        self.write(data)
 
     # struct : array - struct
-    def writeL8SArray(self, cls: object, value: object, endian: bool = False) -> list[object]: return self.writeSArray(cls, source.writeByte())
-    def writeL16SArray(self, cls: object, value: object, endian: bool = False) -> list[object]: return self.writeSArray(cls, source.writeUInt16E(endian))
-    def writeL32SArray(self, cls: object, value: object, endian: bool = False) -> list[object]: return self.writeSArray(cls, source.writeUInt32E(endian))
-    def writeC32SArray(self, cls: object, value: object, endian: bool = False) -> list[object]: return self.writeSArray(cls, source.writeCInt32E(endian))
-    def writeSArray(self, cls: object, value: object, count: int) -> list[object]: return [self.writeS(cls) for x in range(count)] if count else []
-
-    # struct : array - type
-    def writeL8TArray(self, cls: object, value: object, sizeOf: int, endian: bool = False) -> list[object]: return self.writeTArray(cls, sizeOf, source.writeByte())
-    def writeL16TArray(self, cls: object, value: object, sizeOf: int, endian: bool = False) -> list[object]: return self.writeTArray(cls, sizeOf, source.writeUInt16(endian))
-    def writeL32TArray(self, cls: object, value: object, sizeOf: int, endian: bool = False) -> list[object]: return self.writeTArray(cls, sizeOf, source.writeUInt32(endian))
-    def writeC32TArray(self, cls: object, value: object, sizeOf: int, endian: bool = False) -> list[object]: return self.writeTArray(cls, sizeOf, source.writeCInt32(endian))
-    def writeTArray(self, cls: object, value: object, sizeOf: int, count: int) -> list[object]: return [self.writeT(cls, sizeOf) for x in range(count)] if count else []
-
-    # struct : each
-    # def writeSEach(self, cls: object, value: object, count: int) -> list[object]: return [self.writeS(cls) for x in range(count)] if count else []
-    # def writeTEach(self, cls: object, value: object, sizeOf: int, count: int) -> list[object]: return [self.writeT(cls, sizeOf) for x in range(count)] if count else []
-    
+    def writeL8SArray(self, cls: object, value: list[object], sizeOf: int = 0) -> None: self.writeByte(len(value)); self.writeSArray(cls, value, sizeOf)
+    def writeL16SArray(self, cls: object, value: list[object], sizeOf: int = 0, endian: bool = False) -> None: self.writeUInt16X(len(value), endian); self.writeSArray(cls, value, sizeOf)
+    def writeL32SArray(self, cls: object, value: list[object], sizeOf: int = 0, endian: bool = False) -> None: self.writeUInt32X(len(value), endian); self.writeSArray(cls, value, sizeOf)
+    def writeLV7SArray(self, cls: object, value: list[object], sizeOf: int = 0, endian: bool = False) -> None: self.writeIntV7X(len(value), endian); self.writeSArray(cls, value, sizeOf)
+    def writeLV8SArray(self, cls: object, value: list[object], sizeOf: int = 0, endian: bool = False) -> None: self.writeUIntV8X(len(value), endian); self.writeSArray(cls, value, sizeOf)
+    def writeSArray(self, cls: object, value: list[object], sizeOf: int = 0) -> None:
+        schema = getattr(cls, '_schema', None)
+        if schema: schema.writeArray(self, value); return
+        if isinstance(value, (ndarray, StructView)): self.writeNArray(cls, value, sizeOf); return
+        s = _structCompile(cls, sizeOf or -1); size = s.size; packInto = s.pack_into; data = bytearray(size * len(value))
+        for i, v in enumerate(value): packInto(data, i * size, *(v if isinstance(v, tuple) else (v,)))
+        self.write(data)
+
+    # struct : array - numpy
+    def writeL8NArray(self, cls: object, value: ndarray, sizeOf: int = 0) -> None: self.writeByte(len(value)); self.writeNArray(cls, value, sizeOf)
+    def writeL16NArray(self, cls: object, value: ndarray, sizeOf: int = 0, endian: bool = False) -> None: self.writeUInt16X(len(value), endian); self.writeNArray(cls, value, sizeOf)
+    def writeL32NArray(self, cls: object, value: ndarray, sizeOf: int = 0, endian: bool = False) -> None: self.writeUInt32X(len(value), endian); self.writeNArray(cls, value, sizeOf)
+    def writeLV7NArray(self, cls: object, value: ndarray, sizeOf: int = 0, endian: bool = False) -> None: self.writeIntV7X(len(value), endian); self.writeNArray(cls, value, sizeOf)
+    def writeLV8NArray(self, cls: object, value: ndarray, sizeOf: int = 0, endian: bool = False) -> None: self.writeUIntV8X(len(value), endian); self.writeNArray(cls, value, sizeOf)
+    def writeNArray(self, cls: object, value: ndarray, sizeOf: int = 0) -> None:
+        if isinstance(value, StructView): value = value.data
+        dt = _dtypeGet(cls, sizeOf or -1); dt = dt.subdtype[0] if dt.subdtype else dt
+        z = value.astype(dt, copy=False) if isinstance(value, ndarray) else asarray(value, dtype=dt)
+        if not z.flags.c_contiguous: z = z.copy()
+        self.write(z.reshape(-1).view(uint8).data)
+
+    # struct : list
+    writeL8FList = writeL8FArray; writeL16FList = writeL16FArray; writeL32FList = writeL32FArray; writeLV7FList = writeLV7FArray; writeLV8FList = writeLV8FArray; writeFList = writeFArray; writeFIList = writeFIArray
+    writeL8PList = writeL8PArray; writeL16PList = writeL16PArray; writeL32PList = writeL32PArray; writeLV7PList = writeLV7PArray; writeLV8PList = writeLV8PArray; writePList = writePArray
+    writeL8SList = writeL8SArray; writeL16SList = writeL16SArray; writeL32SList = writeL32SArray; writeLV7SList = writeLV7SArray; writeLV8SList = writeLV8SArray; writeSList = writeSArray
+
     # struct : many - factory
-    # def writeL8FMany(self, clsKey: object, value: object, keyFactory: callable, valueFactory: callable, endian: bool = False) -> list[object]: return self.writeFMany(clsKey, keyFactory, valueFactory, source.writeByte())
-    # def writeL16FMany(self, clsKey: object, value: object, keyFactory: callable, valueFactory: callable, endian: bool = False) -> list[object]: return self.writeFMany(clsKey, keyFactory, valueFactory, source.writeUInt16(endian))
-    # def writeL32FMany(self, clsKey: object, value: object, keyFactory: callable, valueFactory: callable, endian: bool = False) -> list[object]: return self.writeFMany(clsKey, keyFactory, valueFactory, source.writeUInt32(endian))
-    # def writeC32FMany(self, clsKey: object, value: object, keyFactory: callable, valueFactory: callable, endian: bool = False) -> list[object]: return self.writeFMany(clsKey, keyFactory, valueFactory, source.writeCInt32(endian))
-    # def writeFMany(self, clsKey: object, value: object, keyFactory: callable, valueFactory: callable) -> dict[object, object]: return {keyFactory(self):valueFactory(self) for x in range(count)} if count else {}
+    def writeL8FMany(self, keyFactory: callable, valueFactory: callable, value: dict[object, object], endian: bool = False) -> None: self.writeByte(len(value)); self.writeFMany(keyFactory, valueFactory, value)
+    def writeL16FMany(self, keyFactory: callable, valueFactory: callable, value: dict[object, object], endian: bool = False) -> None: self.writeUInt16X(len(value), endian); self.writeFMany(keyFactory, valueFactory, value)
+    def writeL32FMany(self, keyFactory: callable, valueFactory: callable, value: dict[object, object], endian: bool = False) -> None: self.writeUInt32X(len(value), endian); self.writeFMany(keyFactory, valueFactory, value)
+    def writeV8FMany(self, keyFactory: callable, valueFactory: callable, value: dict[object, object], endian: bool = False) -> None: self.writeUIntV8X(len(value), endian); self.writeFMany(keyFactory, valueFactory, value)
+    def writeFMany(self, keyFactory: callable, valueFactory: callable, value: dict[object, object]) -> None:
+        for k, v in value.items(): keyFactory(self, k); valueFactory(self, v)
+
+    # struct : many - pattern
+    def writeL8PMany(self, pat: str, valueFactory: callable, value: dict[object, object], endian: bool = False) -> None: self.writeByte(len(value)); self.writePMany(pat, valueFactory, value)
+    def writeL16PMany(self, pat: str, valueFactory: callable, value: dict[object, object], endian: bool = False) -> None: self.writeUInt16X(len(value), endian); self.writePMany(pat, valueFactory, value)
+    def writeL32PMany(self, pat: str, valueFactory: callable, value: dict[object, object], endian: bool = False) -> None: self.writeUInt32X(len(value), endian); self.writePMany(pat, valueFactory, value)
+    def writeV8PMany(self, pat: str, valueFactory: callable, value: dict[object, object], endian: bool = False) -> None: self.writeUIntV8X(len(value), endian); self.writePMany(pat, valueFactory, value)
+    def writePMany(self, pat: str, valueFactory: callable, value: dict[object, object]) -> None:
+        for k, v in value.items(): self.writeP(pat, k); valueFactory(self, v)
 
     # struct : many - struct
-    # def writeL8SMany(self, clsKey: object, value: object, valueFactory: callable, endian: bool = False) -> list[object]: return self.writeSMany(clsKey, valueFactory, source.writeByte())
-    # def writeL16SMany(self, clsKey: object, value: object, valueFactory: callable, endian: bool = False) -> list[object]: return self.writeSMany(clsKey, valueFactory, source.writeUInt16(endian))
-    # def writeL32SMany(self, clsKey: object, value: object, valueFactory: callable, endian: bool = False) -> list[object]: return self.writeSMany(clsKey, valueFactory, source.writeUInt32(endian))
-    # def writeC32SMany(self, clsKey: object, value: object, valueFactory: callable, endian: bool = False) -> list[object]: return self.writeSMany(clsKey, valueFactory, source.writeCInt32(endian))
-    # def writeSMany(self, clsKey: object, value: object, valueFactory: callable) -> dict[object, object]: return {self.writeS(clsKey):valueFactory(self) for x in range(count)} if count else {}
-    
-    # struct : many - type
-    # def writeL8TMany(self, clsKey: object, value: object, sizeOf: int, valueFactory: callable, endian: bool = False) -> list[object]: return self.writeTMany(clsKey, sizeOf, valueFactory, source.writeByte())
-    # def writeL16TMany(self, clsKey: object, value: object, sizeOf: int, valueFactory: callable, endian: bool = False) -> list[object]: return self.writeTMany(clsKey, sizeOf, valueFactory, source.writeUInt16(endian))
-    # def writeL32TMany(self, clsKey: object, value: object, sizeOf: int, valueFactory: callable, endian: bool = False) -> list[object]: return self.writeTMany(clsKey, sizeOf, valueFactory, source.writeUInt32(endian))
-    # def writeC32TMany(self, clsKey: object, value: object, sizeOf: int, valueFactory: callable, endian: bool = False) -> list[object]: return self.writeTMany(clsKey, sizeOf, valueFactory, source.writeCInt32(endian))
-    # def writeTMany(self, clsKey: object, value: object, sizeOf: int, valueFactory: callable) -> dict[object, object]: return {self.writeT(clsKey, sizeOf):valueFactory(self) for x in range(count)} if count else {}
+    def writeL8SMany(self, clsKey: object, valueFactory: callable, value: dict[object, object], endian: bool = False) -> None: self.writeByte(len(value)); self.writeSMany(clsKey, valueFactory, value)
+    def writeL16SMany(self, clsKey: object, valueFactory: callable, value: dict[object, object], endian: bool = False) -> None: self.writeUInt16X(len(value), endian); self.writeSMany(clsKey, valueFactory, value)
+    def writeL32SMany(self, clsKey: object, valueFactory: callable, value: dict[object, object], endian: bool = False) -> None: self.writeUInt32X(len(value), endian); self.writeSMany(clsKey, valueFactory, value)
+    def writeV8SMany(self, clsKey: object, valueFactory: callable, value: dict[object, object], endian: bool = False) -> None: self.writeUIntV8X(len(value), endian); self.writeSMany(clsKey, valueFactory, value)
+    def writeSMany(self, clsKey: object, valueFactory: callable, value: dict[object, object]) -> None:
+        for k, v in value.items(): self.writeS(clsKey, k); valueFactory(self, v)
 
     # numerics
-    # def writeHalf(self, value: float) -> None: raise NotImplementedError()
-    # def writeHalf16(self, value: float) -> None: raise NotImplementedError()
-    # def writeVector2(self, value: np.ndarray) -> None: self.writeSingle(value[0]); self.writeSingle(value[1])
-    # def writeHalfVector2(self, value: np.ndarray) -> None: self.writeHalf(value[0]); self.writeHalf(value[1])
-    # def writeVector3(self, value: np.ndarray) -> None: return np.array([self.writeSingle(value[3]), self.writeSingle(value[3]), self.writeSingle(value[3])])
-    # def writeHalfVector3(self, value: np.ndarray) -> None: return np.array([self.writeHalf(value[3]), self.writeHalf(value[3]), self.writeHalf(value[3])])
-    # def writeHalf16Vector3(self, value: np.ndarray) -> None: return np.array([self.writeHalf16(value[3]), self.writeHalf16(value[3]), self.writeHalf16(value[3])])
-    # def writeVector4(self, value: np.ndarray) -> None: return np.array([self.writeSingle(value[3]), self.writeSingle(value[3]), self.writeSingle(value[3]), self.writeSingle(value[3])])
-    # def writeHalfVector4(self, value: np.ndarray) -> None: return np.array([self.writeHalf(value[3]), self.writeHalf(value[3]), self.writeHalf(value[3]), self.writeHalf(value[3])])
-    # def writeMatrix3x3(self, value: np.ndarray) -> None: return np.array([
-    #     [self.writeSingle(value[3]), self.writeSingle(value[3]), self.writeSingle(value[3])],
-    #     [self.writeSingle(value[3]), self.writeSingle(value[3]), self.writeSingle(value[3])],
-    #     [self.writeSingle(value[3]), self.writeSingle(value[3]), self.writeSingle(value[3])]
-    #     ])
-    
\ No newline at end of file
+    writeHalf = _write(_e)
+    def writeVector2(self, value: ndarray) -> None: n = self._reserve(8); _2f.pack_into(self._buf, n, *value[:2])
+    def writeHalfVector2(self, value: ndarray) -> None: n = self._reserve(4); _2e.pack_into(self._buf, n, *value[:2])
+    def writeVector3(self, value: ndarray) -> None: n = self._reserve(12); _3f.pack_into(self._buf, n, *value[:3])
+    def writeHalfVector3(self, value: ndarray) -> None: n = self._reserve(6); _3e.pack_into(self._buf, n, *value[:3])
+    def writeVector4(self, value: ndarray) -> None: n = self._reserve(16); _4f.pack_into(self._buf, n, *value[:4])
+    def writeHalfVector4(self, value: ndarray) -> None: n = self._reserve(8); _4e.pack_into(self._buf, n, *value[:4])
+    def writeMatrix2x2(self, value: ndarray) -> None: self.writeNArray('<f', asarray(value)[:2, :2].reshape(-1))
+    def writeMatrix3x3(self, value: ndarray) -> None: self.writeNArray('<f', asarray(value)[:3, :3].reshape(-1))
+    def writeMatrix3x4(self, value: ndarray) -> None: self.writeNArray('<f', asarray(value)[:3, :4].reshape(-1))
+    def writeMatrix3x3As4x4(self, value: ndarray) -> None: self.writeNArray('<f', asarray(value)[:3, :3].reshape(-1))
+    def writeMatrix4x4(self, value: ndarray) -> None: self.writeNArray('<f', asarray(value)[:4, :4].reshape(-1))
+    def writeQuaternion(self, value: quaternion) -> None: n = self._reserve(16); _4f.pack_into(self._buf, n, value.x, value.y, value.z, value.w)
+    def writeQuaternionWFirst(self, value: quaternion) -> None: n = self._reserve(16); _4f.pack_into(self._buf, n, value.w, value.x, value.y, value.z)
+    def writeHalfQuaternion(self, value: quaternion) -> None: n = self._reserve(8); _4e.pack_into(self._buf, n, value.x, value.y, value.z, value.w)
@@ -1,6 +1,8 @@
-import time
+import os, time, math, json, asyncio, threading
 from functools import wraps
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from collections import deque
 
 def funcProfiler(func):
     @wraps(func)
@@ -18,6 +20,83 @@ def ctxProfiler(label):
         end = time.perf_counter()
         print(f"{label} executed in {end - start:.6f} seconds.")
 
+# Histogram - count, total, min and max of the observed values, with power of two buckets for approximate percentiles
+class Histogram:
+    def __init__(self): self.count = 0; self.total = 0.; self.min = math.inf; self.max = -math.inf; self.buckets: dict[int, int] = {}
+    def add(self, value: float) -> None:
+        self.count += 1; self.total += value; self.min = min(self.min, value); self.max = max(self.max, value)
+        e = math.frexp(value)[1] if value > 0 else -1074; self.buckets[e] = self.buckets.get(e, 0) + 1
+    def percentile(self, q: float) -> float:
+        n = 0; rank = q * self.count
+        for e in sorted(self.buckets):
+            n += self.buckets[e]
+            if n >= rank: return min(self.max, math.ldexp(1., e))
+        return self.max
+    def toJson(self) -> dict: return {'count': self.count, 'total': self.total, 'mean': self.total / self.count if self.count else 0., 'min': self.min if self.count else 0., 'max': self.max if self.count else 0.,
+        'p50': self.percentile(.5), 'p90': self.percentile(.9), 'p99': self.percentile(.99)}
+
+_spanParent: ContextVar[str] = ContextVar('span', default=None)
+
+# Span - times a block into the histogram of its name and a chrome trace event, nesting under the enclosing span of the task or thread
+class Span:
+    __slots__ = ('name', 'args', 'start', 'token')
+    def __init__(self, name: str, args: dict): self.name = name; self.args = args
+    def __enter__(self) -> 'Span': self.token = _spanParent.set(self.name); self.start = time.perf_counter_ns(); return self
+    def __exit__(self, type, value, traceback) -> None:
+        end = time.perf_counter_ns(); _spanParent.reset(self.token); parent = _spanParent.get()
+        if parent: self.args['parent'] = parent
+        if type: self.args['error'] = type.__name__
+        Metrics._span(self.name, self.start, end, self.args)
+
+# Metrics - process-wide loader instrumentation: counters, histograms and nested spans, exported as json or chrome trace events. Disabled
+# by default, where count() and observe() return at once and span() returns a shared no-op context.
+class Metrics:
+    enabled: bool = False
+    maxEvents: int = 65536
+    counters: dict[str, float] = {}
+    histograms: dict[str, Histogram] = {}
+    events: deque[dict] = deque(maxlen=maxEvents)
+    _lock: threading.Lock = threading.Lock()
+    _noSpan: nullcontext = nullcontext()
+
+    @staticmethod
+    def enable(enabled: bool = True) -> None: Metrics.enabled = enabled
+    @staticmethod
+    def reset() -> None:
+        with Metrics._lock: Metrics.counters.clear(); Metrics.histograms.clear(); Metrics.events = deque(maxlen=Metrics.maxEvents)
+
+    @staticmethod
+    def count(name: str, value: float = 1) -> None:
+        if not Metrics.enabled: return
+        with Metrics._lock: Metrics.counters[name] = Metrics.counters.get(name, 0) + value
+    @staticmethod
+    def observe(name: str, value: float) -> None:
+        if not Metrics.enabled: return
+        with Metrics._lock:
+            if (h := Metrics.histograms.get(name)) is None: h = Metrics.histograms[name] = Histogram()
+            h.add(value)
+    @staticmethod
+    def span(name: str, **args) -> Span: return Span(name, args) if Metrics.enabled else Metrics._noSpan
+    @staticmethod
+    def _span(name: str, start: int, end: int, args: dict) -> None:
+        try: task = asyncio.current_task()
+        except RuntimeError: task = None
+        tid = id(task) if task else threading.get_ident()
+        Metrics.observe(name, (end - start) / 1e9)
+        Metrics.events.append({'name': name, 'cat': name.partition('.')[0], 'ph': 'X', 'ts': start / 1e3, 'dur': (end - start) / 1e3, 'pid': os.getpid(), 'tid': tid, 'args': args})
+
+    # exports
+    @staticmethod
+    def toJson() -> dict:
+        with Metrics._lock: return {'counters': dict(Metrics.counters), 'histograms': {k: v.toJson() for k, v in Metrics.histograms.items()}}
+    @staticmethod
+    def toTrace() -> dict:
+        with Metrics._lock: counters = dict(Metrics.counters); events = list(Metrics.events)
+        ts = max((s['ts'] + s['dur'] for s in events), default=time.perf_counter_ns() / 1e3)
+        return {'traceEvents': events + [{'name': k, 'ph': 'C', 'ts': ts, 'pid': os.getpid(), 'args': {'value': v}} for k, v in counters.items()], 'displayTimeUnit': 'ms'}
+    @staticmethod
+    def save(path: str, trace: bool = False) -> None:
+        with open(path, 'w', encoding='utf-8') as f: json.dump(Metrics.toTrace() if trace else Metrics.toJson(), f, default=str)
 
 # @funcProfiler
 # def fast_method():
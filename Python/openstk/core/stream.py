@@ -1,44 +1,100 @@
-import io
+import io, inspect
+from bisect import bisect_right
+from collections import OrderedDict
 
+# StreamIterators - block pipelines: Blocks reads large chunks into fresh bytearrays, and cipher / decompressor stages chain over them
 class StreamIterators:
     @staticmethod
-    def StreamCipher(stream, cipher, chunkSize=16): # 4096
+    def Blocks(stream, chunkSize=65536):
+        readinto = getattr(stream, 'readinto', None)
         while True:
-            chunk = stream.read(chunkSize)
-            if not chunk: break
-            yield cipher.decrypt(chunk)
+            block = bytearray(chunkSize); view = memoryview(block); n = 0
+            while n < chunkSize:
+                if readinto: c = readinto(view[n:]) or 0
+                else: data = stream.read(chunkSize - n); c = len(data); view[n:n+c] = data
+                if not c: break
+                n += c
+            view.release()
+            if not n: return
+            if n < chunkSize: del block[n:]
+            yield block
+    @staticmethod
+    def Decrypt(blocks, cipher):
+        decrypt = cipher.decrypt
+        try: output = 'output' in inspect.signature(decrypt).parameters
+        except (TypeError, ValueError): output = False
+        for block in blocks:
+            if output: data = bytearray(len(block)); decrypt(block, output=data); yield data
+            else: yield decrypt(block)
+    @staticmethod
+    def Decompress(blocks, decompressor):
+        for block in blocks:
+            data = decompressor.decompress(block)
+            if data: yield data
+        if hasattr(decompressor, 'flush') and (data := decompressor.flush()): yield data
+    @staticmethod
+    def Pipeline(stream, *stages, chunkSize=65536):
+        blocks = StreamIterators.Blocks(stream, chunkSize)
+        for stage in stages:
+            blocks = StreamIterators.Decrypt(blocks, stage) if hasattr(stage, 'decrypt') else \
+                StreamIterators.Decompress(blocks, stage) if hasattr(stage, 'decompress') else \
+                stage(blocks)
+        return blocks
+    @staticmethod
+    def StreamCipher(stream, cipher, chunkSize=65536): return StreamIterators.Decrypt(StreamIterators.Blocks(stream, chunkSize), cipher)
 
 class ForwardStream(io.BufferedIOBase):
     def __init__(self, blockIter):
         self.blockIter = blockIter
-        self._buf = b''
+        self._buf = bytearray()
         self._eof = False
     def readable(self): return True
     def seekable(self): return False
     def _fill(self, size):
         while len(self._buf) < size and not self._eof:
-            # try: self._buf += next(self.blockIter)
-            # except StopIteration: self._eof = True
             block = next(self.blockIter, None)
             if block: self._buf += block; continue
             self._eof = True
     def read(self, size=-1):
         if size is None or size < 0:
             # Consume everything remaining
-            while not self._eof: self._fill(len(self._buf) + 4096)
-            result, self._buf = self._buf, b''
+            for block in self.blockIter:
+                if not block: break
+                self._buf += block
+            self._eof = True
+            result = bytes(self._buf); self._buf.clear()
             return result
         # Pull exact number of bytes requested
-        self._fill(size); result = self._buf[:size]; self._buf = self._buf[size:]
+        self._fill(size); result = bytes(self._buf[:size]); del self._buf[:size]
         return result
+    def readinto(self, b):
+        m = memoryview(b).cast('B'); self._fill(len(m)); n = min(len(m), len(self._buf))
+        m[:n] = self._buf[:n]; del self._buf[:n]
+        return n
 
+# SeekableStream - a seekable view over a block iterator: blocks are indexed by offset as they are pulled and held in an LRU
+# bounded by cacheSize bytes. Evicted blocks are re-pulled from reopen(), a factory returning a fresh block iterator from the
+# start; without reopen every block is kept, as it cannot be pulled again. fromStream supplies reopen over a seekable source.
 class SeekableStream(io.BufferedIOBase):
-    def __init__(self, blockIter, totalSize=None):
+    def __init__(self, blockIter, totalSize=None, reopen=None, cacheSize=16*1024*1024):
         self.blockIter = blockIter
         self.totalSize = totalSize
-        self._buf = b''
+        self.reopen = reopen
+        self.cacheSize = cacheSize
+        self._offsets = [0]
+        self._blocks = OrderedDict()
+        self._cached = 0
+        self._next = 0
         self._pos = 0
         self._eof = False
+    # fromStream - pipes a seekable source through stages(), which returns fresh stage objects each call (ciphers and decompressors
+    # carry state); reopen seeks the source back to where it started and rebuilds the pipeline, so the cache stays bounded
+    @staticmethod
+    def fromStream(stream, stages=None, totalSize=None, cacheSize=16*1024*1024, chunkSize=65536):
+        if not stream.seekable(): raise Exception('fromStream needs a seekable source')
+        start = stream.tell()
+        def reopen(): stream.seek(start); return StreamIterators.Pipeline(stream, *(stages() if stages else ()), chunkSize=chunkSize)
+        return SeekableStream(reopen(), totalSize, reopen, cacheSize)
     def readable(self): return True
     def seekable(self): return True
     def seek(self, offset, whence=io.SEEK_SET):
@@ -48,23 +104,45 @@ class SeekableStream(io.BufferedIOBase):
         else: raise io.UnsupportedOperation("Can't seek without a known total size")
         return self._pos
     def tell(self): return self._pos
-    def _fill(self, min_bytes):
-        while len(self._buf) < min_bytes and not self._eof:
-            # try: self._buf += next(self.blockIter)
-            # except StopIteration: self._eof = True
+    def _cache(self, index, block):
+        self._blocks[index] = block; self._cached += len(block)
+        if not self.reopen: return
+        while self._cached > self.cacheSize and len(self._blocks) > 1: self._cached -= len(self._blocks.popitem(last=False)[1])
+    def _block(self, index):
+        block = self._blocks.get(index)
+        if block is not None: self._blocks.move_to_end(index); return block
+        # evicted: restart the iterator and re-pull up to the block
+        if index < self._next: self.blockIter = self.reopen(); self._next = 0
+        while True:
             block = next(self.blockIter, None)
-            if block: self._buf += block; continue
-            self._eof = True
+            if not block: self._eof = True; return None
+            i = self._next; self._next += 1
+            if i == len(self._offsets) - 1: self._offsets.append(self._offsets[-1] + len(block))
+            if i == index: self._cache(i, block); return block
+            elif not self.reopen: self._cache(i, block)
+    def _index(self, pos):
+        while pos >= self._offsets[-1]:
+            if self._eof or self._block(len(self._offsets) - 1) is None: return None
+        return bisect_right(self._offsets, pos) - 1
+    def readinto(self, b):
+        m = memoryview(b).cast('B'); size = len(m); n = 0
+        while n < size:
+            i = self._index(self._pos)
+            if i is None: break
+            block = self._block(i); o = self._pos - self._offsets[i]; c = min(len(block) - o, size - n)
+            m[n:n+c] = memoryview(block)[o:o+c]; n += c; self._pos += c
+        return n
     def read(self, size=-1):
         if size is None or size < 0:
             # Read all remaining data
-            while not self._eof: self._fill(len(self._buf) + 4096)
-            result = self._buf[self._pos:]
-            self._pos += len(result)
-            return result
+            result = bytearray()
+            while (i := self._index(self._pos)) is not None:
+                block = self._block(i); result += memoryview(block)[self._pos - self._offsets[i]:]; self._pos = self._offsets[i + 1]
+            return bytes(result)
         # Read specific byte size
-        self._fill(self._pos + size); end_pos = self._pos + size; result = self._buf[self._pos:end_pos]; self._pos += len(result)
-        return result
+        result = bytearray(size); n = self.readinto(result)
+        if n < size: del result[n:]
+        return bytes(result)
 
 class UncloseableStream:
     def __init__(self, obj): self.obj = obj
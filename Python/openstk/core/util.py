@@ -53,30 +53,23 @@ class Stopwatch:
         self._running = False
 
     def start(self):
-        if not self._running:
-            self._start_time = time.time()
-            self._running = True
-            print("Stopwatch started.")
-        else:
-            print("Stopwatch is already running.")
+        if self._running: return
+        self._start_time = time.perf_counter()
+        self._running = True
 
     def stop(self):
-        if self._running:
-            self._elapsed_time += time.time() - self._start_time
-            self._running = False
-            print("Stopwatch stopped.")
-        else:
-            print("Stopwatch is not running.")
+        if not self._running: return
+        self._elapsed_time += time.perf_counter() - self._start_time
+        self._running = False
 
     def reset(self):
         self._start_time = None
         self._elapsed_time = 0
         self._running = False
-        print("Stopwatch reset.")
 
     def get_elapsed_time(self):
         if self._running:
-            return self._elapsed_time + (time.time() - self._start_time)
+            return self._elapsed_time + (time.perf_counter() - self._start_time)
         return self._elapsed_time
 
     def display_time(self):
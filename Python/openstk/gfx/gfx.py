@@ -1,6 +1,8 @@
 from __future__ import annotations
-import sys
-from numpy import ndarray
+import sys, asyncio, inspect
+from time import perf_counter_ns, monotonic
+from collections import OrderedDict, deque
+from numpy import ndarray, asarray, frombuffer, roll, stack, sqrt, ones_like, float32
 from enum import Enum, Flag
 from dataclasses import dataclass
 
@@ -33,6 +35,166 @@ class GfxAlphaMode(Enum): Always = 0; Less = 1; LEqual = 2; Equal = 3; GEqual =
 # GfxBlendMode
 class GfxBlendMode(Enum): Zero = 0; One = 1; DstColor = 2; SrcColor = 3; OneMinusDstColor = 4; SrcAlpha = 5; OneMinusSrcColor = 6; DstAlpha = 7; OneMinusDstAlpha = 8; SrcAlphaSaturate = 9; OneMinusSrcAlpha = 10
 
+# starts an asset load as a background task so concurrent loads overlap; outside an event loop the awaitable is returned as is
+async def _value(value: object) -> object: return value
+def _preload(value: object) -> object:
+    if not inspect.isawaitable(value): value = _value(value)
+    try: asyncio.get_running_loop()
+    except RuntimeError: return value
+    return asyncio.ensure_future(value)
+
+#endregion
+
+#region AssetCache
+
+# AssetCache - per-manager asset cache with size accounting: once size passes budget, unpinned entries are evicted least recently
+# (lru) or least frequently (lfu) used, and onEvict(key, value) releases them. The entry put last is never evicted, so a caller gets
+# back a live asset even when it alone is over budget
+class AssetCache:
+    def __init__(self, budget: int = None, sizeOf: callable = None, onEvict: callable = None, policy: str = 'lru'):
+        self.budget: int = budget
+        self.sizeOf: callable = sizeOf or (lambda s: 1)
+        self.onEvict: callable = onEvict
+        self.policy: str = policy
+        self.size: int = 0
+        self.evictions: int = 0
+        self._items: OrderedDict[object, list] = OrderedDict() # key: [value, size, uses, pins]
+        self._last: object = None
+    def __len__(self) -> int: return len(self._items)
+    def __contains__(self, key: object) -> bool: return key in self._items
+    def __iter__(self): return iter(list(self._items))
+    def __getitem__(self, key: object) -> object:
+        if key not in self._items: raise KeyError(key)
+        return self.get(key)
+    def __setitem__(self, key: object, value: object) -> None: self.put(key, value)
+
+    def get(self, key: object, default: object = None) -> object:
+        s = self._items.get(key)
+        if s is None: return default
+        s[2] += 1; self._items.move_to_end(key); return s[0]
+    def put(self, key: object, value: object, size: int = None) -> None:
+        old = self._items.pop(key, None)
+        if old: self.size -= old[1]
+        size = self.sizeOf(value) if size is None else size
+        self._items[key] = [value, size, 1, old[3] if old else 0]; self.size += size; self._last = key
+        self.trim()
+    def pop(self, key: object, default: object = None) -> object:
+        s = self._items.pop(key, None)
+        if s is None: return default
+        self.size -= s[1]; return s[0]
+    def pin(self, key: object) -> None:
+        s = self._items.get(key)
+        if s: s[3] += 1
+    def unpin(self, key: object) -> None:
+        s = self._items.get(key)
+        if s and s[3]: s[3] -= 1; self.trim()
+    def pins(self, key: object) -> int: s = self._items.get(key); return s[3] if s else 0
+    def resize(self, key: object, size: int) -> None:
+        s = self._items.get(key)
+        if s: self.size += size - s[1]; s[1] = size
+
+    def trim(self, budget: int = None) -> None:
+        budget = self.budget if budget is None else budget
+        if budget is None or self.size <= budget: return
+        keys = [k for k, s in self._items.items() if not s[3] and k != self._last]
+        if self.policy == 'lfu': keys.sort(key=lambda k: self._items[k][2])
+        for k in keys:
+            if self.size <= budget: break
+            value = self.pop(k); self.evictions += 1
+            if self.onEvict: self.onEvict(k, value)
+    def clear(self) -> None:
+        for k in list(self._items):
+            value = self.pop(k)
+            if self.onEvict: self.onEvict(k, value)
+
+# AssetHandle - a counted reference to a cached asset, unpacking as the (obj, tag) the create call returned; release() drops the reference
+class AssetHandle(tuple):
+    def __new__(cls, manager: AssetManager, key: object, value: tuple):
+        z = super().__new__(cls, value); z.manager = manager; z.key = key; z.released = False
+        return z
+    def release(self) -> None:
+        if self.released: return
+        self.released = True; self.manager._release(self.key)
+
+# AssetManager - reference counting over a manager's AssetCache: create calls given an owner list pin the entry and append an AssetHandle
+# to it, and entries released to zero references are queued to be freed by drain() within a frame budget. An entry built from other
+# managers' assets holds their handles in _deps while it is cached, and _releaseDeps drops them once it is evicted
+class AssetManager:
+    def __init__(self, assets: AssetCache):
+        self._assets: AssetCache = assets
+        self._freed: deque[object] = deque()
+        self._deps: dict[object, list[AssetHandle]] = {}
+        self._preloadRefs: dict[object, int] = {}
+    def _acquire(self, key: object, value: tuple, owner: list) -> tuple:
+        if owner is None or key not in self._assets: return value
+        self._assets.pin(key); z = AssetHandle(self, key, value); owner.append(z)
+        return z
+    def _release(self, key: object) -> None:
+        self._assets.unpin(key)
+        if key in self._assets and not self._assets.pins(key): self._freed.append(key)
+    def _releaseDeps(self, key: object) -> None:
+        for s in self._deps.pop(key, ()): s.release()
+    # starts a background load, counting its requesters: each cancelPreload drops one, and the last cancels the load
+    def _addPreload(self, key: object, factory: callable) -> object:
+        self._preloadRefs[key] = self._preloadRefs.get(key, 0) + 1
+        if not key in self._preloadTasks: self._preloadTasks[key] = _preload(factory())
+        return self._preloadTasks[key]
+    def _popPreload(self, key: object) -> None: self._preloadTasks.pop(key, None); self._preloadRefs.pop(key, None)
+    # cancels a background load no other requester wants and nobody awaits yet, so a later load of the key starts afresh
+    def _cancelPreload(self, key: object) -> bool:
+        task = self._preloadTasks.get(key)
+        if task is None or not isinstance(task, asyncio.Future): return False
+        refs = self._preloadRefs.pop(key, 1) - 1
+        if refs > 0: self._preloadRefs[key] = refs; return False
+        if key in self._flight: return False
+        del self._preloadTasks[key]; task.cancel(); return True
+    def drain(self, deadline: int = None) -> int:
+        assets = self._assets; n = 0
+        while self._freed and (deadline is None or perf_counter_ns() < deadline):
+            key = self._freed.popleft()
+            if key not in assets or assets.pins(key): continue
+            value = assets.pop(key); n += 1
+            if assets.onEvict: assets.onEvict(key, value)
+        return n
+
+# SingleFlight - de-duplicates concurrent loads: every caller of a key awaits the one in-flight load, and failures are cached for errorTtl
+# seconds so a missing asset is not retried on every request
+class SingleFlight:
+    errorTtl: float = 30.
+    def __init__(self, errorTtl: float = None):
+        self.errorTtl: float = SingleFlight.errorTtl if errorTtl is None else errorTtl
+        self._inFlight: dict[object, asyncio.Future] = {}
+        self._errors: dict[object, tuple[Exception, float]] = {}
+    def __contains__(self, key: object) -> bool: return key in self._inFlight
+    async def load(self, key: object, factory: callable) -> object:
+        error = self._errors.get(key)
+        if error:
+            if error[1] > monotonic(): raise error[0]
+            del self._errors[key]
+        future = self._inFlight.get(key)
+        if future is None:
+            future = self._inFlight[key] = asyncio.ensure_future(factory())
+            future.add_done_callback(lambda s: self._done(key, s))
+        return await asyncio.shield(future)
+    def _done(self, key: object, future: asyncio.Future) -> None:
+        if self._inFlight.get(key) is future: del self._inFlight[key]
+        if not future.cancelled() and future.exception() and self.errorTtl > 0: self._errors[key] = (future.exception(), monotonic() + self.errorTtl)
+    def forget(self, key: object = None) -> None:
+        if key is None: self._errors.clear()
+        else: self._errors.pop(key, None)
+
+# textureBytes - estimated GPU size of a texture: width x height x depth at its format's bytes per pixel, plus a third for a mip chain, or
+# the exact sum of the mips in level
+_formatBytes = {'DXT1': .5, 'DXT1A': .5, 'BC4': .5, 'ETC2': .5, 'DXT3': 1, 'DXT5': 1, 'BC5': 1, 'BC6H': 1, 'BC7': 1, 'ETC2_EAC': 1, 'I8': 1, 'L8': 1, 'R8': 1,
+    'R16': 2, 'RG16': 2, 'RGB565': 2, 'BGRA1555': 2, 'RGB24': 3}
+def textureBytes(tex: object, level: range = None) -> int:
+    if not tex: return 0
+    format = getattr(tex, 'format', None); format = format[0] if isinstance(format, tuple) else format
+    width = getattr(tex, 'width', 0) or 0; height = getattr(tex, 'height', 0) or 0; scale = max(1, getattr(tex, 'depth', 1) or 1) * _formatBytes.get(getattr(format, 'name', None), 4)
+    if level is not None: return int(sum(max(1, width >> l) * max(1, height >> l) for l in level) * scale)
+    size = width * height * scale
+    return int(size * 4 / 3 if (getattr(tex, 'mipMaps', 1) or 1) > 1 else size)
+
 #endregion
 
 #region ObjectSprite
@@ -44,30 +206,38 @@ class ObjectSpriteBuilderBase:
     def ensurePrefab(self) -> None: pass
 
 # ObjectSpriteManager
-class ObjectSpriteManager:
-    _cachedObjects: dict[object, (Object, object)] = {}
-    def __init__(self, builder: ObjectSpriteBuilderBase):
+class ObjectSpriteManager(AssetManager):
+    cacheBudget: int = 4096
+    def __init__(self, builder: ObjectSpriteBuilderBase, budget: int = None):
         self._builder: ObjectSpriteBuilderBase = builder
+        self._cachedObjects: AssetCache = AssetCache(budget or ObjectSpriteManager.cacheBudget)
+        super().__init__(self._cachedObjects)
         self._preloadTasks: dict[object, object] = {}
+        self._flight: SingleFlight = SingleFlight()
 
-    async def createObject(self, source: ISource, path: object, parent: Object = None) -> tuple[Object, object]:
-        key = (source, path); tag = None
-        if not key in self._cachedObjects: obj = self._cachedObjects[key] = (await self._loadObject(source, path), tag)
-        else: obj = self._cachedObjects[key]
-        return (self._builder.instanceObject(obj[0], parent), obj[1])
+    async def createObject(self, source: ISource, path: object, parent: Object = None, owner: list = None) -> tuple[Object, object]:
+        key = (source, path)
+        obj = self._cachedObjects.get(key) if key in self._cachedObjects else await self._flight.load(key, lambda: self._createObject(key, source, path))
+        return self._acquire(key, (self._builder.instanceObject(obj[0], parent), obj[1]), owner)
+
+    async def _createObject(self, key: object, source: ISource, path: object) -> tuple[Object, object]:
+        Metrics.count('sprite.loads')
+        with Metrics.span('sprite.load', path=path): tag = None; obj = (await self._loadObject(source, path), tag); self._cachedObjects[key] = obj
+        return obj
 
-    def preloadObject(self, source: ISource, path: object) -> None:
+    def preloadObject(self, source: ISource, path: object) -> object:
         key = (source, path)
-        if key in self._cachedObjects: return
-        if not key in self._preloadTasks: self._preloadTasks[key] = source.getAsset(object, path)
+        if key in self._cachedObjects: return None
+        return self._addPreload(key, lambda: source.getAsset(object, path))
+    def cancelPreload(self, source: ISource, path: object) -> bool: return self._cancelPreload((source, path))
 
-    async def _loadObject(self, path: object) -> tuple[Object, object]:
+    async def _loadObject(self, source: ISource, path: object) -> tuple[Object, object]:
         key = (source, path)
         assert(not key in self._cachedObjects)
         self._builder.ensurePrefab()
         self.preloadObject(source, path)
-        obj = await self._preloadTasks[key]
-        self._preloadTasks.pop(key)
+        try: obj = await self._preloadTasks[key]
+        finally: self._popPreload(key)
         return (self._builder.createObject(obj), obj)
 
 #endregion
@@ -85,36 +255,49 @@ class ObjectModelBuilderBase:
     def ensurePrefab(self) -> None: pass
 
 # ObjectModelManager
-class ObjectModelManager:
-    _cachedObjects: dict[object, (Object, object)] = {}
-    def __init__(self, materialManager: MaterialManager, builder: ObjectModelBuilderBase):
+class ObjectModelManager(AssetManager):
+    cacheBudget: int = 4096
+    def __init__(self, materialManager: MaterialManager, builder: ObjectModelBuilderBase, budget: int = None):
         self._materialManager: MaterialManager = materialManager
         self._builder: ObjectModelBuilderBase = builder
+        self._cachedObjects: AssetCache = AssetCache(budget or ObjectModelManager.cacheBudget, onEvict=lambda k, v: self._releaseDeps(k))
+        super().__init__(self._cachedObjects)
         self._preloadTasks: dict[object, object] = {}
+        self._flight: SingleFlight = SingleFlight()
 
-    async def createObject(self, source: ISource, path: object, isStatic: bool, parent: Object = None) -> tuple[Object, object]:
+    async def createObject(self, source: ISource, path: object, isStatic: bool, parent: Object = None, owner: list = None) -> tuple[Object, object]:
         key = (source, path)
-        try:
-            if not key in self._cachedObjects: s = self._cachedObjects[key] = await self._loadObject(source, path, isStatic)
-            else: s = self._cachedObjects[key]
-            return (self._builder.instanceObject(s[0]), s[1])
-        except: return (None, None)
+        try: s = self._cachedObjects.get(key) if key in self._cachedObjects else await self._flight.load(key, lambda: self._createObject(key, source, path, isStatic))
+        except Exception: return (None, None)
+        return self._acquire(key, (self._builder.instanceObject(s[0]), s[1]), owner)
 
-    def preloadObject(self, source: ISource, path: object) -> None:
+    async def _createObject(self, key: object, source: ISource, path: object, isStatic: bool) -> tuple[Object, object]:
+        Metrics.count('model.loads')
+        with Metrics.span('model.create', path=path): s = await self._loadObject(source, path, isStatic); self._cachedObjects[key] = s
+        return s
+
+    def preloadObject(self, source: ISource, path: object) -> object:
         key = (source, path)
-        if key in self._cachedObjects: return
-        if not key in self._preloadTasks: self._preloadTasks[key] = source.getAsset(object, path)
+        if key in self._cachedObjects: return None
+        return self._addPreload(key, lambda: source.getAsset(object, path))
+    def cancelPreload(self, source: ISource, path: object) -> bool: return self._cancelPreload((source, path))
 
+    # the builder sees the material manager through a MaterialScope, so the model owns the materials it creates while it is cached
     async def _loadObject(self, source: ISource, path: object, isStatic: bool) -> tuple[Object, object]:
         key = (source, path)
         assert(not key in self._cachedObjects)
         self._builder.ensurePrefab()
         self.preloadObject(source, path)
+        deps = []; materialManager = MaterialScope(self._materialManager, deps) if self._materialManager else None
         try:
-            obj = await self._preloadTasks[key]
-            return (await self._builder.createObject(source, obj, isStatic, self._materialManager), obj)
-        except: print(sys.exc_info()[1]); raise
-        finally: self._preloadTasks.pop(key)
+            with Metrics.span('model.load'): obj = await self._preloadTasks[key]
+            with Metrics.span('model.build'): z = (await self._builder.createObject(source, obj, isStatic, materialManager), obj)
+            self._deps[key] = deps; return z
+        except:
+            print(sys.exc_info()[1])
+            for s in deps: s.release()
+            raise
+        finally: self._popPreload(key)
 
 #endregion
 
@@ -167,40 +350,114 @@ class SpriteBuilderBase:
     def deleteSprite(self, spr: Sprite) -> None: pass
 
 # SpriteManager
-class SpriteManager:
-    _cachedSprites: dict[object, (Sprite, object)] = {}
-    def __init__(self, builder: SpriteBuilderBase):
+class SpriteManager(AssetManager):
+    cacheBudget: int = 256 * 1024 * 1024
+    def __init__(self, builder: SpriteBuilderBase, budget: int = None):
         self._builder: SpriteBuilderBase = builder
+        self._cachedSprites: AssetCache = AssetCache(budget or SpriteManager.cacheBudget, lambda s: textureBytes(s[1]), self._evictSprite)
+        super().__init__(self._cachedSprites)
         self._preloadTasks: dict[object, object] = {}
+        self._flight: SingleFlight = SingleFlight()
 
     @property
     def defaultSprite(self) -> Sprite: return self._builder.defaultSprite
 
-    async def createSprite(self, source: ISource, path: object, level: range = None) -> tuple[Sprite, object]:
+    async def createSprite(self, source: ISource, path: object, level: range = None, owner: list = None) -> tuple[Sprite, object]:
         key = (source, path)
-        if key in self._cachedSprites: return self._cachedSprites[key]
+        value = self._cachedSprites.get(key) if key in self._cachedSprites else await self._flight.load(key, lambda: self._createSprite(key, source, path))
+        return self._acquire(key, value, owner)
+
+    async def _createSprite(self, key: object, source: ISource, path: object) -> tuple[Sprite, object]:
         tag = path if isinstance(path, ISprite) else await self._loadSprite(source, path)
         obj = self._builder.createSprite(tag) if tag else self._builder.defaultSprite
         self._cachedSprites[key] = (obj, tag); return (obj, tag)
 
-    def preloadSprite(self, source: ISource, path: object) -> None:
+    def preloadSprite(self, source: ISource, path: object) -> object:
         key = (source, path)
-        if key in self._cachedSprites: return
-        if not key in self._preloadTasks: self._preloadTasks[key] = source.getAsset(type(ISprite), path)
+        if key in self._cachedSprites: return None
+        if not key in self._preloadTasks: self._preloadTasks[key] = _preload(source.getAsset(type(ISprite), path))
+        return self._preloadTasks[key]
 
     def deleteSprite(self, source: ISource, path: object) -> None:
         key = (source, path)
         if not key in self._cachedSprites: return
-        self._builder.deleteTexture(self._cachedSprites[0])
-        self._cachedSprites.pop(key)
+        self._evictSprite(key, self._cachedSprites.pop(key))
+
+    def _evictSprite(self, key: object, value: tuple[Sprite, object]) -> None:
+        if value[0] is not self._builder.defaultSprite: self._builder.deleteSprite(value[0])
 
     async def _loadSprite(self, source: ISource, path: object) -> ISprite:
         key = (source, path)
         assert(not key in self._cachedSprites)
-        self.preloadSprite(source, s)
-        obj = await self._preloadTasks[key]
-        self._preloadTasks.pop(key)
-        return obj
+        self.preloadSprite(source, path)
+        try: return await self._preloadTasks[key]
+        finally: self._preloadTasks.pop(key, None)
+
+# normalMapPixels - a tiling normal map of a height field by central differences, as rgba floats for TextureBuilderBase.createSolidTexture
+def normalMapPixels(heights: ndarray, strength: float) -> ndarray:
+    dx = (roll(heights, -1, 1) - roll(heights, 1, 1)) * (strength * .5); dy = (roll(heights, -1, 0) - roll(heights, 1, 0)) * (strength * .5)
+    one = ones_like(heights); length = sqrt(dx * dx + dy * dy + one)
+    return stack((-dx / length * .5 + .5, -dy / length * .5 + .5, one / length * .5 + .5, one), axis=-1)
+
+# TerrainLayerManager - shares terrain layers across cells in a bounded cache. A new layer takes its mask from the value-keyed solid
+# textures, and its normal map is generated from the texture's texturePixels, block compressed ones decoded, on a worker then uploaded by
+# drain() within the frame budget;
+# cells hold layers by reference, so one built before its upload lands picks the normal map up once set
+class TerrainLayerManager:
+    cacheBudget: int = 256
+    def __init__(self, textureManager: TextureManager, budget: int = None, executor: object = None):
+        self.textureManager: TextureManager = textureManager
+        self.executor: object = executor
+        self._layers: AssetCache = AssetCache(budget or TerrainLayerManager.cacheBudget)
+        self._uploads: deque[tuple[GfxTerrainLayer, ndarray]] = deque()
+        textureManager.evicted.append(lambda tex: self._layers.pop(tex, None))
+    def __len__(self) -> int: return len(self._layers)
+    def __contains__(self, tex: Texture) -> bool: return tex in self._layers
+
+    def createLayer(self, tex: Texture, tag: ITexture, factory: callable) -> GfxTerrainLayer:
+        layer = self._layers.get(tex)
+        if layer: return layer
+        layer = factory(tex)
+        layer.maskMapTexture = self.textureManager.createSolidTexture(1, 1, [layer.metallic, .0, .0, layer.smoothness])
+        layer.normalMapTexture = self.textureManager._cachedNormalMapTextures.get(tex)
+        self._layers[tex] = layer
+        if layer.normalMapTexture is None and tag: self._generate(layer, tag)
+        return layer
+
+    def _generate(self, layer: GfxTerrainLayer, tag: ITexture) -> None:
+        cache = self.textureManager.diskCache or DiskCache.current; key = self.textureManager._paths.get(layer.texture) if cache else None
+        def _() -> ndarray:
+            with Metrics.span('terrain.normalMap'): return self._normalMap(tag, cache, key)
+        try: loop = asyncio.get_running_loop()
+        except RuntimeError: self._uploaded(layer, _()); return
+        loop.run_in_executor(self.executor, _).add_done_callback(lambda s: self._generated(layer, s))
+    # the normal map pixels of tag, kept in the disk cache under its texture's (source, path) key when one is set
+    @staticmethod
+    def _normalMap(tag: ITexture, cache: DiskCache = None, key: tuple = None) -> ndarray:
+        if key: archive = DiskCache.archiveOf(key[0]); version = str(TextureManager.normalMapIntensity)
+        if key and (z := cache.get(archive, key[1], 'normal', version)): return frombuffer(z[1], float32).reshape(z[0]['shape'])
+        from openstk.gfx.gfx_texture import texturePixels
+        rgba = texturePixels(tag)
+        if rgba is None: return None
+        heights = (rgba[..., 0] * .299 + rgba[..., 1] * .587 + rgba[..., 2] * .114) / 255.
+        pixels = normalMapPixels(heights, TextureManager.normalMapIntensity).astype(float32)
+        if key: cache.put(archive, key[1], pixels, {'shape': pixels.shape}, 'normal', version)
+        return pixels
+    def _generated(self, layer: GfxTerrainLayer, future: asyncio.Future) -> None:
+        if future.cancelled(): return
+        if (e := future.exception()): log.error(f'terrain normal map of {layer.texture}: {e!r}'); return
+        self._uploaded(layer, future.result())
+    def _uploaded(self, layer: GfxTerrainLayer, pixels: ndarray) -> None:
+        if pixels is not None: self._uploads.append((layer, pixels))
+
+    def drain(self, deadline: int = None) -> int:
+        n = 0
+        while self._uploads and (deadline is None or perf_counter_ns() < deadline):
+            layer, pixels = self._uploads.popleft()
+            if self._layers.get(layer.texture) is not layer: continue
+            with Metrics.span('terrain.upload'): layer.normalMapTexture = self.textureManager.createNormalMapTexture(layer.texture, pixels=pixels)
+            n += 1
+        return n
 
 #endregion
 
@@ -242,38 +499,87 @@ class ITextureFrames(ITextureVideo):
     frameMax: int
     def frameSelect(self, id: int) -> None: pass
 
+# ITextureStream - a texture whose mips are read separately: create() offers only the loaded mips, the spans of the others missing (-1)
+class ITextureStream(ITexture):
+    async def loadLevels(self, level: range) -> None: pass
+    def unloadLevels(self, level: range) -> None: pass
+
+# StreamTexture - ITextureStream over the mips' byte spans in an archive, each read on demand by read(offset, size), sync or async
+class StreamTexture(ITextureStream):
+    def __init__(self, width: int, height: int, mipMaps: int, format: object, spans: list[range], read: callable, texFlags: TextureFlags = 0):
+        self.width = width; self.height = height; self.depth = 0; self.mipMaps = mipMaps; self.texFlags = texFlags
+        self.format = format
+        self.spans = spans
+        self.read = read
+        self.levels: dict[int, bytes] = {}
+    def __repr__(self): return f'StreamTexture({self.width}x{self.height}, {sorted(self.levels)})'
+
+    async def loadLevels(self, level: range) -> None:
+        for l in level:
+            if l in self.levels: continue
+            span = self.spans[l]; z = self.read(span.start, len(span))
+            if inspect.isawaitable(z): z = await z
+            self.levels[l] = z; Metrics.count('texture.streamBytes', len(z))
+    def unloadLevels(self, level: range) -> None:
+        for l in level: self.levels.pop(l, None)
+
+    def create(self, platform: str, func: callable) -> object:
+        pixels = []; spans = []; o = 0
+        for l in range(max(1, self.mipMaps)):
+            z = self.levels.get(l)
+            if z is None: spans.append(range(-1, -1)); continue
+            pixels.append(z); spans.append(range(o, o + len(z))); o += len(z)
+        return func(Texture_Bytes(b''.join(pixels), self.format, spans))
+
 # TextureBuilderBase
 class TextureBuilderBase:
     maxTextureMaxAnisotropy: int = GfX.maxTextureMaxAnisotropy
+    decodeCompressed: bool = False # decode block compressed textures on the cpu, for backends without the formats
+    convertFormats: bool = False # convert the other formats to RGBA32 on the cpu too
     defaultTexture: Texture
     def createTexture(self, reuse: Texture, tex: ITexture, level: range = None) -> Texture: pass
     def createSolidTexture(self, width: int, height: int, rgba: list[float]) -> Texture: pass
-    def createNormalMap(self, tex: Texture, strength: float) -> Texture: pass
+    def createNormalMapTexture(self, tex: Texture, strength: float) -> Texture: pass
+    def createAtlasTexture(self, width: int, height: int, layers: int) -> Texture: pass
+    def updateAtlasTexture(self, atlas: Texture, layer: int, x: int, y: int, tex: ITexture) -> bool: pass # False when tex has no pixels to blit
     def deleteTexture(self, tex: Texture) -> None: pass
+    def drain(self, deadline: int = None) -> int: return 0 # finishes deferred uploads, for backends that upload asynchronously
 
 # TextureManager
-class TextureManager:
+class TextureManager(AssetManager):
     class Solid:
         def __init__(self, width: int, height: int, rgbas: list[float]):
             self.width = width
             self.height = height
             self.rgbas = rgbas
-        def __hash__(self): return hash((self.width, self.height, hash((s for s in self.rgbas))))
+            self.key = (width, height, None if rgbas is None else tuple(asarray(rgbas, dtype=float).ravel().tolist()))
+        def __hash__(self): return hash(self.key)
+        def __eq__(self, other: object) -> bool: return isinstance(other, TextureManager.Solid) and self.key == other.key
 
     normalMapIntensity: float = 0.75
-    _cachedNormalMapTextures: dict[Texture, Texture] = {}
-    _cachedSolidTextures: dict[Solid, Texture] = {}
-    _cachedTextures: dict[object, (Texture, object)] = {}
-    def __init__(self, builder: TextureBuilderBase):
+    cacheBudget: int = 1024 * 1024 * 1024
+    diskCache: DiskCache = None # decoded textures and normal maps, DiskCache.current when not set
+    def __init__(self, builder: TextureBuilderBase, budget: int = None, streaming: bool = False):
         self._builder: TextureBuilderBase = builder
+        self._cachedNormalMapTextures: dict[Texture, Texture] = {}
+        self._cachedSolidTextures: dict[Solid, Texture] = {}
+        self._cachedTextures: AssetCache = AssetCache(budget or TextureManager.cacheBudget, lambda s: textureBytes(s[1]), self._evictTexture)
+        self._paths: dict[Texture, object] = {}
+        self.evicted: list[callable] = []
+        self.streamer: TextureStreamer = TextureStreamer(self) if streaming else None # streaming mode, when set
+        self.atlas: TextureAtlas = None
+        super().__init__(self._cachedTextures)
         self._preloadTasks: dict[object, object] = {}
+        self._flight: SingleFlight = SingleFlight()
 
     @property
     def defaultTexture(self) -> Texture: return self._builder.defaultTexture
 
-    def createNormalMapTexture(self, src: Texture, strength: float = -1) -> Texture:
+    # Creates the normal map of src: by the builder, or uploaded from pixels already generated by normalMapPixels
+    def createNormalMapTexture(self, src: Texture, strength: float = -1, pixels: ndarray = None) -> Texture:
         if src in self._cachedNormalMapTextures: return self._cachedNormalMapTextures[src]
-        s = self._builder.createNormalMapTexture(src, TextureManager.normalMapIntensity if strength < 0 else strength)
+        s = self._builder.createSolidTexture(pixels.shape[1], pixels.shape[0], pixels) if pixels is not None else \
+            self._builder.createNormalMapTexture(src, TextureManager.normalMapIntensity if strength < 0 else strength)
         self._cachedNormalMapTextures[src] = s
         return s
 
@@ -284,38 +590,307 @@ class TextureManager:
         self._cachedSolidTextures[src] = s
         return s
 
-    async def createTexture(self, source: ISource, path: object, level: range = None) -> tuple[Texture, object]:
-        key = (source, path)
-        if key in self._cachedTextures: return self._cachedTextures[key]
-        tag = path if isinstance(path, ITexture) else await self._loadTexture(source, path)
-        obj = self._builder.createTexture(None, tag, level) if tag else self._builder.defaultTexture
-        self._cachedTextures[key] = (obj, tag); return (obj, tag)
-
+    async def createTexture(self, source: ISource, path: object, level: range = None, owner: list = None) -> tuple[Texture, object]:
+        key = (source, path); Metrics.count('texture.requests')
+        value = self._cachedTextures.get(key) if key in self._cachedTextures else await self._flight.load(key, lambda: self._createTexture(key, source, path, level))
+        return self._acquire(key, value, owner)
+
+    async def _createTexture(self, key: object, source: ISource, path: object, level: range) -> tuple[Texture, object]:
+        Metrics.count('texture.loads')
+        with Metrics.span('texture.load', path=path):
+            tag = path if isinstance(path, ITexture) else await self._loadTexture(source, path)
+            # a streamed texture reads its tail only in streaming mode, else every mip from level
+            if stream := isinstance(tag, ITextureStream):
+                start = level.start if level else 0
+                level = range(max(start, self.streamer.tailLevel(tag)) if self.streamer is not None else start, max(1, tag.mipMaps))
+                await tag.loadLevels(level)
+        with Metrics.span('texture.upload', path=path): obj = self._builder.createTexture(None, tag, level) if tag else self._builder.defaultTexture
+        size = textureBytes(tag, level if stream else None); Metrics.count('texture.bytes', size)
+        self._cachedTextures.put(key, (obj, tag), size)
+        if obj is not self._builder.defaultTexture and isinstance(path, str): self._paths[obj] = key
+        if stream and self.streamer is not None and obj is not self._builder.defaultTexture: self.streamer.add(key, obj, tag, level)
+        return (obj, tag)
+
+    # Re-uploads a cached texture; a streamed one instead requests level, uploaded by drain() once read
     def reloadTexture(self, source: ISource, path: object, level: range = None) -> tuple[Texture, object]:
         key = (source, path)
         if key not in self._cachedTextures: return (None, None)
         c = self._cachedTextures[key]
-        self._builder.createTexture(c[0], c[1], level)
+        if self.streamer is not None and key in self.streamer: self.streamer.request(source, path, level.start if level else 0)
+        else: self._builder.createTexture(c[0], c[1], level)
         return c
 
-    def preloadTexture(self, source: ISource, path: object) -> None:
+    # Packs a small texture into the atlas, returning its region, or None without an atlas or for textures it doesn't take
+    async def createRegion(self, source: ISource, path: object) -> AtlasRegion:
         key = (source, path)
-        if key in self._cachedTextures: return
-        if not key in self._preloadTasks: self._preloadTasks[key] = source.getAsset(type(ITexture), path)
+        if self.atlas is None: return None
+        if (region := self.atlas.get(key)): return region
+        if isinstance(path, ITexture): tag = path
+        elif key in self._cachedTextures: tag = self._cachedTextures.get(key)[1]
+        else: tag = await self._flight.load(('atlas', key), lambda: self._loadTexture(source, path))
+        return self.atlas.add(key, tag) if tag else None
+    def deleteRegion(self, source: ISource, path: object) -> None:
+        if self.atlas is not None: self.atlas.remove((source, path))
+
+    def preloadTexture(self, source: ISource, path: object) -> object:
+        key = (source, path)
+        if key in self._cachedTextures: return None
+        return self._addPreload(key, lambda: self._getAsset(source, path))
+    def cancelPreload(self, source: ISource, path: object) -> bool: return self._cancelPreload((source, path))
+
+    # reads a texture, through the disk cache when the builder decodes it on the cpu
+    def _getAsset(self, source: ISource, path: object) -> object:
+        cache = self.diskCache or DiskCache.current
+        if cache is None or not self._builder.decodeCompressed or not isinstance(path, str): return source.getAsset(type(ITexture), path)
+        from openstk.gfx.gfx_texture import DecodedTexture
+        return DecodedTexture.load(cache, DiskCache.archiveOf(source), path, lambda: source.getAsset(type(ITexture), path), self._builder.convertFormats)
 
     def deleteTexture(self, source: ISource, path: object) -> None:
         key = (source, path)
         if not key in self._cachedTextures: return
-        self._builder.deleteTexture(self._cachedTextures[0])
-        self._cachedTextures.pop(key)
+        self._evictTexture(key, self._cachedTextures.pop(key))
+
+    def _evictTexture(self, key: object, value: tuple[Texture, object]) -> None:
+        if self.streamer is not None: self.streamer.remove(key)
+        self._paths.pop(value[0], None)
+        if value[0] is self._builder.defaultTexture: return
+        for s in self.evicted: s(value[0])
+        normalMap = self._cachedNormalMapTextures.pop(value[0], None)
+        if normalMap is not None: self._builder.deleteTexture(normalMap)
+        self._builder.deleteTexture(value[0])
 
     async def _loadTexture(self, source: ISource, path: object) -> ITexture:
         key = (source, path)
         assert(not key in self._cachedTextures)
         self.preloadTexture(source, path)
-        obj = await self._preloadTasks[key]
-        self._preloadTasks.pop(key)
-        return obj
+        try: return await self._preloadTasks[key]
+        finally: self._popPreload(key)
+
+    def drain(self, deadline: int = None) -> int:
+        n = super().drain(deadline)
+        if self.streamer is not None: n += self.streamer.drain(deadline)
+        return n + self._builder.drain(deadline)
+
+# TextureStreamer - streams the mips of ITextureStream textures for a TextureManager. A new texture reads and uploads only its tail, the mips
+# no larger than tailSize; request() sets the level wanted from screen size or distance, the missing mips are read in the background and
+# uploaded by drain() within the frame budget, and over budget the least recently requested textures drop the mips not wanted, then their
+# whole head back to the tail. A request made outside an event loop is fetched by the next drain()
+class TextureStreamer:
+    tailSize: int = 64
+    fullDistance: float = 512.
+    budget: int = 256 * 1024 * 1024
+    def __init__(self, textureManager: TextureManager, budget: int = None, tailSize: int = None):
+        self.textureManager: TextureManager = textureManager
+        self.budget: int = budget or TextureStreamer.budget
+        self.tailSize: int = tailSize or TextureStreamer.tailSize
+        self.size: int = 0
+        self._streams: OrderedDict[object, list] = OrderedDict() # key: [obj, tex, resident, wanted, task]
+        self._uploads: deque[tuple[object, list, int]] = deque()
+        self._fetches: set[object] = set() # keys requested outside an event loop
+    def __len__(self) -> int: return len(self._streams)
+    def __contains__(self, key: object) -> bool: return key in self._streams
+    def level(self, key: object) -> int: s = self._streams.get(key); return s[2] if s else None
+
+    # levels
+    def tailLevel(self, tex: ITexture) -> int: return min(max(1, tex.mipMaps) - 1, ((max(tex.width, tex.height, 1) - 1) // self.tailSize).bit_length())
+    def levelForSize(self, tex: ITexture, pixels: float) -> int: return min(max(1, tex.mipMaps) - 1, max(0, int(max(tex.width, tex.height) / max(pixels, 1.)).bit_length() - 1))
+    def levelForDistance(self, tex: ITexture, distance: float) -> int: return min(max(1, tex.mipMaps) - 1, int(max(distance, 0.) / self.fullDistance).bit_length())
+
+    def add(self, key: object, obj: Texture, tex: ITextureStream, level: range) -> None:
+        self.remove(key)
+        self._streams[key] = [obj, tex, level.start, level.start, None]; self.size += textureBytes(tex, level)
+    def remove(self, key: object) -> None:
+        s = self._streams.pop(key, None); self._fetches.discard(key)
+        if s is None: return
+        if s[4]: s[4].cancel()
+        self.size -= textureBytes(s[1], range(s[2], max(1, s[1].mipMaps)))
+
+    # requests
+    def request(self, source: ISource, path: object, level: int) -> None:
+        key = (source, path); s = self._streams.get(key)
+        if s is None: return
+        self._streams.move_to_end(key); s[3] = max(0, level); self._start(key, s)
+    def requestSize(self, source: ISource, path: object, pixels: float) -> None:
+        s = self._streams.get((source, path))
+        if s: self.request(source, path, self.levelForSize(s[1], pixels))
+    def requestDistance(self, source: ISource, path: object, distance: float) -> None:
+        s = self._streams.get((source, path))
+        if s: self.request(source, path, self.levelForDistance(s[1], distance))
+    # requests by distance the streamed textures among owner's handles, and those their assets hold in turn: a model's materials' textures
+    def requestOwned(self, owner: list[AssetHandle], distance: float) -> None:
+        handles = list(owner); textureManager = self.textureManager
+        while handles:
+            s = handles.pop()
+            if s.manager is textureManager: self.requestDistance(*s.key, distance)
+            else: handles += s.manager._deps.get(s.key, ())
+
+    # starts reading the mips wanted but not resident, as a task of the running loop, else at the next drain()
+    def _start(self, key: object, s: list) -> None:
+        if s[3] >= s[2] or s[4] is not None: return
+        try: loop = asyncio.get_running_loop()
+        except RuntimeError: self._fetches.add(key); return
+        self._fetches.discard(key); s[4] = loop.create_task(self._fetch(key, s, s[3]))
+
+    async def _fetch(self, key: object, s: list, level: int) -> None:
+        try:
+            with Metrics.span('texture.stream', path=key[1]): await s[1].loadLevels(range(level, s[2]))
+            if self._streams.get(key) is s: self._uploads.append((key, s, level))
+        finally:
+            if s[4] is asyncio.current_task(): s[4] = None
+
+    def _setLevel(self, key: object, s: list, level: int) -> None:
+        tex = s[1]; resident = s[2]; n = max(1, tex.mipMaps)
+        if level > resident:
+            if s[4]: s[4].cancel(); s[4] = None
+            tex.unloadLevels(range(resident, level))
+        with Metrics.span('texture.upload', path=key[1]): self.textureManager._builder.createTexture(s[0], tex, range(level, n))
+        size = textureBytes(tex, range(level, n)); self.size += size - textureBytes(tex, range(resident, n)); s[2] = level
+        self.textureManager._cachedTextures.resize(key, size)
+
+    def drain(self, deadline: int = None) -> int:
+        try: asyncio.get_running_loop(); loop = True
+        except RuntimeError: loop = False
+        # without a loop the fetches requested since the last drain read here, within the frame budget
+        for key in list(self._fetches):
+            if (s := self._streams.get(key)) is None: self._fetches.discard(key); continue
+            if loop: self._start(key, s)
+            elif deadline is None or perf_counter_ns() < deadline: self._fetches.discard(key); asyncio.run(self._fetch(key, s, s[3]))
+        n = 0
+        while self._uploads and (deadline is None or perf_counter_ns() < deadline):
+            key, s, level = self._uploads.popleft()
+            if self._streams.get(key) is not s or level >= s[2]: continue
+            self._setLevel(key, s, level); n += 1
+            self._start(key, s)
+        self.trim()
+        return n
+
+    def trim(self, budget: int = None) -> None:
+        budget = self.budget if budget is None else budget
+        for tail in (False, True):
+            for key, s in list(self._streams.items()):
+                if self.size <= budget: return
+                level = self.tailLevel(s[1]) if tail else s[3]
+                if level <= s[2]: continue
+                if tail: s[3] = level
+                self._setLevel(key, s, level)
+
+#endregion
+
+#region Atlas
+
+# SkylinePacker - packs rectangles into a width x height page by the skyline bottom-left rule. Freed rectangles go to a free list that
+# later inserts take first, best area fit and guillotine split, and a page emptied of every rectangle resets to one flat skyline
+class SkylinePacker:
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.clear()
+    def clear(self) -> None: self.skyline: list[list[int]] = [[0, 0, self.width]]; self.free: list[tuple[int, int, int, int]] = []; self.count = 0; self.used = 0
+
+    def _fit(self, i: int, width: int, height: int) -> int:
+        x = self.skyline[i][0]
+        if x + width > self.width: return -1
+        y = 0; left = width
+        while left > 0:
+            y = max(y, self.skyline[i][1])
+            if y + height > self.height: return -1
+            left -= self.skyline[i][2]; i += 1
+        return y
+
+    def insert(self, width: int, height: int) -> tuple[int, int]:
+        z = self._insertFree(width, height) or self._insertSkyline(width, height)
+        if z: self.count += 1; self.used += width * height
+        return z
+    def _insertFree(self, width: int, height: int) -> tuple[int, int]:
+        fits = [s for s in self.free if s[2] >= width and s[3] >= height]
+        if not fits: return None
+        x, y, w, h = z = min(fits, key=lambda s: s[2] * s[3]); self.free.remove(z)
+        if w > width: self.free.append((x + width, y, w - width, h))
+        if h > height: self.free.append((x, y + height, width, h - height))
+        return (x, y)
+    def _insertSkyline(self, width: int, height: int) -> tuple[int, int]:
+        best = None
+        for i in range(len(self.skyline)):
+            y = self._fit(i, width, height)
+            if y >= 0 and (best is None or (y + height, self.skyline[i][2]) < best[0]): best = ((y + height, self.skyline[i][2]), i, y)
+        if best is None: return None
+        _, i, y = best; x = self.skyline[i][0]
+        self.skyline.insert(i, [x, y + height, width])
+        j = i + 1
+        while j < len(self.skyline):
+            s = self.skyline[j]; shrink = x + width - s[0]
+            if shrink <= 0: break
+            if s[2] > shrink: s[0] += shrink; s[2] -= shrink; break
+            del self.skyline[j]
+        j = 0
+        while j < len(self.skyline) - 1:
+            if self.skyline[j][1] == self.skyline[j + 1][1]: self.skyline[j][2] += self.skyline[j + 1][2]; del self.skyline[j + 1]
+            else: j += 1
+        return (x, y)
+
+    def remove(self, x: int, y: int, width: int, height: int) -> None:
+        self.count -= 1; self.used -= width * height
+        if self.count <= 0: self.clear()
+        else: self.free.append((x, y, width, height))
+
+# AtlasRegion - where a texture landed in an atlas: the atlas texture and layer, its pixel rect, and uv = uv * (scaleU, scaleV) + (offsetU, offsetV)
+@dataclass
+class AtlasRegion:
+    texture: object
+    layer: int
+    x: int
+    y: int
+    width: int
+    height: int
+    uv: tuple[float, float, float, float]
+
+# TextureAtlas - packs many small same-format textures into shared atlas textures of width x height, each of layers layers (a texture
+# array above one), through the builder's createAtlasTexture and updateAtlasTexture. Regions are added and removed incrementally; a page
+# whose last region is removed is deleted, and textures larger than maxSize are left to the caller to create on their own
+class TextureAtlas:
+    def __init__(self, builder: TextureBuilderBase, width: int = 2048, height: int = 2048, layers: int = 1, padding: int = 1, maxSize: int = 256):
+        self.builder: TextureBuilderBase = builder
+        self.width = width
+        self.height = height
+        self.layers = layers
+        self.padding = padding
+        self.maxSize = maxSize
+        self.pages: list[list] = [] # [texture, packers]
+        self._regions: dict[object, tuple[AtlasRegion, list, int]] = {}
+    def __len__(self) -> int: return len(self._regions)
+    def __contains__(self, key: object) -> bool: return key in self._regions
+    def get(self, key: object) -> AtlasRegion: s = self._regions.get(key); return s[0] if s else None
+
+    def add(self, key: object, tex: ITexture) -> AtlasRegion:
+        if (s := self._regions.get(key)): return s[0]
+        p = self.padding; width = tex.width + 2 * p; height = tex.height + 2 * p
+        if max(tex.width, tex.height) > self.maxSize or width > self.width or height > self.height: return None
+        for page in self.pages:
+            for layer, packer in enumerate(page[1]):
+                if (z := packer.insert(width, height)): return self._add(key, tex, page, layer, z)
+        page = [self.builder.createAtlasTexture(self.width, self.height, self.layers), [SkylinePacker(self.width, self.height) for _ in range(self.layers)]]
+        self.pages.append(page); Metrics.count('atlas.pages')
+        return self._add(key, tex, page, 0, page[1][0].insert(width, height))
+    def _add(self, key: object, tex: ITexture, page: list, layer: int, z: tuple[int, int]) -> AtlasRegion:
+        x = z[0] + self.padding; y = z[1] + self.padding
+        with Metrics.span('atlas.upload'): uploaded = self.builder.updateAtlasTexture(page[0], layer, x, y, tex)
+        # a texture the builder can't convert gives its rectangle back rather than leave a region of uninitialised pixels
+        if uploaded is False: self._free(page, layer, z[0], z[1], tex.width + 2 * self.padding, tex.height + 2 * self.padding); return None
+        region = AtlasRegion(page[0], layer, x, y, tex.width, tex.height, (tex.width / self.width, tex.height / self.height, x / self.width, y / self.height))
+        self._regions[key] = (region, page, layer)
+        return region
+
+    def remove(self, key: object) -> None:
+        s = self._regions.pop(key, None)
+        if s is None: return
+        region, page, layer = s; p = self.padding
+        self._free(page, layer, region.x - p, region.y - p, region.width + 2 * p, region.height + 2 * p)
+    def _free(self, page: list, layer: int, x: int, y: int, width: int, height: int) -> None:
+        page[1][layer].remove(x, y, width, height)
+        if not any(packer.count for packer in page[1]): self.pages.remove(page); self.builder.deleteTexture(page[0])
+    def clear(self) -> None:
+        for page in self.pages: self.builder.deleteTexture(page[0])
+        self.pages.clear(); self._regions.clear()
 
 #endregion
 
@@ -373,36 +948,57 @@ class MaterialBuilderBase:
     defaultMaterial: Material
     terrainMaterial: Material
     def __init__(self, textureManager: TextureManager): self.textureManager = textureManager
-    def createMaterial(self, source: ISource, path: object) -> Material: pass
+    def createMaterial(self, source: ISource, path: object, owner: list = None) -> Material: pass # owner: passed to each textureManager.createTexture
 
 # MaterialManager
-class MaterialManager:
-    _cachedMaterials: dict[object, (Material, object)] = {}
-    def __init__(self, textureManager: TextureManager, builder: MaterialBuilderBase):
+class MaterialManager(AssetManager):
+    cacheBudget: int = 4096
+    def __init__(self, textureManager: TextureManager, builder: MaterialBuilderBase, budget: int = None):
         self._textureManager: TextureManager = textureManager
         self._builder: MaterialBuilderBase = builder
+        self._cachedMaterials: AssetCache = AssetCache(budget or MaterialManager.cacheBudget, onEvict=lambda k, v: self._releaseDeps(k))
+        super().__init__(self._cachedMaterials)
         self._preloadTasks: dict[object, object] = {}
+        self._flight: SingleFlight = SingleFlight()
 
-    async def createMaterial(self, source: ISource, path: object) -> tuple[Material, object]:
+    async def createMaterial(self, source: ISource, path: object, owner: list = None) -> tuple[Material, object]:
         key = (source, path)
-        if key in self._cachedMaterials: return self._cachedMaterials[key]
-        src = path if isinstance(path, MaterialProp) else await self._loadMaterial(source, path)
-        obj = await self._builder.createMaterial(source, src) if src else self._builder.defaultMaterial
+        value = self._cachedMaterials.get(key) if key in self._cachedMaterials else await self._flight.load(key, lambda: self._createMaterial(key, source, path))
+        return self._acquire(key, value, owner)
+
+    async def _createMaterial(self, key: object, source: ISource, path: object) -> tuple[Material, object]:
+        Metrics.count('material.loads')
+        with Metrics.span('material.load', path=path): src = path if isinstance(path, MaterialProp) else await self._loadMaterial(source, path)
+        # the material's textures stay pinned for as long as it is cached
+        deps = []
+        try:
+            with Metrics.span('material.build', path=path): obj = await self._builder.createMaterial(source, src, deps) if src else self._builder.defaultMaterial
+        except BaseException:
+            for s in deps: s.release()
+            raise
         tag = src.tag if src else None
-        self._cachedMaterials[key] = (obj, tag); return (obj, tag)
+        self._deps[key] = deps; self._cachedMaterials[key] = (obj, tag); return (obj, tag)
 
-    def preloadMaterial(self, source: ISource, path: object) -> None:
+    def preloadMaterial(self, source: ISource, path: object) -> object:
         key = (source, path)
-        if key in self._cachedMaterials: return
-        if not key in self._preloadTasks: self._preloadTasks[key] = surce.getAsset(typeof(MaterialProp), path)
+        if key in self._cachedMaterials: return None
+        if not key in self._preloadTasks: self._preloadTasks[key] = _preload(source.getAsset(MaterialProp, path))
+        return self._preloadTasks[key]
 
     async def _loadMaterial(self, source: ISource, path: object) -> MaterialProp:
         key = (source, path)
         assert(not key in self._cachedMaterials)
-        self.preloadMaterial(source, key)
-        obj = await self.preloadTasks[key]
-        self.preloadTasks.pop(key)
-        return obj
+        self.preloadMaterial(source, path)
+        try: return await self._preloadTasks[key]
+        finally: self._preloadTasks.pop(key, None)
+
+# MaterialScope - a MaterialManager whose createMaterial calls made without an owner append their handles to owner
+class MaterialScope:
+    def __init__(self, manager: MaterialManager, owner: list):
+        self._manager: MaterialManager = manager
+        self._owner: list = owner
+    def __getattr__(self, name: str) -> object: return getattr(self._manager, name)
+    async def createMaterial(self, source: ISource, path: object, owner: list = None) -> tuple[Material, object]: return await self._manager.createMaterial(source, path, self._owner if owner is None else owner)
 
 #endregion
 
@@ -465,4 +1061,9 @@ class IOpenGfxTerrain(IOpenGfx):
     def createTerrainData(self, offset: int, heights: list[list[float]], heightRange: float, sampleDistance: float, layers: list[GfxTerrainLayer[Texture]], alphaMap: list[list[list[float]]]) -> Object: pass
     def createTerrain(self, name: str, position: Vector3, data: object, parent: Object = None) -> Object: pass
 
-#endregion
\ No newline at end of file
+#endregion
+
+# late import: openstk.core imports the cell manager, which imports this module
+import openstk.core.poly.log as log
+from openstk.core.profiler import Metrics
+from openstk.core.cache import DiskCache
@@ -24,52 +24,71 @@ class Renderer:
 
 #region Raster
 
-# Raster
+# Raster - whole-buffer pixel conversions. Sources are any buffer (bytes, bytearray, memoryview, ndarray); results are (n, channels) uint8
+# arrays, written into the caller's buffer when out is given so per-frame decodes reuse one allocation.
 class Raster:
     @staticmethod
+    def _out(out: object, n: int, bbp: int) -> np.ndarray:
+        if out is None: return np.empty((n, bbp), np.uint8)
+        if not isinstance(out, np.ndarray): out = np.frombuffer(out, np.uint8)
+        if out.size < n * bbp: raise Exception(f'buffer too small: {out.size} < {n * bbp}')
+        return out.reshape(-1)[:n * bbp].reshape(n, bbp)
+    @staticmethod
+    def _view(source: object, dtype: type = np.uint8) -> np.ndarray: return source.reshape(-1).view(dtype) if isinstance(source, np.ndarray) else np.frombuffer(source, dtype)
+
+    # palette
+    @staticmethod
+    def paletteLut(palette: bytes, pbp: int, bbp: int = 4, alpha: int = None) -> np.ndarray:
+        pal = Raster._view(palette); pal = pal[:pal.size - pal.size % pbp].reshape(-1, pbp)
+        lut = np.full((len(pal), bbp), 0xFF, np.uint8); c = min(pbp, bbp); lut[:, :c] = pal[:, :c]
+        if alpha is not None and bbp == 4 and alpha < len(lut): lut[alpha, 3] = 0x00
+        return lut
+    @staticmethod
+    def expandPalette(source: bytes, lut: np.ndarray, out: object = None) -> np.ndarray:
+        src = Raster._view(source); return np.take(lut, src, axis=0, out=Raster._out(out, src.size, lut.shape[1]))
+    @staticmethod
     def blitByPalette(data: bytearray, bbp: int, source: bytes, palette: bytes, pbp: int, alpha: int = None) -> None:
-        pi = 0
-        if pbp == 3:
-            if bbp == 4:
-                if alpha == None:
-                    for i, s in enumerate(source):
-                        p = s * 3
-                        data[pi + 0] = palette[p + 0]
-                        data[pi + 1] = palette[p + 1]
-                        data[pi + 2] = palette[p + 2]
-                        data[pi + 3] = 0xFF
-                        pi += 4
-                else:
-                    a = alpha
-                    for i, s in enumerate(source):
-                        p = s * 3
-                        data[pi + 0] = palette[p + 0]
-                        data[pi + 1] = palette[p + 1]
-                        data[pi + 2] = palette[p + 2]
-                        data[pi + 3] = 0x00 if s == a else 0xFF
-                        pi += 4
-            elif bbp == 3:
-                for i, s in enumerate(source):
-                    p = s * 3
-                    data[pi + 0] = palette[p + 0]
-                    data[pi + 1] = palette[p + 1]
-                    data[pi + 2] = palette[p + 2]
-                    pi += 3
-        elif pbp == 4:
-            if bbp == 4:
-                for i, s in enumerate(source):
-                    p = s * 4
-                    data[pi + 0] = palette[p + 0]
-                    data[pi + 1] = palette[p + 1]
-                    data[pi + 2] = palette[p + 2]
-                    data[pi + 3] = palette[p + 3]
-                    pi += 4
-            elif bbp == 3:
-                for i, s in enumerate(source):
-                    p = s * 4
-                    data[pi + 0] = palette[p + 0]
-                    data[pi + 1] = palette[p + 1]
-                    data[pi + 2] = palette[p + 2]
-                    pi += 3
+        Raster.expandPalette(source, Raster.paletteLut(palette, pbp, bbp, alpha if pbp == 3 else None), data)
+
+    # packed 16 bit
+    @staticmethod
+    def rgb565ToRgba(source: bytes, out: object = None) -> np.ndarray:
+        s = Raster._view(source, '<u2'); z = Raster._out(out, s.size, 4)
+        r = (s >> 11).astype(np.uint8); g = ((s >> 5) & 0x3F).astype(np.uint8); b = (s & 0x1F).astype(np.uint8)
+        z[:, 0] = (r << 3) | (r >> 2); z[:, 1] = (g << 2) | (g >> 4); z[:, 2] = (b << 3) | (b >> 2); z[:, 3] = 0xFF
+        return z
+    @staticmethod
+    def bgra1555ToRgba(source: bytes, out: object = None) -> np.ndarray:
+        s = Raster._view(source, '<u2'); z = Raster._out(out, s.size, 4)
+        r = ((s >> 10) & 0x1F).astype(np.uint8); g = ((s >> 5) & 0x1F).astype(np.uint8); b = (s & 0x1F).astype(np.uint8)
+        z[:, 0] = (r << 3) | (r >> 2); z[:, 1] = (g << 3) | (g >> 2); z[:, 2] = (b << 3) | (b >> 2); z[:, 3] = np.where(s & 0x8000, 0xFF, 0x00)
+        return z
+
+    # swizzles
+    @staticmethod
+    def swizzle(source: bytes, order: tuple[int], out: object = None) -> np.ndarray:
+        s = Raster._view(source); s = s.reshape(-1, len(order))
+        z = Raster._out(out, len(s), len(order))
+        if np.shares_memory(s, z): s = s.copy()
+        z[:] = s[:, order]
+        return z
+    @staticmethod
+    def bgraToRgba(source: bytes, out: object = None) -> np.ndarray: return Raster.swizzle(source, (2, 1, 0, 3), out)
+    @staticmethod
+    def argbToRgba(source: bytes, out: object = None) -> np.ndarray: return Raster.swizzle(source, (1, 2, 3, 0), out)
+
+    # alpha
+    @staticmethod
+    def premultiply(source: bytes, out: object = None) -> np.ndarray:
+        s = Raster._view(source).reshape(-1, 4); a = s[:, 3:].astype(np.uint16)
+        rgb = ((s[:, :3] * a + 127) // 255).astype(np.uint8)
+        z = Raster._out(out, len(s), 4); z[:, 3] = s[:, 3]; z[:, :3] = rgb
+        return z
+    @staticmethod
+    def unpremultiply(source: bytes, out: object = None) -> np.ndarray:
+        s = Raster._view(source).reshape(-1, 4); a = s[:, 3:].astype(np.uint16)
+        rgb = np.where(a > 0, np.minimum((s[:, :3] * np.uint16(255) + a // 2) // np.maximum(a, 1), 255), 0).astype(np.uint8)
+        z = Raster._out(out, len(s), 4); z[:, 3] = s[:, 3]; z[:, :3] = rgb
+        return z
 
 #endregion
\ No newline at end of file
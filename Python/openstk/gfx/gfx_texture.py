@@ -1,7 +1,10 @@
 from __future__ import annotations
-import os
+import os, inspect, numpy as np
 from enum import IntEnum, Enum, IntFlag, Flag
-from openstk.core import BinaryReader, Writer
+from openstk.core import BinaryReader, Writer, DiskCache, schema
+from openstk.core.profiler import Metrics
+from openstk.gfx.gfx import ITexture, ITextureStream, StreamTexture, Texture_Bytes
+from openstk.gfx.gfx_render import Raster
 
 #region Texture Enums
 
@@ -81,8 +84,8 @@ class DDPF(Flag):
     NORMAL = 0x80000000         # The normal
 
 # Surface pixel format.
+@schema('8I', 'dwSize', 'dwFlags', 'dwFourCC', 'dwRGBBitCount', 'dwRBitMask', 'dwGBitMask', 'dwBBitMask', 'dwABitMask')
 class DDS_PIXELFORMAT:
-    _struct = ('8I', 32)
     dwSize: int                 # Structure size; set to 32 (bytes)
     dwFlags: DDPF               # Values which indicate what type of data is in the surface
     dwFourCC: FourCC            # Four-character codes for specifying compressed or custom formats. Possible values include: DXT1, DXT2, DXT3, DXT4, or DXT5. A FourCC of DX10 indicates the prescense of the DDS_HEADER_DXT10 extended header, and the dxgiFormat member of that structure indicates the true format. When using a four-character code, dwFlags must include DDPF_FOURCC
@@ -113,8 +116,8 @@ class D3D10_RESOURCE_DIMENSION(Enum):
     TEXTURE3D = 4       # Resource is a 3D texture with a volume specified by the dwWidth, dwHeight, and dwDepth members of DDS_HEADER. You also must set the DDSD_DEPTH flag in the dwFlags member of DDS_HEADER
 
 # DDS header extension to handle resource arrays, DXGI pixel formats that don't map to the legacy Microsoft DirectDraw pixel format structures, and additional metadata
+@schema('<5I', 'dxgiFormat', 'resourceDimension', 'miscFlag', 'arraySize', 'miscFlags2')
 class DDS_HEADER_DXT10:
-    _struct = ('<5I', 20)
     def __init__(self, tuple):
         self.dxgiFormat, \
         self.resourceDimension, \
@@ -176,8 +179,8 @@ class DDSCAPS2(IntFlag):
     FLAGS_VOLUME = VOLUME
 
 # Describes a DDS file header
+@schema(f'<7I44s{DDS_PIXELFORMAT._struct[0]}5I', slots=('dwSize', 'dwFlags', 'dwHeight', 'dwWidth', 'dwPitchOrLinearSize', 'dwDepth', 'dwMipMapCount', 'dwReserved1', 'ddspf', 'dwCaps', 'dwCaps2', 'dwCaps3', 'dwCaps4', 'dwReserved2'))
 class DDS_HEADER:
-    _struct = (f'<7I44s{DDS_PIXELFORMAT._struct[0]}5I', 124)
     MAGIC = 0x20534444 # DDS_
     def __init__(self, tuple):
         ddspf = self.ddspf = DDS_PIXELFORMAT()
@@ -208,6 +211,10 @@ class DDS_HEADER:
         ddspf.dwFourCC = FourCC(ddspf.dwFourCC)
         self.dwCaps = DDSCAPS(self.dwCaps)
         self.dwCaps2 = DDSCAPS2(self.dwCaps2)
+    def toTuple(self) -> tuple: ddspf = self.ddspf; return (
+        self.dwSize, self.dwFlags, self.dwHeight, self.dwWidth, self.dwPitchOrLinearSize, self.dwDepth, self.dwMipMapCount, self.dwReserved1,
+        ddspf.dwSize, ddspf.dwFlags, ddspf.dwFourCC, ddspf.dwRGBBitCount, ddspf.dwRBitMask, ddspf.dwGBitMask, ddspf.dwBBitMask, ddspf.dwABitMask,
+        self.dwCaps, self.dwCaps2, self.dwCaps3, self.dwCaps4, self.dwReserved2)
 
     # Verifies this instance
     def verify(self):
@@ -217,7 +224,11 @@ class DDS_HEADER:
         elif self.ddspf.dwSize != 32: raise Exception(f'Invalid DDS file pixel format size: {self.ddspf.dwSize}.')
 
     @staticmethod
-    def read(r: BinaryReader, readMagic: bool = True) -> (DDS_HEADER, DDS_HEADER_DXT10, object, bytes):
+    def read(r: BinaryReader, readMagic: bool = True) -> (DDS_HEADER, DDS_HEADER_DXT10, object, bytes): return *DDS_HEADER.readHeader(r, readMagic), r.readToEnd()
+
+    # Reads the headers only, leaving r at the payload
+    @staticmethod
+    def readHeader(r: BinaryReader, readMagic: bool = True) -> (DDS_HEADER, DDS_HEADER_DXT10, object):
         if readMagic:
             magic = r.readUInt32()
             if magic != DDS_HEADER.MAGIC: raise Exception(f'Invalid DDS file magic: "{magic}".')
@@ -250,11 +261,33 @@ class DDS_HEADER:
                     case _: raise Exception(f'Unknown dxgiFormat: 0x{ddspf.dxgiFormat:x}')
             # BC4U/BC4S/ATI2/BC55/R8G8_B8G8/G8R8_G8B8/UYVY-packed/YUY2-packed unsupported
             case _: raise Exception(f'Unknown dwFourCC: 0x{ddspf.dwFourCC:x}')
-        return header, headerDxt10, format, r.readToEnd()
+        return header, headerDxt10, format
+
+    # Reads the headers and the absolute byte span of each mip of a 2D texture, for streaming the mips from the archive
+    @staticmethod
+    def readSpans(r: BinaryReader, readMagic: bool = True) -> (DDS_HEADER, DDS_HEADER_DXT10, object, list[range]):
+        header, headerDxt10, format = DDS_HEADER.readHeader(r, readMagic)
+        compressed = format[2][0] & TextureFormat.Compressed; bpp = header.ddspf.dwRGBBitCount >> 3 if format[0] == 'Raw' else format[1]
+        spans = []; o = r.tell()
+        for l in range(max(1, header.dwMipMapCount)):
+            width = max(1, header.dwWidth >> l); height = max(1, header.dwHeight >> l)
+            size = max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * format[1] if compressed else width * height * bpp
+            spans.append(range(o, o + size)); o += size
+        return header, headerDxt10, format, spans
+
+    # Reads the headers into a StreamTexture for TextureManager's streaming mode, a source's getAsset returning it in place of the whole
+    # texture: read(offset, size) reads a mip's span from the archive, by default from r, which then stays open
+    @staticmethod
+    def readStream(r: BinaryReader, read: callable = None, readMagic: bool = True) -> StreamTexture:
+        header, _, format, spans = DDS_HEADER.readSpans(r, readMagic)
+        return StreamTexture(header.dwWidth, header.dwHeight, len(spans), format[2], spans, read or (lambda offset, size: bytes(r.seek(offset).readBytes(size))))
 
     @staticmethod
     def write(w: Writer, header: DDS_HEADER, headerDxt10: DDS_HEADER_DXT10, object, bytes: bytearray, writeMagic: bool = True) -> None:
-        pass
+        if writeMagic: w.writeUInt32(DDS_HEADER.MAGIC)
+        w.writeS(DDS_HEADER, header)
+        if headerDxt10: w.writeS(DDS_HEADER_DXT10, headerDxt10)
+        w.write(bytes)
 
     @staticmethod
     def _makeformat(f: DDS_PIXELFORMAT) -> object: return ('Raw', f.dwRGBBitCount >> 2, (TextureFormat.RGBA32, TexturePixel.Unknown))
@@ -265,6 +298,135 @@ class DDS_HEADER:
 
 #endregion
 
+#region BlockDecoder
+
+# BlockDecoder - CPU fallback for block compressed textures: decodes BC1-BC5 (DXT1/3/5, BC4, BC5) to RGBA32, every 4x4 block of a mip
+# level at once as arrays. BC4 decodes to grey and BC5 to red and green, as the backend would sample them.
+class BlockDecoder:
+    blockSizes: dict[TextureFormat, int] = {TextureFormat.DXT1: 8, TextureFormat.DXT1A: 8, TextureFormat.DXT3: 16, TextureFormat.DXT5: 16, TextureFormat.BC4: 8, TextureFormat.BC5: 16}
+    _shift2 = np.arange(16, dtype=np.uint32) * 2
+    _shift3 = np.arange(16, dtype=np.uint64) * 3
+    _shift4 = np.arange(16, dtype=np.uint64) * 4
+    _weights8 = np.array([1., 0., 6/7, 5/7, 4/7, 3/7, 2/7, 1/7], np.float32)
+    _weights6 = np.array([1., 0., 4/5, 3/5, 2/5, 1/5, 0., 0.], np.float32)
+
+    @staticmethod
+    def canDecode(format: object) -> bool: return isinstance(format, tuple) and format[0] in BlockDecoder.blockSizes
+    @staticmethod
+    def levelSize(format: TextureFormat, width: int, height: int) -> int: return max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * BlockDecoder.blockSizes[format]
+
+    # blocks
+    @staticmethod
+    def _color(b: np.ndarray, fourColor: bool) -> np.ndarray:
+        c = b[:, :4].copy().view('<u2'); e = Raster.rgb565ToRgba(c).reshape(-1, 2, 4).astype(np.uint16); c0 = e[:, 0]; c1 = e[:, 1]
+        four = (fourColor | (c[:, 0] > c[:, 1]))[:, None]
+        palette = np.empty((len(b), 4, 4), np.uint8); palette[:, 0] = c0; palette[:, 1] = c1
+        palette[:, 2] = np.where(four, (2 * c0 + c1 + 1) // 3, (c0 + c1) // 2)
+        palette[:, 3] = np.where(four, (c0 + 2 * c1 + 1) // 3, 0)
+        idx = (b[:, 4:8].copy().view('<u4') >> BlockDecoder._shift2) & 3
+        return palette[np.arange(len(b))[:, None], idx]
+    @staticmethod
+    def _alpha4(b: np.ndarray) -> np.ndarray: return (((b.copy().view('<u8') >> BlockDecoder._shift4) & 15) * 17).astype(np.uint8)
+    @staticmethod
+    def _alpha8(b: np.ndarray, signed: bool = False) -> np.ndarray:
+        a = np.maximum(b[:, :2].copy().view(np.int8), -127).astype(np.float32) if signed else b[:, :2].astype(np.float32); a0 = a[:, 0:1]; a1 = a[:, 1:2]
+        eight = a0 > a1; w = np.where(eight, BlockDecoder._weights8, BlockDecoder._weights6)
+        palette = a0 * w + a1 * (1. - w)
+        palette[:, 6] = np.where(eight[:, 0], palette[:, 6], -127. if signed else 0.); palette[:, 7] = np.where(eight[:, 0], palette[:, 7], 127. if signed else 255.)
+        if signed: palette = (palette + 127.) * (255. / 254.)
+        palette = np.rint(palette).astype(np.uint8)
+        bits = np.zeros((len(b), 8), np.uint8); bits[:, :6] = b[:, 2:8]
+        idx = (bits.view('<u8') >> BlockDecoder._shift3) & 7
+        return palette[np.arange(len(b))[:, None], idx.astype(np.intp)]
+
+    # Decodes one mip level to a (height, width, 4) RGBA array
+    @staticmethod
+    def decodeLevel(data: bytes, format: TextureFormat, width: int, height: int, signed: bool = False) -> np.ndarray:
+        bw = max(1, (width + 3) // 4); bh = max(1, (height + 3) // 4); size = BlockDecoder.blockSizes[format]
+        b = np.frombuffer(data, np.uint8, bw * bh * size).reshape(-1, size)
+        match format:
+            case TextureFormat.DXT1 | TextureFormat.DXT1A:
+                z = BlockDecoder._color(b, False)
+                if format == TextureFormat.DXT1: z[..., 3] = 0xFF
+            case TextureFormat.DXT3: z = BlockDecoder._color(b[:, 8:], True); z[..., 3] = BlockDecoder._alpha4(b[:, :8])
+            case TextureFormat.DXT5: z = BlockDecoder._color(b[:, 8:], True); z[..., 3] = BlockDecoder._alpha8(b[:, :8])
+            case TextureFormat.BC4: z = np.full((len(b), 16, 4), 0xFF, np.uint8); z[..., :3] = BlockDecoder._alpha8(b, signed)[..., None]
+            case TextureFormat.BC5: z = np.full((len(b), 16, 4), 0xFF, np.uint8); z[..., 0] = BlockDecoder._alpha8(b[:, :8], signed); z[..., 1] = BlockDecoder._alpha8(b[:, 8:], signed); z[..., 2] = 0
+            case _: raise Exception(f'Unknown format: {format}')
+        return np.ascontiguousarray(z.reshape(bh, bw, 4, 4, 4).transpose(0, 2, 1, 3, 4).reshape(bh * 4, bw * 4, 4)[:height, :width])
+
+    # Converts the block compressed bytes of src to RGBA32 bytes, decoding the mips in level only; the spans of the other mips are missing (-1)
+    @staticmethod
+    def decodeTexture(src: ITexture, x: Texture_Bytes, level: range = None) -> Texture_Bytes:
+        format, pixel = x.format; signed = bool(pixel & TexturePixel.Signed) and format in (TextureFormat.BC4, TextureFormat.BC5)
+        numMipMaps = max(1, src.mipMaps); level = range(level.start if level else 0, min(level.stop, numMipMaps) if level else numMipMaps)
+        pixels = []; spans = []; o = 0; p = 0
+        with Metrics.span('texture.decode', format=format.name):
+            for l in range(numMipMaps):
+                width = max(1, src.width >> l); height = max(1, src.height >> l)
+                span = x.spans[l] if x.spans else range(p, p + BlockDecoder.levelSize(format, width, height)); p = span.stop
+                if l not in level: spans.append(range(-1, -1)); continue
+                z = BlockDecoder.decodeLevel(memoryview(x.bytes)[span.start:span.stop], format, width, height, signed)
+                pixels.append(z.tobytes()); spans.append(range(o, o + z.nbytes)); o += z.nbytes
+        return Texture_Bytes(b''.join(pixels), (TextureFormat.RGBA32, TexturePixel.Unknown), spans)
+
+# texturePixels - a mip of tex as a (height, width, 4) RGBA array, block compressed formats decoded and packed ones converted, or None for
+# formats without CPU pixels
+def texturePixels(tex: ITexture, level: int = 0) -> np.ndarray:
+    x = tex.create('CPU', lambda s: s) if tex else None
+    if not isinstance(x, Texture_Bytes) or not x.bytes or not isinstance(x.format, tuple): return None
+    if BlockDecoder.canDecode(x.format): x = BlockDecoder.decodeTexture(tex, x, range(level, level + 1))
+    width = max(1, tex.width >> level); height = max(1, tex.height >> level); n = width * height
+    span = x.spans[level] if x.spans else range(0, len(x.bytes)); pixels = memoryview(x.bytes)[span.start:span.stop]
+    match x.format[0]:
+        case TextureFormat.RGBA32: z = np.frombuffer(pixels, np.uint8, n * 4)
+        case TextureFormat.BGRA32: z = Raster.bgraToRgba(pixels[:n * 4])
+        case TextureFormat.ARGB32: z = Raster.argbToRgba(pixels[:n * 4])
+        case TextureFormat.RGB565: z = Raster.rgb565ToRgba(pixels[:n * 2])
+        case TextureFormat.BGRA1555: z = Raster.bgra1555ToRgba(pixels[:n * 2])
+        case TextureFormat.RGB24: z = np.full((n, 4), 0xFF, np.uint8); z[:, :3] = np.frombuffer(pixels, np.uint8, n * 3).reshape(n, 3)
+        case TextureFormat.I8 | TextureFormat.L8 | TextureFormat.R8: z = np.full((n, 4), 0xFF, np.uint8); z[:, :3] = np.frombuffer(pixels, np.uint8, n)[:, None]
+        case _: return None
+    return z.reshape(height, width, 4)
+
+# DecodedTexture - a texture's mips decoded on the cpu to RGBA32, for the backends without its format; load() keeps them in a DiskCache,
+# so a warm start maps the decoded mips instead of reading and decoding the texture again
+class DecodedTexture(ITexture):
+    version: str = '1'
+    def __init__(self, width: int, height: int, mipMaps: int, texFlags: int, bytes: bytes, spans: list[range]):
+        self.width = width; self.height = height; self.depth = 0; self.mipMaps = mipMaps; self.texFlags = texFlags
+        self.format = (TextureFormat.RGBA32, TexturePixel.Unknown); self.bytes = bytes; self.spans = spans
+    def create(self, platform: str, func: callable) -> object: return func(Texture_Bytes(self.bytes, self.format, self.spans))
+
+    # decodes every mip of tex: block compressed formats, and with convert the other formats too; None when tex is kept as is
+    @staticmethod
+    def decode(tex: ITexture, convert: bool = False) -> DecodedTexture:
+        if not tex or isinstance(tex, ITextureStream): return None
+        x = tex.create('CPU', lambda s: s)
+        if not isinstance(x, Texture_Bytes) or not isinstance(x.format, tuple): return None
+        if not BlockDecoder.canDecode(x.format) and not (convert and x.format[0] != TextureFormat.RGBA32): return None
+        levels = [texturePixels(tex, l) for l in range(max(1, tex.mipMaps))]
+        if any(s is None for s in levels): return None
+        spans = []; o = 0
+        for s in levels: spans.append(range(o, o + s.nbytes)); o += s.nbytes
+        texFlags = getattr(tex, 'texFlags', 0)
+        return DecodedTexture(tex.width, tex.height, len(levels), texFlags.value if isinstance(texFlags, Flag) else int(texFlags or 0), np.concatenate([s.reshape(-1) for s in levels]).data, spans)
+
+    # the texture at path: decoded from the cache, else by load() then decoded and put in the cache
+    @staticmethod
+    async def load(cache: DiskCache, archive: str, path: str, load: callable, convert: bool = False) -> ITexture:
+        if (z := cache.get(archive, path, 'rgba', DecodedTexture.version)):
+            meta, data = z
+            return DecodedTexture(meta['width'], meta['height'], meta['mipMaps'], meta['texFlags'], data, [range(*s) for s in meta['spans']])
+        tex = load()
+        if inspect.isawaitable(tex): tex = await tex
+        if (z := DecodedTexture.decode(tex, convert)) is None: return tex
+        with Metrics.span('texture.cache', path=path):
+            cache.put(archive, path, z.bytes, {'width': z.width, 'height': z.height, 'mipMaps': z.mipMaps, 'texFlags': z.texFlags, 'spans': [[s.start, s.stop] for s in z.spans]}, 'rgba', DecodedTexture.version)
+        return z
+
+#endregion
+
 #region DXGI_FORMAT
 # https://docs.microsoft.com/en-us/windows/win32/api/dxgiformat/ne-dxgiformat-dxgi_format
 
@@ -1,10 +1,371 @@
+import io, asyncio, contextlib, tempfile, numpy as np
+from types import SimpleNamespace
 from unittest import TestCase, main
-from gfx import GfX
+from gfx import GfX, AssetCache, SingleFlight, ITexture, Texture_Bytes, TextureManager, TextureBuilderBase, MaterialManager, MaterialBuilderBase, MaterialProp, StreamTexture, TextureStreamer, SkylinePacker, TextureAtlas, TerrainLayerManager, GfxTerrainLayer, ObjectModelManager, ObjectModelBuilderBase, textureBytes, normalMapPixels
+from openstk.core import DiskCache
+from gfx_texture import TextureFormat, TexturePixel
+from openstk.gfx import gfx_texture
 
 # TestGfX
 class TestGfX(TestCase):
     def test__init__(self):
         self.assertEqual(0, GfX.maxTextureMaxAnisotropy)
 
+# TestAssetCache
+class TestAssetCache(TestCase):
+    def test_lru(self):
+        evicted = []
+        cache = AssetCache(10, lambda s: s, lambda k, v: evicted.append(k))
+        cache['a'] = 4; cache['b'] = 4; cache.get('a'); cache['c'] = 4
+        self.assertEqual((['b'], 8), (evicted, cache.size))
+        cache.pin('a'); cache['d'] = 4
+        self.assertEqual(['b', 'c'], evicted)
+        self.assertEqual(['a', 'd'], list(cache))
+    def test_lfu(self):
+        cache = AssetCache(2, policy='lfu')
+        cache['a'] = 1; cache.get('a'); cache['b'] = 2; cache['c'] = 3
+        self.assertEqual(['a', 'c'], list(cache))
+    def test_oversized(self):
+        evicted = []
+        cache = AssetCache(10, lambda s: s, lambda k, v: evicted.append(k))
+        cache['a'] = 4; cache['b'] = 20
+        self.assertEqual((['a'], ['b']), (evicted, list(cache)))
+
+# TestSingleFlight
+class TestSingleFlight(TestCase):
+    class Source:
+        def __init__(self): self.calls = 0
+        async def getAsset(self, type, path):
+            self.calls += 1; await asyncio.sleep(0.001)
+            if path == 'missing': raise FileNotFoundError(path)
+            return path
+    class Builder(ObjectModelBuilderBase):
+        def __init__(self): self.calls = 0
+        def instanceObject(self, src): return src
+        async def createObject(self, source, path, isStatic, materialManager): self.calls += 1; return f'prefab:{path}'
+    def test_dedupe(self):
+        source = self.Source(); builder = self.Builder(); manager = ObjectModelManager(None, builder)
+        async def run(): return await asyncio.gather(*[manager.createObject(source, 'mesh', True) for i in range(300)])
+        results = asyncio.run(run())
+        self.assertEqual((1, 1), (source.calls, builder.calls))
+        self.assertEqual({('prefab:mesh', 'mesh')}, set(results))
+    def test_errors(self):
+        source = self.Source(); manager = ObjectModelManager(None, self.Builder())
+        async def run(): return [await manager.createObject(source, 'missing', True) for i in range(3)]
+        self.assertEqual([(None, None)] * 3, asyncio.run(run()))
+        self.assertEqual(1, source.calls)
+        manager._flight.forget(); asyncio.run(run())
+        self.assertEqual(2, source.calls)
+    def test_ttl(self):
+        flight = SingleFlight(errorTtl=0); calls = []
+        async def fail(): calls.append(1); raise ValueError()
+        async def run():
+            for i in range(2):
+                with self.assertRaises(ValueError): await flight.load('k', fail)
+        asyncio.run(run())
+        self.assertEqual(2, len(calls))
+
+# TestTextureManager
+class TestTextureManager(TestCase):
+    class Texture(ITexture):
+        def __init__(self, width: int, height: int): self.width = width; self.height = height; self.depth = 0; self.mipMaps = 1
+    class Builder(TextureBuilderBase):
+        defaultTexture = 0
+        def __init__(self): self.deleted = []; self.next = 0
+        def createTexture(self, reuse, tex, level = None): self.next += 1; return self.next
+        def createSolidTexture(self, width, height, rgba): self.next += 1; return self.next
+        def deleteTexture(self, tex): self.deleted.append(tex)
+    def test_budget(self):
+        self.assertEqual(1024, textureBytes(self.Texture(16, 16)))
+        self.assertEqual(512, textureBytes(SimpleNamespace(width=32, height=32, mipMaps=1, format=(SimpleNamespace(name='DXT1'), None))))
+        builder = self.Builder(); manager = TextureManager(builder, budget=2048)
+        async def run():
+            for s in range(3): await manager.createTexture(None, self.Texture(16, 16))
+        asyncio.run(run())
+        self.assertEqual([1], builder.deleted)
+        self.assertEqual(2048, manager._cachedTextures.size)
+        manager.deleteTexture(None, next(iter(manager._cachedTextures))[1])
+        self.assertEqual([1, 2], builder.deleted)
+
+    def test_handles(self):
+        builder = self.Builder(); manager = TextureManager(builder); cellA = []; cellB = []; tex = self.Texture(4, 4)
+        async def run():
+            a = await manager.createTexture(None, tex, owner=cellA); await manager.createTexture(None, tex, owner=cellB)
+            return a
+        obj, tag = handle = asyncio.run(run())
+        self.assertEqual((1, tex, 2), (obj, tag, manager._cachedTextures.pins(handle.key)))
+        for s in cellA: s.release()
+        self.assertEqual(0, manager.drain())
+        for s in cellB: s.release(); s.release()
+        self.assertEqual((1, [1]), (manager.drain(), builder.deleted))
+        self.assertEqual(0, len(manager._cachedTextures))
+
+    def test_cancelPreload(self):
+        manager = TextureManager(self.Builder()); tex = self.Texture(4, 4); loads = []
+        class Source:
+            async def getAsset(self, type, path): loads.append(path); await asyncio.sleep(.01); return tex
+        source = Source()
+        async def run():
+            task = manager.preloadTexture(source, 'a')
+            self.assertTrue(manager.cancelPreload(source, 'a'))
+            await asyncio.sleep(0)
+            self.assertTrue(task.cancelled())
+            return await manager.createTexture(source, 'a')
+        self.assertEqual((1, tex), asyncio.run(run()))
+        self.assertEqual(['a'], loads)
+    def test_sharedPreload(self):
+        manager = TextureManager(self.Builder())
+        class Source:
+            async def getAsset(self, type, path): await asyncio.sleep(.01); return TestTextureManager.Texture(4, 4)
+        source = Source()
+        async def run():
+            task = manager.preloadTexture(source, 'a'); self.assertIs(task, manager.preloadTexture(source, 'a'))
+            # a second requester keeps the load alive until it drops it too
+            self.assertFalse(manager.cancelPreload(source, 'a'))
+            await asyncio.sleep(0); self.assertFalse(task.cancelled())
+            self.assertTrue(manager.cancelPreload(source, 'a'))
+            await asyncio.sleep(0); self.assertTrue(task.cancelled())
+            manager.preloadTexture(source, 'b'); await manager.createTexture(source, 'b')
+            self.assertEqual({}, manager._preloadRefs)
+        asyncio.run(run())
+    def test_solid(self):
+        builder = self.Builder(); manager = TextureManager(builder)
+        a = manager.createSolidTexture(1, 1, [.2, .0, .0, .3])
+        self.assertEqual(a, manager.createSolidTexture(1, 1, np.array([.2, .0, .0, .3])))
+        self.assertNotEqual(a, manager.createSolidTexture(1, 1, [.2, .0, .0, .4]))
+    def test_diskCache(self):
+        class Builder(self.Builder): decodeCompressed = True
+        class Texture(self.Texture):
+            def create(self, platform: str, func: callable) -> object: return func(gfx_texture.Texture_Bytes(bytes(8), (gfx_texture.TextureFormat.DXT1, gfx_texture.TexturePixel.Unknown), None))
+        class Source:
+            pakPath = None; loads = 0
+            async def getAsset(self, type, path): self.loads += 1; return Texture(4, 4)
+        source = Source()
+        with tempfile.TemporaryDirectory() as tmp:
+            source.pakPath = f'{tmp}/data.bsa'; open(source.pakPath, 'wb').close()
+            async def run(manager): return await manager.createTexture(source, 'a.dds')
+            for s in range(2):
+                manager = TextureManager(Builder()); manager.diskCache = cache = DiskCache(f'{tmp}/cache')
+                _, tag = asyncio.run(run(manager))
+                self.assertIsInstance(tag, gfx_texture.DecodedTexture)
+            self.assertEqual((1, 1), (source.loads, cache.hits))
+            self.assertEqual((gfx_texture.TextureFormat.RGBA32, 64), (tag.format[0], len(tag.bytes)))
+    def test_drainUploads(self):
+        class Builder(self.Builder):
+            def __init__(self): super().__init__(); self.uploads = 2; self.deadlines = []
+            def drain(self, deadline = None): self.deadlines.append(deadline); n = min(1, self.uploads); self.uploads -= n; return n
+        builder = Builder(); manager = TextureManager(builder)
+        self.assertEqual((1, 1, 0), (manager.drain(5), manager.drain(), manager.drain()))
+        self.assertEqual([5, None, None], builder.deadlines)
+
+# TestMaterialManager
+class TestMaterialManager(TestCase):
+    class Prop(MaterialProp):
+        def __init__(self, *textures: ITexture): self.textures = textures
+    class Builder(MaterialBuilderBase):
+        async def createMaterial(self, source, path, owner = None): return [(await self.textureManager.createTexture(source, s, owner=owner))[0] for s in path.textures]
+    def test_pins(self):
+        builder = TestTextureManager.Builder(); textures = TextureManager(builder, budget=1024); manager = MaterialManager(textures, self.Builder(textures))
+        a, b = TestTextureManager.Texture(8, 8), TestTextureManager.Texture(8, 8)
+        async def run():
+            material, _ = await manager.createMaterial(None, self.Prop(a, b))
+            # over budget, but the material's textures stay pinned
+            await textures.createTexture(None, TestTextureManager.Texture(16, 16))
+            return material
+        self.assertEqual([1, 2], asyncio.run(run()))
+        self.assertEqual([], builder.deleted)
+        self.assertEqual((1, 1), (textures._cachedTextures.pins((None, a)), textures._cachedTextures.pins((None, b))))
+        # evicting the material unpins them, and they go back under budget
+        manager._cachedMaterials.clear(); textures.drain()
+        self.assertEqual(([1, 2], 1024), (builder.deleted, textures._cachedTextures.size))
+    def test_graph(self):
+        class Builder(ObjectModelBuilderBase):
+            def instanceObject(self, src): return src
+            async def createObject(self, source, path, isStatic, materialManager): return [(await materialManager.createMaterial(source, s))[0] for s in path]
+        class Source:
+            async def getAsset(self, type, path): return [TestMaterialManager.Prop(tex)]
+        builder = TestTextureManager.Builder(); textures = TextureManager(builder); materials = MaterialManager(textures, self.Builder(textures))
+        models = ObjectModelManager(materials, Builder()); tex = TestTextureManager.Texture(4, 4); source = Source(); cell = []
+        self.assertEqual([[1]], asyncio.run(models.createObject(source, 'mesh', True, owner=cell))[0])
+        self.assertEqual((1, 1, 1), (models._cachedObjects.pins((source, 'mesh')), len(models._deps[(source, 'mesh')]), textures._cachedTextures.pins((source, tex))))
+        # releasing the cell frees the model, then its materials, then their textures, draining in the cell builder's order
+        for s in cell: s.release()
+        self.assertEqual((1, 1, 1), (models.drain(), materials.drain(), textures.drain()))
+        self.assertEqual(([1], 0, 0), (builder.deleted, len(materials._cachedMaterials), len(models._cachedObjects)))
+
+# TestTextureStreamer
+class TestTextureStreamer(TestCase):
+    class Builder(TestTextureManager.Builder):
+        def __init__(self): super().__init__(); self.uploads = []
+        def createTexture(self, reuse, tex, level = None):
+            spans = tex.create('GL', lambda x: x.spans); self.uploads.append((reuse, level, [len(spans[l]) for l in level]))
+            return reuse or super().createTexture(reuse, tex, level)
+
+    def setUp(self):
+        self.data = bytes(range(256)) * 1400; self.reads = []; self.format = (TextureFormat.RGBA32, TexturePixel.Unknown)
+        spans = []; o = 0
+        for l in range(9): n = (256 >> l) ** 2 * 4; spans.append(range(o, o + n)); o += n
+        async def read(offset: int, size: int) -> bytes: self.reads.append(offset); await asyncio.sleep(0); return self.data[offset:offset + size]
+        self.tex = StreamTexture(256, 256, 9, self.format, spans, read)
+        self.builder = self.Builder(); self.manager = TextureManager(self.builder)
+        self.streamer = self.manager.streamer = TextureStreamer(self.manager)
+
+    def test_levels(self):
+        self.assertEqual((2, 2), (self.streamer.tailLevel(self.tex), self.streamer.tailLevel(StreamTexture(1024, 1024, 3, self.format, None, None))))
+        self.assertEqual((0, 0, 1, 2), tuple(self.streamer.levelForSize(self.tex, s) for s in (1000, 256, 128, 60)))
+        self.assertEqual((0, 1, 3), tuple(self.streamer.levelForDistance(self.tex, s) for s in (100., 600., 3000.)))
+        self.assertEqual(21844, textureBytes(self.tex, range(2, 9)))
+    def test_stream(self):
+        async def run():
+            obj, _ = await self.manager.createTexture(None, self.tex)
+            self.assertEqual(self.tex.spans[2].start, self.reads[0])
+            self.assertEqual([(None, range(2, 9), [16384, 4096, 1024, 256, 64, 16, 4])], self.builder.uploads)
+            self.assertEqual((21844, 21844), (self.streamer.size, self.manager._cachedTextures.size))
+            self.streamer.requestSize(None, self.tex, 256.)
+            for s in range(4): await asyncio.sleep(0)
+            self.assertEqual(1, self.streamer.drain())
+            self.assertEqual((obj, range(0, 9)), self.builder.uploads[-1][:2])
+            self.assertEqual((0, 349524), (self.streamer.level((None, self.tex)), self.manager._cachedTextures.size))
+            self.assertEqual(self.data[self.tex.spans[0].start:self.tex.spans[0].stop], self.tex.levels[0])
+            # over budget: the mips no longer wanted drop first, then the head back to the tail
+            self.streamer.request(None, self.tex, 1); self.streamer.trim(100000)
+            self.assertEqual((1, [1, 2, 3, 4, 5, 6, 7, 8]), (self.streamer.level((None, self.tex)), sorted(self.tex.levels)))
+            self.streamer.trim(1000)
+            self.assertEqual((2, 21844), (self.streamer.level((None, self.tex)), self.streamer.size))
+            self.manager.deleteTexture(None, self.tex)
+            self.assertEqual((0, 0), (len(self.streamer), self.streamer.size))
+        asyncio.run(run())
+    def test_noLoop(self):
+        asyncio.run(self.manager.createTexture(None, self.tex))
+        # a request outside an event loop is read and uploaded by the next drain
+        self.manager.reloadTexture(None, self.tex, range(0, 9))
+        self.assertEqual(({(None, self.tex)}, None), (self.streamer._fetches, self.streamer._streams[(None, self.tex)][4]))
+        self.assertEqual((1, 0, set()), (self.streamer.drain(), self.streamer.level((None, self.tex)), self.streamer._fetches))
+    def test_requestOwned(self):
+        cell = []
+        async def run():
+            await self.manager.createTexture(None, self.tex, owner=cell)
+            self.streamer.requestOwned(cell + [SimpleNamespace(manager=SimpleNamespace(_deps={'model': cell}), key='model')], 100.)
+            for s in range(4): await asyncio.sleep(0)
+            self.streamer.drain()
+        asyncio.run(run())
+        self.assertEqual(0, self.streamer.level((None, self.tex)))
+        self.assertIsNotNone(TextureManager(self.builder, streaming=True).streamer)
+    def test_full(self):
+        self.manager.streamer = None
+        asyncio.run(self.manager.createTexture(None, self.tex))
+        self.assertEqual((range(0, 9), 9), (self.builder.uploads[0][1], len(self.tex.levels)))
+
+# TestTextureAtlas
+class TestTextureAtlas(TestCase):
+    class Builder(TestTextureManager.Builder):
+        def __init__(self): super().__init__(); self.atlases = []; self.blits = []
+        def createAtlasTexture(self, width, height, layers): self.atlases.append((width, height, layers)); return self.createSolidTexture(width, height, None)
+        def updateAtlasTexture(self, atlas, layer, x, y, tex): self.blits.append((atlas, layer, x, y)); return tex.width != 13
+
+    def test_packer(self):
+        packer = SkylinePacker(64, 64); rng = np.random.default_rng(0); rects = []
+        while (z := packer.insert(w := int(rng.integers(1, 17)), h := int(rng.integers(1, 17)))): rects.append((*z, w, h))
+        grid = np.zeros((64, 64), dtype=int)
+        for x, y, w, h in rects: grid[y:y + h, x:x + w] += 1
+        self.assertLessEqual(grid.max(), 1)
+        self.assertEqual((len(rects), int(grid.sum())), (packer.count, packer.used))
+        self.assertGreater(packer.used, 64 * 64 * .6)
+        x, y, w, h = rects[0]; packer.remove(x, y, w, h)
+        self.assertEqual((x, y), packer.insert(w, h))
+        for x, y, w, h in rects: packer.remove(x, y, w, h)
+        self.assertEqual(([[0, 0, 64]], 0), (packer.skyline, packer.count))
+    def test_atlas(self):
+        builder = self.Builder(); atlas = TextureAtlas(builder, 64, 64, layers=2, maxSize=32)
+        a = atlas.add('a', TestTextureManager.Texture(30, 30))
+        self.assertEqual((1, 0, 1, 1), (a.texture, a.layer, a.x, a.y))
+        self.assertEqual((30 / 64, 30 / 64, 1 / 64, 1 / 64), a.uv)
+        self.assertIs(a, atlas.add('a', None))
+        self.assertIsNone(atlas.add('big', TestTextureManager.Texture(40, 8)))
+        regions = [atlas.add(s, TestTextureManager.Texture(30, 30)) for s in 'bcdefghi']
+        self.assertEqual([(1, 0)] * 4 + [(1, 1)] * 4 + [(2, 0)], [(s.texture, s.layer) for s in [a] + regions])
+        self.assertEqual([(64, 64, 2), (64, 64, 2)], builder.atlases)
+        atlas.remove('i')
+        self.assertEqual(([2], 1), (builder.deleted, len(atlas.pages)))
+        atlas.remove('b')
+        self.assertEqual((30 / 64, 30 / 64, 33 / 64, 1 / 64), atlas.add('j', TestTextureManager.Texture(30, 30)).uv)
+    def test_failedUpload(self):
+        builder = self.Builder(); atlas = TextureAtlas(builder, 64, 64, maxSize=32)
+        # a texture the builder can't blit takes no region, and its new page is given back
+        self.assertEqual((None, 0, 0, [1]), (atlas.add('a', TestTextureManager.Texture(13, 13)), len(atlas), len(atlas.pages), builder.deleted))
+        b = atlas.add('b', TestTextureManager.Texture(8, 8)); self.assertIsNone(atlas.add('c', TestTextureManager.Texture(13, 13)))
+        self.assertEqual((1, 1, 100), (len(atlas), atlas.pages[0][1][0].count, atlas.pages[0][1][0].used))
+        self.assertIs(b, atlas.get('b'))
+    def test_createRegion(self):
+        builder = self.Builder(); manager = TextureManager(builder); manager.atlas = TextureAtlas(builder)
+        class Source:
+            async def getAsset(self, type, path): return TestTextureManager.Texture(16, 16)
+        source = Source()
+        async def run(): return await manager.createRegion(source, 'a'), await manager.createRegion(source, 'a')
+        a, b = asyncio.run(run())
+        self.assertIs(a, b)
+        self.assertEqual(1, len(builder.blits))
+        manager.deleteRegion(source, 'a')
+        self.assertEqual((0, [1]), (len(manager.atlas), builder.deleted))
+        manager = TextureManager(builder); manager.deleteRegion(source, 'a')
+        self.assertIsNone(asyncio.run(manager.createRegion(source, 'a')))
+
+# TestTerrainLayerManager
+class TestTerrainLayerManager(TestCase):
+    class Texture(TestTextureManager.Texture):
+        def __init__(self, pixels: np.ndarray): super().__init__(pixels.shape[1], pixels.shape[0]); self.pixels = pixels
+        def create(self, platform: str, func: callable) -> object: return func(gfx_texture.Texture_Bytes(self.pixels.tobytes(), (gfx_texture.TextureFormat.RGBA32, gfx_texture.TexturePixel.Unknown), None))
+
+    def test_normalMapPixels(self):
+        np.testing.assert_allclose([.5, .5, 1., 1.], normalMapPixels(np.zeros((4, 4)), 1.)[2, 2])
+        ramp = normalMapPixels(np.tile(np.arange(4.), (4, 1)), 1.)
+        self.assertLess(ramp[1, 1, 0], .5); self.assertAlmostEqual(.5, ramp[1, 1, 1])
+    def test_normalMap(self):
+        np.testing.assert_allclose([.5, .5, 1., 1.], TerrainLayerManager._normalMap(self.Texture(np.full((2, 4, 4), 255, dtype=np.uint8)))[1, 2], rtol=1e-5)
+        # block compressed: a red to blue DXT1 ramp has a slope across x
+        dxt1 = SimpleNamespace(width=4, height=4, mipMaps=1, create=lambda platform, func: func(gfx_texture.Texture_Bytes(np.array([0xF800, 0x001F, 0xE4E4, 0xE4E4], np.uint16).tobytes(), (gfx_texture.TextureFormat.DXT1, gfx_texture.TexturePixel.Unknown), None)))
+        z = TerrainLayerManager._normalMap(dxt1)
+        self.assertEqual((4, 4, 4), z.shape); self.assertGreater(z[1, 1, 0], .5)
+        self.assertIsNone(TerrainLayerManager._normalMap(SimpleNamespace(create=lambda platform, func: None)))
+    def test_generateError(self):
+        manager = TerrainLayerManager(TextureManager(TestTextureManager.Builder())); out = io.StringIO()
+        async def run():
+            manager._generate(GfxTerrainLayer(texture=1), SimpleNamespace(create=lambda platform, func: 1 / 0))
+            while not out.getvalue(): await asyncio.sleep(0.001)
+        with contextlib.redirect_stdout(out): asyncio.run(run())
+        self.assertIn('ZeroDivisionError', out.getvalue())
+        self.assertEqual(0, len(manager._uploads))
+
+    def test_createLayer(self):
+        builder = TestTextureManager.Builder(); textures = TextureManager(builder); manager = TerrainLayerManager(textures, budget=2)
+        tag = self.Texture(np.random.default_rng(0).integers(0, 255, (8, 8, 4), dtype=np.uint8))
+        async def run():
+            tex, _ = await textures.createTexture(None, tag)
+            layer = manager.createLayer(tex, tag, lambda tex: GfxTerrainLayer(texture=tex, smoothness=.3, metallic=.2))
+            self.assertIs(layer, manager.createLayer(tex, tag, None))
+            self.assertIsNone(layer.normalMapTexture)
+            while not manager._uploads: await asyncio.sleep(0.001)
+            return tex, layer
+        tex, layer = asyncio.run(run())
+        self.assertEqual(1, manager.drain())
+        self.assertEqual((2, 3), (layer.maskMapTexture, layer.normalMapTexture))
+        other = manager.createLayer(10, None, lambda tex: GfxTerrainLayer(texture=tex, smoothness=.3, metallic=.2))
+        self.assertEqual(layer.maskMapTexture, other.maskMapTexture)
+        textures.deleteTexture(None, tag)
+        self.assertEqual(([3, 1], 1), (builder.deleted, len(manager)))
+    def test_normalMapCache(self):
+        tag = self.Texture(np.random.default_rng(0).integers(0, 255, (8, 8, 4), dtype=np.uint8))
+        class Source:
+            async def getAsset(self, type, path): return tag
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = DiskCache(tmp); pixels = []
+            for s in range(2):
+                textures = TextureManager(TestTextureManager.Builder()); textures.diskCache = cache; manager = TerrainLayerManager(textures)
+                tex, _ = asyncio.run(textures.createTexture(Source(), 'a.dds'))
+                manager._generate(GfxTerrainLayer(texture=tex), tag)
+                pixels.append(manager._uploads[0][1])
+            self.assertEqual((1, 1), (cache.hits, cache.misses))
+            np.testing.assert_array_equal(pixels[0], pixels[1])
+
 if __name__ == "__main__":
-    main(verbosity=1)
\ No newline at end of file
+    main(verbosity=1)
@@ -1,5 +1,6 @@
 import numpy as np
 from unittest import TestCase, main
+from gfx_render import Raster
 # from gfx_ui import Camera
 
 # TestCamera
@@ -14,5 +15,45 @@ from unittest import TestCase, main
 #         self.assertAlmostEqual(-2.3561945, self.yaw)
     
 
+# TestRaster
+class TestRaster(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.source = rng.integers(0, 256, 64, dtype=np.uint8).tobytes()
+        self.palette3 = rng.integers(0, 256, 768, dtype=np.uint8).tobytes(); self.palette4 = rng.integers(0, 256, 1024, dtype=np.uint8).tobytes()
+
+    def test_blitByPalette(self):
+        for pbp, bbp, alpha in ((3, 4, None), (3, 4, self.source[0]), (3, 3, None), (4, 4, None), (4, 3, None)):
+            palette = self.palette3 if pbp == 3 else self.palette4
+            expected = bytearray()
+            for s in self.source:
+                expected += palette[s * pbp:s * pbp + min(pbp, bbp)]
+                if bbp == 4 and pbp == 3: expected.append(0x00 if s == alpha else 0xFF)
+            data = bytearray(len(self.source) * bbp)
+            Raster.blitByPalette(data, bbp, self.source, palette, pbp, alpha)
+            self.assertEqual(expected, data)
+    def test_expandPalette(self):
+        lut = Raster.paletteLut(self.palette3, 3, alpha=0); out = np.zeros(len(self.source) * 4 + 8, np.uint8)
+        z = Raster.expandPalette(self.source, lut, out)
+        self.assertTrue(np.shares_memory(z, out))
+        self.assertEqual((64, 4), z.shape)
+        with self.assertRaises(Exception): Raster.expandPalette(self.source, lut, bytearray(4))
+    def test_packed(self):
+        self.assertEqual([[255, 0, 0, 255], [0, 255, 0, 255], [0, 0, 255, 255], [132, 130, 132, 255]], Raster.rgb565ToRgba(np.array([0xF800, 0x07E0, 0x001F, 0x8410], '<u2').tobytes()).tolist())
+        self.assertEqual([[255, 0, 0, 255], [0, 255, 0, 0], [0, 0, 255, 255]], Raster.bgra1555ToRgba(np.array([0xFC00, 0x03E0, 0x801F], '<u2').tobytes()).tolist())
+    def test_swizzle(self):
+        data = bytearray(b'\x01\x02\x03\x04\x05\x06\x07\x08')
+        self.assertEqual([[3, 2, 1, 4], [7, 6, 5, 8]], Raster.bgraToRgba(data).tolist())
+        self.assertEqual([[2, 3, 4, 1], [6, 7, 8, 5]], Raster.argbToRgba(bytes(data)).tolist())
+        Raster.bgraToRgba(data, data)
+        self.assertEqual(b'\x03\x02\x01\x04\x07\x06\x05\x08', bytes(data))
+    def test_premultiply(self):
+        data = np.array([[200, 100, 50, 255], [200, 100, 50, 128], [10, 20, 30, 0]], np.uint8)
+        z = Raster.premultiply(data)
+        self.assertEqual([[200, 100, 50, 255], [100, 50, 25, 128], [0, 0, 0, 0]], z.tolist())
+        self.assertEqual([[200, 100, 50, 255], [199, 100, 50, 128], [0, 0, 0, 0]], Raster.unpremultiply(z).tolist())
+        Raster.premultiply(data, data)
+        self.assertEqual(z.tolist(), data.tolist())
+
 if __name__ == "__main__":
     main(verbosity=1)
\ No newline at end of file
@@ -1,6 +1,9 @@
-import numpy as np
+import io, asyncio, tempfile, numpy as np
+from struct import pack
 from unittest import TestCase, main
-from gfx_texture import DDS_HEADER
+from openstk.core import BinaryReader, Writer, DiskCache
+from types import SimpleNamespace
+from gfx_texture import DDS_HEADER, FourCC, TextureFormat, TexturePixel, BlockDecoder, DecodedTexture, Texture_Bytes, texturePixels
 
 # TestDdsHeader
 class TestDdsHeader(TestCase):
@@ -12,18 +15,105 @@ class TestDdsHeader(TestCase):
         # self.assertEqual(-2.3561945, self.yaw)
         pass
     def test_read(self):
-        # self.assertEqual(-0.6154797, self.pitch)
-        # self.assertEqual(-2.3561945, self.yaw)
-        pass
+        data = pack('<I', DDS_HEADER.MAGIC) + pack('<7I44s8I5I', 124, 0x1007, 8, 8, 32, 0, 1, b'', 32, 0x4, FourCC.DXT1.value, 0, 0, 0, 0, 0, 0x1000, 0, 0, 0, 0) + bytes(32)
+        header, headerDxt10, format, bytes_ = DDS_HEADER.read(BinaryReader(io.BytesIO(data)))
+        self.assertEqual((8, 8), (header.dwWidth, header.dwHeight))
+        self.assertEqual(FourCC.DXT1, header.ddspf.dwFourCC)
+        self.assertIsNone(headerDxt10)
+        self.assertEqual(TextureFormat.DXT1, format[2][0])
+        self.assertEqual(32, len(bytes_))
+        self.assertEqual(data[4:128], DDS_HEADER._schema.pack(header))
+    def test_readSpans(self):
+        data = pack('<I', DDS_HEADER.MAGIC) + pack('<7I44s8I5I', 124, 0x1007, 8, 8, 32, 0, 4, b'', 32, 0x4, FourCC.DXT1.value, 0, 0, 0, 0, 0, 0x1000, 0, 0, 0, 0) + bytes(56)
+        header, _, format, spans = DDS_HEADER.readSpans(BinaryReader(io.BytesIO(data)))
+        self.assertEqual([range(128, 160), range(160, 168), range(168, 176), range(176, 184)], spans)
+    def test_readStream(self):
+        data = pack('<I', DDS_HEADER.MAGIC) + pack('<7I44s8I5I', 124, 0x1007, 8, 8, 32, 0, 4, b'', 32, 0x4, FourCC.DXT1.value, 0, 0, 0, 0, 0, 0x1000, 0, 0, 0, 0) + bytes(range(56))
+        tex = DDS_HEADER.readStream(BinaryReader(io.BytesIO(data)))
+        self.assertEqual((8, 8, 4, TextureFormat.DXT1), (tex.width, tex.height, tex.mipMaps, tex.format[0]))
+        asyncio.run(tex.loadLevels(range(2, 4)))
+        self.assertEqual([range(-1, -1)] * 2 + [range(0, 8), range(8, 16)], tex.create('GL', lambda x: x.spans))
+        self.assertEqual(bytes(range(40, 48)), tex.levels[2])
     def test_write(self):
-        # self.assertEqual(-0.6154797, self.pitch)
-        # self.assertEqual(-2.3561945, self.yaw)
-        pass
+        data = pack('<I', DDS_HEADER.MAGIC) + pack('<7I44s8I5I', 124, 0x1007, 4, 4, 16, 0, 1, b'', 32, 0x4, FourCC.DXT5.value, 0, 0, 0, 0, 0, 0x1000, 0, 0, 0, 0) + bytes(16)
+        header, headerDxt10, format, bytes_ = DDS_HEADER.read(BinaryReader(io.BytesIO(data)))
+        f = io.BytesIO()
+        with Writer(f, leaveOpen=True) as w: DDS_HEADER.write(w, header, headerDxt10, format, bytes_)
+        self.assertEqual(data, f.getvalue())
     def test_convertDxt3ToDtx5(self):
         # self.assertEqual(-0.6154797, self.pitch)
         # self.assertEqual(-2.3561945, self.yaw)
         pass
     
 
+# TestBlockDecoder
+class TestBlockDecoder(TestCase):
+    # the per-pixel decode of one block
+    def color(self, b: bytes, fourColor: bool) -> list:
+        c0, c1, bits = int.from_bytes(b[0:2], 'little'), int.from_bytes(b[2:4], 'little'), int.from_bytes(b[4:8], 'little')
+        def rgb(c: int) -> list: r, g, b = c >> 11, (c >> 5) & 63, c & 31; return [(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2), 255]
+        p0, p1 = rgb(c0), rgb(c1)
+        if fourColor or c0 > c1: palette = [p0, p1, [(2 * a + b + 1) // 3 for a, b in zip(p0, p1)], [(a + 2 * b + 1) // 3 for a, b in zip(p0, p1)]]
+        else: palette = [p0, p1, [(a + b) // 2 for a, b in zip(p0, p1)], [0, 0, 0, 0]]
+        return [palette[(bits >> 2 * i) & 3] for i in range(16)]
+    def alpha(self, b: bytes) -> list:
+        a0, a1, bits = b[0], b[1], int.from_bytes(b[2:8], 'little')
+        palette = [a0, a1] + ([((7 - i) * a0 + i * a1) / 7 for i in range(1, 7)] if a0 > a1 else [((5 - i) * a0 + i * a1) / 5 for i in range(1, 5)] + [0, 255])
+        return [int(np.rint(palette[(bits >> 3 * i) & 7])) for i in range(16)]
+
+    def test_decodeLevel(self):
+        rng = np.random.default_rng(0); data = rng.integers(0, 256, 16 * 4, dtype=np.uint8).tobytes()
+        dxt1 = BlockDecoder.decodeLevel(data, TextureFormat.DXT1A, 8, 16)
+        dxt5 = BlockDecoder.decodeLevel(data, TextureFormat.DXT5, 8, 8)
+        for i in range(4):
+            y, x = i // 2 * 4, i % 2 * 4
+            self.assertEqual(self.color(data[i * 8:i * 8 + 8], False), dxt1[y:y + 4, x:x + 4].reshape(16, 4).tolist())
+            b = data[i * 16:i * 16 + 16]; expected = [c[:3] + [a] for c, a in zip(self.color(b[8:], True), self.alpha(b[:8]))]
+            self.assertEqual(expected, dxt5[y:y + 4, x:x + 4].reshape(16, 4).tolist())
+        self.assertTrue((BlockDecoder.decodeLevel(data, TextureFormat.DXT1, 8, 16)[..., 3] == 255).all())
+    def test_formats(self):
+        block = pack('<2HI', 0xF800, 0x001F, 0xE4E4E4E4)
+        self.assertEqual([[255, 0, 0, 255], [0, 0, 255, 255], [170, 0, 85, 255], [85, 0, 170, 255]], BlockDecoder.decodeLevel(block, TextureFormat.DXT1, 4, 4)[0].tolist())
+        self.assertEqual((2, 2, 4), BlockDecoder.decodeLevel(block, TextureFormat.DXT1, 2, 2).shape)
+        dxt3 = BlockDecoder.decodeLevel(pack('<Q', 0xFEDCBA9876543210) + block, TextureFormat.DXT3, 4, 4)
+        self.assertEqual(list(range(0, 256, 17)), dxt3[..., 3].reshape(-1).tolist())
+        bc4 = pack('<2B6s', 0, 0x80, b'\xff' * 6)
+        self.assertEqual([255, 255, 255, 255], BlockDecoder.decodeLevel(bc4, TextureFormat.BC4, 4, 4)[0, 0].tolist())
+        self.assertEqual([255, 255, 255, 255], BlockDecoder.decodeLevel(pack('<2b6s', 127, -127, bytes(6)), TextureFormat.BC4, 4, 4, signed=True)[0, 0].tolist())
+        self.assertEqual([0, 255, 0, 255], BlockDecoder.decodeLevel(pack('<2B6s', 0, 0, bytes(6)) + pack('<2B6s', 255, 0, bytes(6)), TextureFormat.BC5, 4, 4)[0, 0].tolist())
+    def test_decodeTexture(self):
+        src = SimpleNamespace(width=8, height=8, mipMaps=4); block = pack('<2HI', 0xF800, 0x001F, 0)
+        x = Texture_Bytes(block * 7, (TextureFormat.DXT1, TexturePixel.Unknown), None)
+        self.assertTrue(BlockDecoder.canDecode(x.format))
+        z = BlockDecoder.decodeTexture(src, x, range(1, 4))
+        self.assertEqual((TextureFormat.RGBA32, TexturePixel.Unknown), z.format)
+        self.assertEqual([range(-1, -1), range(0, 64), range(64, 80), range(80, 84)], z.spans)
+        self.assertEqual(bytes([255, 0, 0, 255]) * 21, z.bytes)
+    def test_texturePixels(self):
+        class Texture:
+            width = 2; height = 2; mipMaps = 1
+            def __init__(self, data: bytes, format: TextureFormat): self.data = data; self.format = format
+            def create(self, platform: str, func: callable) -> object: return func(Texture_Bytes(self.data, (self.format, TexturePixel.Unknown), None))
+        self.assertEqual([[[3, 2, 1, 4]] * 2] * 2, texturePixels(Texture(bytes([1, 2, 3, 4]) * 4, TextureFormat.BGRA32)).tolist())
+        self.assertEqual([[[7, 7, 7, 255]] * 2] * 2, texturePixels(Texture(bytes([7]) * 4, TextureFormat.L8)).tolist())
+        self.assertEqual((2, 2, 4), texturePixels(Texture(pack('<2HI', 0xF800, 0x001F, 0), TextureFormat.DXT1)).shape)
+        self.assertIsNone(texturePixels(Texture(bytes(16), TextureFormat.BC6H)))
+    def test_decodedTexture(self):
+        block = pack('<2HI', 0xF800, 0x001F, 0); loads = []
+        src = SimpleNamespace(width=8, height=8, mipMaps=4, texFlags=2, create=lambda platform, func: func(Texture_Bytes(block * 7, (TextureFormat.DXT1, TexturePixel.Unknown), [range(0, 32), range(32, 40), range(40, 48), range(48, 56)])))
+        def load(): loads.append(1); return src
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = DiskCache(tmp)
+            a = asyncio.run(DecodedTexture.load(cache, None, 'a.dds', load)); b = asyncio.run(DecodedTexture.load(cache, None, 'a.dds', load))
+            self.assertEqual((1, 1), (len(loads), cache.hits))
+            self.assertEqual((8, 8, 4, 2), (b.width, b.height, b.mipMaps, b.texFlags))
+            self.assertEqual([range(0, 256), range(256, 320), range(320, 336), range(336, 340)], b.spans)
+            self.assertEqual(bytes([255, 0, 0, 255]) * 85, bytes(b.bytes))
+            self.assertEqual(bytes(a.bytes), bytes(b.create('GL', lambda x: x.bytes)))
+        rgba = SimpleNamespace(width=1, height=1, mipMaps=1, create=lambda platform, func: func(Texture_Bytes(bytes(4), (TextureFormat.RGBA32, TexturePixel.Unknown), None)))
+        bgra = SimpleNamespace(width=1, height=1, mipMaps=1, create=lambda platform, func: func(Texture_Bytes(bytes([1, 2, 3, 4]), (TextureFormat.BGRA32, TexturePixel.Unknown), None)))
+        self.assertEqual((None, None), (DecodedTexture.decode(rgba, True), DecodedTexture.decode(bgra)))
+        self.assertEqual(bytes([3, 2, 1, 4]), bytes(DecodedTexture.decode(bgra, True).bytes))
+
 if __name__ == "__main__":
     main(verbosity=1)
\ No newline at end of file
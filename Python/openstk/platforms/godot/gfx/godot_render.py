@@ -1,7 +1,7 @@
 from __future__ import annotations
 import os, numpy as np
 from panda3d.core import *
-from openstk.core import ISource, log, CellManager
+from openstk.core import ISource, log, CellManager, CachedQuery
 from openstk.gfx import GfX, Renderer
 from openstk.gfx.egin import AABB
 from openstk.platforms.panda3d.gfx.panda3d import GodotCellBuilder
@@ -76,7 +76,7 @@ class EngineRenderer(Renderer):
         # log.info(f'db: {self.db}')
         arc = self.db.archive
         self.gfx = arc.gfx
-        query = self.db.query
+        query = CachedQuery(self.db.query)
         self.engine = GodotOpenEngine(lambda queue: CellManager(query, queue, GodotCellBuilder(query, self.gfx)), False)
         self.engine.spawnPlayer(self.db)
 
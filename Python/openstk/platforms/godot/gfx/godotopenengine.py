@@ -33,6 +33,7 @@ class Panda3dOpenEngine:
         # The current cell can be null if the player is outside of the defined game world.
         if self.camera and (not self._cell or not self._cell.isInterior): await self.cellManager.updateCells(self.camera.location)
         await self.queue.run(Panda3dOpenEngine.desiredWorkTimePerFrame)
+        self.cellManager.drain(Panda3dOpenEngine.desiredWorkTimePerFrame)
 
     def _createPlayer(self, position: Vector3, rotation: quaternion) -> None:
         self.camera = position
@@ -1,7 +1,11 @@
 from __future__ import annotations
-import math, numpy as np
+import math, ctypes, numpy as np
+from time import perf_counter_ns
+from collections import deque
 from enum import Enum
 from OpenGL.GL import *
+from OpenGL.raw.GL.VERSION.GL_1_3 import glCompressedTexImage2D as glCompressedTexImage2DRaw
+from openstk.core.profiler import Metrics
 from openstk.gfx import Key, KeyboardState, MouseState, Renderer #, IOpenGLGfx
 from openstk.gfx.egin import Scene, Camera, DrawCall, MeshBatchRequest, RenderMaterial, RenderableMesh, IPickingTexture, Octree 
 
@@ -508,6 +512,66 @@ class GLRenderableMesh(RenderableMesh):
 
 #endregion
 
+#region Texture
+
+# GLPixelUploader - uploads texture mips through a ring of pixel unpack buffers. Each buffer is orphaned before it is mapped, so the
+# copy never waits on the gpu, and the driver transfers from it while the frame goes on; queued mips upload in drain() under a byte budget
+class GLPixelUploader:
+    ringSize: int = 4
+    budget: int = 4 * 1024 * 1024 # bytes per drain
+    immediateSize: int = 64 * 1024 # mips up to this upload when created
+    def __init__(self, ringSize: int = None, budget: int = None):
+        self.ringSize = ringSize or self.ringSize
+        self.budget = budget or self.budget
+        self._buffers: list[int] = None
+        self._next: int = 0
+        self._queue: deque[tuple] = deque()
+    def __len__(self) -> int: return len(self._queue)
+
+    def release(self) -> None:
+        self._queue.clear()
+        if self._buffers: glDeleteBuffers(len(self._buffers), self._buffers); self._buffers = None
+
+    # uploads a mip to the bound texture from a zero-copy view of its bytes
+    def texImage(self, level: int, compressed: bool, internalFormat: int, width: int, height: int, format: int, type: int, data: memoryview) -> None:
+        pixels = np.frombuffer(data, np.uint8)
+        if compressed: glCompressedTexImage2D(GL_TEXTURE_2D, level, internalFormat, width, height, 0, pixels)
+        else: glTexImage2D(GL_TEXTURE_2D, level, internalFormat, width, height, 0, format, type, pixels)
+
+    # queues a mip, smallest first: each upload lowers the texture's base level to the mip it lands
+    def queue(self, tex: int, level: int, compressed: bool, internalFormat: int, width: int, height: int, format: int, type: int, data: memoryview) -> None:
+        self._queue.append((tex, level, compressed, internalFormat, width, height, format, type, data))
+
+    def cancel(self, tex: int) -> None:
+        if any(s[0] == tex for s in self._queue): self._queue = deque(s for s in self._queue if s[0] != tex)
+
+    def _stage(self, data: memoryview) -> None:
+        if self._buffers is None: self._buffers = [glGenBuffers(1) for _ in range(self.ringSize)]
+        buffer = self._buffers[self._next]; self._next = (self._next + 1) % len(self._buffers)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, buffer)
+        glBufferData(GL_PIXEL_UNPACK_BUFFER, len(data), None, GL_STREAM_DRAW) # orphan
+        ptr = glMapBufferRange(GL_PIXEL_UNPACK_BUFFER, 0, len(data), GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_BUFFER_BIT | GL_MAP_UNSYNCHRONIZED_BIT)
+        ctypes.memmove(ptr, np.frombuffer(data, np.uint8).ctypes.data, len(data))
+        glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+
+    def drain(self, deadline: int = None) -> int:
+        n = 0; size = 0
+        while self._queue and size < self.budget and (deadline is None or perf_counter_ns() < deadline):
+            tex, level, compressed, internalFormat, width, height, format, type, data = self._queue.popleft()
+            with Metrics.span('texture.upload', bytes=len(data)):
+                self._stage(data)
+                glBindTexture(GL_TEXTURE_2D, tex)
+                if compressed: glCompressedTexImage2DRaw(GL_TEXTURE_2D, level, internalFormat, width, height, 0, len(data), None)
+                else: glTexImage2D(GL_TEXTURE_2D, level, internalFormat, width, height, 0, format, type, None)
+                glTexParameter(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, level)
+                glBindTexture(GL_TEXTURE_2D, 0)
+                glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+            Metrics.count('texture.uploadBytes', len(data))
+            n += 1; size += len(data)
+        return n
+
+#endregion
+
 #region Scene
 
 STRIDE = 4 * 7
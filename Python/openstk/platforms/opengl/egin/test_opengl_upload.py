@@ -0,0 +1,50 @@
+import sys, types, ctypes, importlib.util
+from unittest import TestCase, main, mock
+# the uploader runs against a recording gl, without PyOpenGL or a context
+if importlib.util.find_spec('OpenGL') is None:
+    for name in ('OpenGL', 'OpenGL.GL', 'OpenGL.raw', 'OpenGL.raw.GL', 'OpenGL.raw.GL.VERSION', 'OpenGL.raw.GL.VERSION.GL_1_3'): sys.modules[name] = types.ModuleType(name)
+    sys.modules['OpenGL.raw.GL.VERSION.GL_1_3'].glCompressedTexImage2D = None
+import opengl_render
+from opengl_render import GLPixelUploader
+
+# TestGLPixelUploader
+class TestGLPixelUploader(TestCase):
+    def setUp(self):
+        self.calls = []; self.mapped = []; self.buffers = 0
+        def record(name: str) -> callable: return lambda *args: self.calls.append((name, *args))
+        def glGenBuffers(n: int) -> int: self.buffers += 1; return self.buffers
+        def glMapBufferRange(target, offset: int, size: int, access: int) -> int: z = ctypes.create_string_buffer(size); self.mapped.append(z); return ctypes.addressof(z)
+        gl = {s: record(s) for s in ('glBindBuffer', 'glBufferData', 'glUnmapBuffer', 'glBindTexture', 'glTexImage2D', 'glTexParameter', 'glCompressedTexImage2D', 'glCompressedTexImage2DRaw', 'glDeleteBuffers')}
+        gl |= {s: s for s in ('GL_PIXEL_UNPACK_BUFFER', 'GL_STREAM_DRAW', 'GL_TEXTURE_2D', 'GL_TEXTURE_BASE_LEVEL')}
+        gl |= {'GL_MAP_WRITE_BIT': 1, 'GL_MAP_INVALIDATE_BUFFER_BIT': 2, 'GL_MAP_UNSYNCHRONIZED_BIT': 4, 'glGenBuffers': glGenBuffers, 'glMapBufferRange': glMapBufferRange}
+        self.enterContext(mock.patch.multiple(opengl_render, create=True, **gl))
+        self.uploader = GLPixelUploader(ringSize=2, budget=40)
+    def queue(self, tex: int, level: int, size: int, compressed: bool = False) -> None: self.uploader.queue(tex, level, compressed, 'RGBA8', 4, 4, 'RGBA', 'UBYTE', memoryview(bytes([level]) * size))
+    def uploads(self) -> list[tuple]:
+        return [(s[0], s[2], s[-1]) if s[0] == 'glTexImage2D' else (s[0], s[2], s[-2]) if s[0] == 'glCompressedTexImage2DRaw' else s[:1] + s[2:]
+            for s in self.calls if s[0] in ('glTexImage2D', 'glCompressedTexImage2DRaw', 'glTexParameter')]
+
+    def test_drain(self):
+        self.queue(1, 2, 16); self.queue(2, 0, 8); self.queue(1, 1, 32); self.queue(1, 0, 64, True)
+        self.uploader.cancel(2)
+        self.assertEqual((3, 2), (len(self.uploader), self.uploader.drain()))
+        self.assertEqual([('glTexImage2D', 2, None), ('glTexParameter', 'GL_TEXTURE_BASE_LEVEL', 2), ('glTexImage2D', 1, None), ('glTexParameter', 'GL_TEXTURE_BASE_LEVEL', 1)], self.uploads())
+        self.assertEqual([bytes([2]) * 16, bytes([1]) * 32], [s.raw for s in self.mapped])
+        self.calls.clear()
+        self.assertEqual((1, 0), (self.uploader.drain(), len(self.uploader)))
+        self.assertEqual([('glCompressedTexImage2DRaw', 0, 64), ('glTexParameter', 'GL_TEXTURE_BASE_LEVEL', 0)], self.uploads())
+        # the ring is reused round robin, each buffer orphaned before it is mapped
+        self.assertEqual([1], [s[2] for s in self.calls if s[0] == 'glBindBuffer' and s[2]])
+        self.assertEqual(('glBufferData', 'GL_PIXEL_UNPACK_BUFFER', 64, None, 'GL_STREAM_DRAW'), next(s for s in self.calls if s[0] == 'glBufferData'))
+    def test_deadline(self):
+        self.queue(1, 0, 16)
+        self.assertEqual((0, 1), (self.uploader.drain(deadline=0), len(self.uploader)))
+        self.uploader.release()
+        self.assertEqual((0, []), (len(self.uploader), self.calls))
+    def test_texImage(self):
+        self.uploader.texImage(0, True, 'DXT1', 4, 4, 0, 0, memoryview(bytes(8)))
+        name, target, level, internalFormat, width, height, border, pixels = self.calls[0]
+        self.assertEqual(('glCompressedTexImage2D', 0, 'DXT1', 8), (name, level, internalFormat, pixels.nbytes))
+
+if __name__ == "__main__":
+    main(verbosity=1)
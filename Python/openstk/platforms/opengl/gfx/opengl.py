@@ -1,11 +1,11 @@
 # @see https://pyopengl.sourceforge.net/documentation/manual-3.0/glGetProgram.html
 # @see https://github.com/jcteng/python-opengl-tutorial/blob/master/utils/textureLoader.py
 from __future__ import annotations
-import os, re
+import os, re, hashlib, ctypes
 from numpy import ndarray
 from importlib import resources
 from OpenGL.GL import *
-from openstk.core import CellManager, CellBuilder
+from openstk.core import CellManager, CellBuilder, DiskCache, Metrics
 from openstk.gfx import Shader
 
 # typedefs
@@ -28,6 +28,7 @@ class ShaderLoader:
     ShaderSeed: int = 0x13141516
     _cachedShaders: dict[int, Shader] = {}
     _shaderDefines: dict[str, list[str]] = {}
+    diskCache: DiskCache = None
     
     def _calculateShaderCacheHash(self, name: str, args: dict[str, bool]) -> int:
         b = [name]
@@ -49,16 +50,45 @@ class ShaderLoader:
             shaderCacheHash = self._calculateShaderCacheHash(shaderFileName, args)
             if shaderCacheHash in self._cachedShaders: return self._cachedShaders[shaderCacheHash]
 
-        # defines
-        defines = []
+        with Metrics.span('shader.create', name=name): return self._createShader(name, cache, shaderFileName, args)
 
+    def _createShader(self, name: str, cache: bool, shaderFileName: str, args: dict[str, bool]) -> Shader:
+        # sources
+        vertexSource = self.getShaderSource(f'{shaderFileName}.vert'); fragmentSource = self.getShaderSource(f'{shaderFileName}.frag')
+        vertexSource, fragmentSource, defines = self.preprocessVertexShader(vertexSource, args), self.updateDefines(fragmentSource, args), self.findDefines(vertexSource) + self.findDefines(fragmentSource)
+
+        # defines find render modes
+        renderModes = [k[RenderModeLength] for k in defines if k.startswith(RenderMode)]
+
+        # build shader
+        shader = Shader(glGetUniformLocation, glGetAttribLocation,
+            name = name,
+            parameters = args,
+            program = glCreateProgram(),
+            renderModes = renderModes)
+        diskCache = self.diskCache or DiskCache.current
+        binaryVersion = self._programBinaryVersion(vertexSource, fragmentSource) if diskCache else None
+        loaded = False
+        if binaryVersion:
+            with Metrics.span('shader.binary'): loaded = self._loadProgramBinary(diskCache, shader.program, shaderFileName, binaryVersion)
+        if not loaded:
+            if binaryVersion: glProgramParameteri(shader.program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+            with Metrics.span('shader.compile'): self._compileProgram(shader.program, name, vertexSource, fragmentSource)
+            Metrics.count('shader.compiles')
+            if binaryVersion: self._saveProgramBinary(diskCache, shader.program, shaderFileName, binaryVersion)
+
+        # cache shader
+        if cache:
+            self._shaderDefines[shaderFileName] = defines
+            newShaderCacheHash = self._calculateShaderCacheHash(shaderFileName, args)
+            self._cachedShaders[newShaderCacheHash] = shader
+            print(f'Shader {name}({', '.join(args.keys())}) compiled and linked succesfully')
+        return shader
+
+    def _compileProgram(self, program: int, name: str, vertexSource: str, fragmentSource: str) -> None:
         # vertex shader
         vertexShader = glCreateShader(GL_VERTEX_SHADER)
-        if True:
-            shaderSource = self.getShaderSource(f'{shaderFileName}.vert')
-            glShaderSource(vertexShader, self.preprocessVertexShader(shaderSource, args))
-            # defines: find defines supported from source
-            defines += self.findDefines(shaderSource)
+        glShaderSource(vertexShader, vertexSource)
         glCompileShader(vertexShader)
         shaderStatus = glGetShaderiv(vertexShader, GL_COMPILE_STATUS)
         if shaderStatus != 1:
@@ -67,46 +97,58 @@ class ShaderLoader:
 
         # fragment shader
         fragmentShader = glCreateShader(GL_FRAGMENT_SHADER)
-        if True:
-            shaderSource = self.getShaderSource(f'{shaderFileName}.frag')
-            glShaderSource(fragmentShader, self.updateDefines(shaderSource, args))
-            # defines: find render modes supported from source, take union to avoid duplicates
-            defines += self.findDefines(shaderSource)
+        glShaderSource(fragmentShader, fragmentSource)
         glCompileShader(fragmentShader)
         shaderStatus = glGetShaderiv(fragmentShader, GL_COMPILE_STATUS)
         if shaderStatus != 1:
             fsInfo = glGetShaderInfoLog(fragmentShader)
             raise Exception(f'Error setting up Fragment Shader "{name}": {fsInfo}')
 
-        # defines find render modes
-        renderModes = [k[RenderModeLength] for k in defines if k.startswith(RenderMode)]
-
-        # build shader
-        shader = Shader(glGetUniformLocation, glGetAttribLocation,
-            name = name,
-            parameters = args,
-            program = glCreateProgram(),
-            renderModes = renderModes)
-        glAttachShader(shader.program, vertexShader)
-        glAttachShader(shader.program, fragmentShader)
-        glLinkProgram(shader.program)
-        glValidateProgram(shader.program)
-        linkStatus = glGetProgramiv(shader.program, GL_LINK_STATUS)
+        # link
+        glAttachShader(program, vertexShader)
+        glAttachShader(program, fragmentShader)
+        glLinkProgram(program)
+        glValidateProgram(program)
+        linkStatus = glGetProgramiv(program, GL_LINK_STATUS)
         if linkStatus != 1:
-            linkInfo = glGetProgramInfoLog(shader.program)
+            linkInfo = glGetProgramInfoLog(program)
             raise Exception(f'Error linking shaders: {linkInfo} (link status = {linkStatus})')
-        glDetachShader(shader.program, vertexShader)
+        glDetachShader(program, vertexShader)
         glDeleteShader(vertexShader)
-        glDetachShader(shader.program, fragmentShader)
+        glDetachShader(program, fragmentShader)
         glDeleteShader(fragmentShader)
 
-        # cache shader
-        if cache:
-            self._shaderDefines[shaderFileName] = defines
-            newShaderCacheHash = self._calculateShaderCacheHash(shaderFileName, args)
-            self._cachedShaders[newShaderCacheHash] = shader
-            print(f'Shader {name}({', '.join(args.keys())}) compiled and linked succesfully')
-        return shader
+    #region Program Binary
+
+    # Program binaries are driver specific: the version keys on the renderer and driver as well as the preprocessed sources
+    @staticmethod
+    def _programBinaryVersion(vertexSource: str, fragmentSource: str) -> str:
+        driver = f'{glGetString(GL_VENDOR)}|{glGetString(GL_RENDERER)}|{glGetString(GL_VERSION)}'
+        return hashlib.sha1('\0'.join((driver, vertexSource, fragmentSource)).encode()).hexdigest()
+
+    @staticmethod
+    def _loadProgramBinary(diskCache: DiskCache, program: int, shaderFileName: str, version: str) -> bool:
+        if not (z := diskCache.get(None, shaderFileName, 'glsl', version)): return False
+        meta, data = z
+        try:
+            glProgramBinary(program, meta['format'], bytes(data), len(data))
+            if glGetProgramiv(program, GL_LINK_STATUS) == 1: return True
+        except Exception: pass
+        # the driver rejected the binary (updated since it was saved): drop it and compile
+        diskCache.remove(None, shaderFileName, 'glsl', version)
+        return False
+
+    @staticmethod
+    def _saveProgramBinary(diskCache: DiskCache, program: int, shaderFileName: str, version: str) -> None:
+        try:
+            size = glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH)
+            if not size: return
+            data = (ctypes.c_ubyte * size)(); length = GLsizei(); format = GLenum()
+            glGetProgramBinary(program, size, length, format, data)
+            diskCache.put(None, shaderFileName, bytes(data)[:length.value], {'format': format.value}, 'glsl', version)
+        except Exception: pass
+
+    #endregion
 
     # Preprocess a vertex shader's source to include the #version plus #defines for parameters
     def preprocessVertexShader(self, source: str, args: dict[str, bool]) -> str: return self.resolveIncludes(self.updateDefines(source, args))
@@ -3,7 +3,7 @@ import ctypes, asyncio
 from numpy import array, ones, float32, identity
 from enum import Enum
 from OpenGL.GL import *
-from openstk.core import ISource, log, CellManager
+from openstk.core import ISource, log, CellManager, CachedQuery
 from openstk.gfx import GfX, Renderer, ITextureFrames
 from openstk.gfx.egin import AABB, EginRenderer
 from openstk.platforms.opengl.egin import GLRenderMaterial
@@ -301,7 +301,8 @@ class EngineRenderer(EginRenderer):
         if self.engine: self.engine.dispose()
 
     def start(self) -> None:
-        self.engine = OpenGLOpenEngine(lambda queue: CellManager(self.db.query, queue, OpenGLCellBuilder(self.db.archive, self.db.query, self.gfx)), False)
+        query = CachedQuery(self.db.query)
+        self.engine = OpenGLOpenEngine(lambda queue: CellManager(query, queue, OpenGLCellBuilder(self.db.archive, query, self.gfx)), False)
         asyncio.run(self.engine.spawnPlayer(self.db))
 
     def update(self, deltaTime: float) -> None:
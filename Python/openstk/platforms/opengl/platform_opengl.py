@@ -4,8 +4,8 @@ from numpy import array, ones, zeros, float32
 from OpenGL.GL import *
 from OpenGL.GL.EXT import texture_compression_s3tc as s3tc
 from openstk.core import ISource, Platform
-from openstk.gfx import IOpenGfxSprite, IOpenGfxModel, IOpenGfxLight, IOpenGfxTerrain, Texture_Bytes, TextureFlags, TextureFormat, TexturePixel, ObjectModelBuilderBase, ObjectModelManager, MaterialBuilderBase, MaterialManager, ShaderBuilderBase, ShaderManager, TextureBuilderBase, TextureManager
-from openstk.platforms.opengl.egin import QuadIndexBuffer, GLMeshBufferCache, GLRenderMaterial
+from openstk.gfx import IOpenGfxSprite, IOpenGfxModel, IOpenGfxLight, IOpenGfxTerrain, Texture_Bytes, TextureFlags, TextureFormat, TexturePixel, BlockDecoder, texturePixels, ObjectModelBuilderBase, ObjectModelManager, MaterialBuilderBase, MaterialManager, ShaderBuilderBase, ShaderManager, TextureBuilderBase, TextureManager
+from openstk.platforms.opengl.egin import QuadIndexBuffer, GLMeshBufferCache, GLRenderMaterial, GLPixelUploader
 from openstk.platforms.opengl.gfx import ShaderDebugLoader
 from openstk.platforms.opengl.gfx.opengl import OpenGLX
 from openstk.platforms.system import SystemSfx
@@ -44,6 +44,11 @@ class OpenGLShaderBuilder(ShaderBuilderBase):
 # OpenGLTextureBuilder
 class OpenGLTextureBuilder(TextureBuilderBase):
     _defaultTexture: int = -1
+    asyncUpload: bool = False # upload mips larger than the uploader's immediateSize through pixel buffers, over later drains
+    def __init__(self):
+        self._atlasLayers: dict[int, int] = {}
+        self.uploader: GLPixelUploader = GLPixelUploader()
+
     @property
     def defaultTexture(self) -> int:
         if self._defaultTexture > -1: return self._defaultTexture
@@ -51,8 +56,11 @@ class OpenGLTextureBuilder(TextureBuilderBase):
         return self._defaultTexture
 
     def release(self) -> None:
+        self.uploader.release()
         if self._defaultTexture > -1: glDeleteTexture(self._defaultTexture); self._defaultTexture = -1
 
+    def drain(self, deadline: int = None) -> int: return self.uploader.drain(deadline)
+
     def _createDefaultTexture(self) -> int: return self.createSolidTexture(4, 4, array([
         0.9, 0.2, 0.8, 1.0,
         0.0, 0.9, 0.0, 1.0,
@@ -90,43 +98,63 @@ class OpenGLTextureBuilder(TextureBuilderBase):
         glBindTexture(GL_TEXTURE_2D, 0) # unbind texture
         return s
 
+    def createAtlasTexture(self, width: int, height: int, layers: int) -> int:
+        s = glGenTextures(1); target = GL_TEXTURE_2D_ARRAY if layers > 1 else GL_TEXTURE_2D
+        glBindTexture(target, s)
+        if layers > 1: glTexImage3D(target, 0, GL_RGBA8, width, height, layers, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+        else: glTexImage2D(target, 0, GL_RGBA8, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+        glTexParameter(target, GL_TEXTURE_MAX_LEVEL, 0)
+        glTexParameter(target, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameter(target, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameter(target, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameter(target, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glBindTexture(target, 0) # unbind texture
+        self._atlasLayers[s] = layers
+        return s
+
+    def updateAtlasTexture(self, atlas: int, layer: int, x: int, y: int, src: ITexture) -> bool:
+        pixels = texturePixels(src)
+        if pixels is None: return False
+        height, width = pixels.shape[:2]
+        if self._atlasLayers.get(atlas, 1) > 1:
+            glBindTexture(GL_TEXTURE_2D_ARRAY, atlas)
+            glTexSubImage3D(GL_TEXTURE_2D_ARRAY, 0, x, y, layer, width, height, 1, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
+            glBindTexture(GL_TEXTURE_2D_ARRAY, 0)
+        else:
+            glBindTexture(GL_TEXTURE_2D, atlas)
+            glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, width, height, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
+            glBindTexture(GL_TEXTURE_2D, 0)
+        return True
+
     def createTexture(self, reuse: int, src: ITexture, level2: range = None) -> int:
         @staticmethod
         def _lambdax(x: object) -> int:
             match x:
                 case Texture_Bytes():
+                    if self.decodeCompressed and BlockDecoder.canDecode(x.format): x = BlockDecoder.decodeTexture(src, x, level2)
                     tex = reuse if reuse != None else glGenTextures(1)
+                    if reuse != None: self.uploader.cancel(tex)
                     numMipMaps = max(1, src.mipMaps)
                     level = range(level2.start if level2 else 0, numMipMaps)
                     # bind
                     glBindTexture(GL_TEXTURE_2D, tex)
-                    if level.start > 0: glTexParameter(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, level.start)
+                    if level.start > 0 or reuse != None: glTexParameter(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, level.start)
                     glTexParameter(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, level.stop - 1)
                     bytes, fmt, spans = (x.bytes, x.format, x.spans)
-                    pixels = []
-                    # decode
-                    def compressedTexImage2D(tex: ITexture, level: range, internalFormat: int) -> bool:
-                        nonlocal pixels
-                        width = tex.width; height = tex.height
-                        if spans:
-                            for l in level:
-                                span = spans[l]
-                                if span and span[0] < 0: return False
-                                pixels = bytes[span.start:span.stop]
-                                glCompressedTexImage2D(GL_TEXTURE_2D, l, internalFormat, width >> l, height >> l, 0, pixels)
-                        else: glCompressedTexImage2D(GL_TEXTURE_2D, 0, internalFormat, width, height, 0, bytes)
-                        return True
-                    def texImage2D(tex: ITexture, level: range, internalFormat: int, format: int, type: int) -> bool:
-                        nonlocal pixels, spans
-                        width = tex.width; height = tex.height
-                        if spans:
-                            for l in level:
-                                span = spans[l]
-                                if span and span[0] < 0: return False
-                                pixels = bytes[span.start:span.stop]
-                                glTexImage2D(GL_TEXTURE_2D, l, internalFormat, width >> l, height >> l, 0, format, type, pixels)
-                        else: glTexImage2D(GL_TEXTURE_2D, 0, internalFormat, width, height, 0, format, type, bytes)
+                    data = memoryview(bytes) if bytes else None
+                    base = smallest = level.stop - 1 if spans else 0
+                    # decode: mips are views into bytes, smallest first so queued ones land in order; the smallest uploads at once, so the
+                    # texture is complete from the start
+                    def texImage(l: int, compressed: bool, internalFormat: int, format: int = 0, type: int = 0) -> bool:
+                        nonlocal base
+                        span = spans[l] if spans else range(0, len(data))
+                        if span.start < 0: return False
+                        width = max(1, src.width >> l); height = max(1, src.height >> l)
+                        if self.asyncUpload and l != smallest and len(span) > self.uploader.immediateSize: self.uploader.queue(tex, l, compressed, internalFormat, width, height, format, type, data[span.start:span.stop])
+                        else: self.uploader.texImage(l, compressed, internalFormat, width, height, format, type, data[span.start:span.stop]); base = min(base, l)
                         return True
+                    def compressedTexImage2D(tex: ITexture, level: range, internalFormat: int) -> bool: return all(texImage(l, True, internalFormat) for l in (reversed(level) if spans else [0]))
+                    def texImage2D(tex: ITexture, level: range, internalFormat: int, format: int, type: int) -> bool: return all(texImage(l, False, internalFormat, format, type) for l in (reversed(level) if spans else [0]))
                     # process
                     if not bytes: return self.defaultTexture
                     elif isinstance(fmt, tuple):
@@ -163,6 +191,7 @@ class OpenGLTextureBuilder(TextureBuilderBase):
                                 case _: raise Exception(f'Unknown format: {formatx}')
                             if not internalFormat or not texImage2D(src, level, internalFormat, format, type): return self.defaultTexture
                     else: raise Exception(f'Unknown format: {fmt}')
+                    if self.asyncUpload: glTexParameter(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, base)
                     # texture
                     if self.maxTextureMaxAnisotropy >= 4:
                         glTexParameter(GL_TEXTURE_2D, GL_TEXTURE_MAX_ANISOTROPY_EXT, self.maxTextureMaxAnisotropy)
@@ -178,7 +207,7 @@ class OpenGLTextureBuilder(TextureBuilderBase):
                 case _: raise Exception(f'Unknown x: {x}')
         return src.create('GL', _lambdax)
 
-    def deleteTexture(self, src: int) -> None: glDeleteTexture(src)
+    def deleteTexture(self, src: int) -> None: self.uploader.cancel(src); self._atlasLayers.pop(src, None); glDeleteTexture(src)
 
 # OpenGLMaterialBuilder
 class OpenGLMaterialBuilder(MaterialBuilderBase):
@@ -208,11 +237,11 @@ class OpenGLMaterialBuilder(MaterialBuilderBase):
         m.material.shaderName = 'vrf.error'
         return m
 
-    async def createMaterial(self, source: ISource, path: object) -> GLRenderMaterial:
+    async def createMaterial(self, source: ISource, path: object, owner: list = None) -> GLRenderMaterial:
         match path:
             case p if isinstance(path, MaterialShaderVProp):
                 m = GLRenderMaterial(MaterialShaderProp())
-                for tex in p.textureParams: m.textures[tex.key], _ = await self.textureManager.createTexture(source, f'{tex.Value}_c')
+                for tex in p.textureParams: m.textures[tex.key], _ = await self.textureManager.createTexture(source, f'{tex.Value}_c', owner=owner)
                 if 'F_SOLID_COLOR' in p.intParams and p.intParams['F_SOLID_COLOR'] == 1:
                     a = p.vectorParams['g_vColorTint']
                     m.textures['g_tColor'] = self.textureManager.buildSolidTexture(1, 1, a[0], a[1], a[2], a[3])
@@ -260,7 +289,7 @@ class OpenGLGfxSprite3D(IOpenGfxSprite):
 # OpenGLGfxModel
 class OpenGLGfxModel(IOpenGfxModel):
     def __init__(self):
-        self.textureManager: TextureManager = TextureManager(OpenGLTextureBuilder())
+        self.textureManager: TextureManager = TextureManager(OpenGLTextureBuilder(), streaming=True)
         self.materialManager: MaterialManager = MaterialManager(self.textureManager, OpenGLMaterialBuilder(self.textureManager))
         self.objectManager: ObjectModelManager = ObjectModelManager(self.materialManager, OpenGLObjectModelBuilder())
         self.shaderManager: ShaderManager = ShaderManager(OpenGLShaderBuilder())
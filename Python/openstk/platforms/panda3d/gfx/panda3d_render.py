@@ -1,7 +1,7 @@
 from __future__ import annotations
 import os, asyncio
 from panda3d.core import *
-from openstk.core import ISource, log, CellManager
+from openstk.core import ISource, log, CellManager, CachedQuery
 from openstk.gfx import GfX, Renderer
 from openstk.gfx.egin import AABB
 from openstk.platforms.panda3d.gfx.panda3d import Panda3dCellBuilder
@@ -90,7 +90,8 @@ class EngineRenderer(Renderer):
 
     def start(self) -> None:
         # log.info(f'db: {self.db}')
-        self.engine = Panda3dOpenEngine(lambda queue: CellManager(self.db.query, queue, Panda3dCellBuilder(self.db.archive, self.db.query, self.gfx)), False)
+        query = CachedQuery(self.db.query)
+        self.engine = Panda3dOpenEngine(lambda queue: CellManager(query, queue, Panda3dCellBuilder(self.db.archive, query, self.gfx)), False)
         asyncio.run(self.engine.spawnPlayer(self.db))
 
     def update(self, deltaTime: float) -> None:
@@ -35,6 +35,7 @@ class Panda3dOpenEngine:
         # if self.camera and (not self._cell or not self._cell.isInterior): await self.cellManager.updateCells(self.camera)
         if not self._cell or not self._cell.isInterior: await self.cellManager.updateCells(self.camera)
         await self.queue.run(Panda3dOpenEngine.desiredWorkTimePerFrame)
+        self.cellManager.drain(Panda3dOpenEngine.desiredWorkTimePerFrame)
 
     def _createPlayer(self, position: Vector3, rotation: quaternion) -> None:
         self.camera = position
@@ -200,10 +200,10 @@ class Panda3dMaterialBuilder(MaterialBuilderBase):
         m = MaterialPoly(Material(), {'Main': self.textureManager.terrainTexture})
         return m
 
-    async def createMaterial(self, source: ISource, path: object) -> MaterialPoly:
+    async def createMaterial(self, source: ISource, path: object, owner: list = None) -> MaterialPoly:
         match path:
             case p if isinstance(path, MaterialStdProp):
-                m = MaterialPoly(Material(), {k:(await self.textureManager.createTexture(source, v))[0] for k, v in p.textures.items() if k == 'Main' or k == 'Bump'})
+                m = MaterialPoly(Material(), {k:(await self.textureManager.createTexture(source, v, owner=owner))[0] for k, v in p.textures.items() if k == 'Main' or k == 'Bump'})
                 return m
             # case s if isinstance(path, MaterialShaderProp): return m
             case _: raise Exception(f'Unknown: {path}')
@@ -1,8 +1,9 @@
 from __future__ import annotations
 import traceback
+import pygame
 from numpy import ndarray, array, ones, zeros, float32
 from openstk.core import ISource, Platform
-from openstk.gfx import IOpenGfxModel, ObjectModelBuilderBase, ObjectModelManager, MaterialBuilderBase, MaterialManager, ShaderBuilderBase, ShaderManager, TextureManager, TextureBuilderBase
+from openstk.gfx import IOpenGfxModel, ITexture, texturePixels, ObjectModelBuilderBase, ObjectModelManager, MaterialBuilderBase, MaterialManager, ShaderBuilderBase, ShaderManager, TextureManager, TextureBuilderBase
 from openstk.platforms.pygame.gfx.pygame import PygameX
 from openstk.platforms.system import SystemSfx
 from openstk.client import IClientHost
@@ -36,6 +37,7 @@ class PygameShaderBuilder(ShaderBuilderBase):
 # PygameTextureBuilder
 class PygameTextureBuilder(TextureBuilderBase):
     _defaultTexture: int = -1
+    decodeCompressed: bool = True; convertFormats: bool = True
     @property
     def defaultTexture(self) -> int:
         if self._defaultTexture > -1: return self._defaultTexture
@@ -67,13 +69,15 @@ class PygameTextureBuilder(TextureBuilderBase):
         0.9, 0.2, 0.8, 1.0
         ], dtype = float32))
 
-    def createTexture(self, reuse: int, source: ITexture, level2: range = None) -> int:
-        pass
+    # pygame takes only uncompressed surfaces: block compressed textures decode on the cpu, packed ones convert to RGBA
+    def createTexture(self, reuse: int, source: ITexture, level2: range = None) -> object:
+        pixels = texturePixels(source, level2.start if level2 else 0)
+        return pygame.image.frombuffer(pixels, (pixels.shape[1], pixels.shape[0]), 'RGBA') if pixels is not None else self.defaultTexture
 
     def createSolidTexture(self, width: int, height: int, pixels: array) -> int:
         pass
 
-    def createNormalMap(self, source: int, strength: float) -> int: raise NotImplementedError()
+    def createNormalMapTexture(self, source: int, strength: float) -> int: raise NotImplementedError()
 
     def deleteTexture(self, texture: int) -> None: pass
 
@@ -0,0 +1,48 @@
+import os, tempfile
+from unittest import TestCase, main
+from openstk.core.cache import DiskCache
+
+# TestDiskCache
+class TestDiskCache(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory(); self.addCleanup(self.tmp.cleanup)
+        self.archive = os.path.join(self.tmp.name, 'data.bsa')
+        with open(self.archive, 'wb') as f: f.write(b'archive')
+        self.cache = DiskCache(os.path.join(self.tmp.name, 'cache'))
+
+    def test_roundtrip(self):
+        self.assertIsNone(self.cache.get(self.archive, 'a.dds'))
+        self.cache.put(self.archive, 'a.dds', b'payload', {'width': 4})
+        meta, data = self.cache.get(self.archive, 'a.dds')
+        self.assertEqual({'width': 4}, meta)
+        self.assertEqual(b'payload', bytes(data))
+        self.assertIsNone(self.cache.get(self.archive, 'a.dds', 'normal'))
+        self.assertEqual((1, 2), (self.cache.hits, self.cache.misses))
+    def test_configure(self):
+        self.addCleanup(setattr, DiskCache, 'current', DiskCache.current)
+        self.assertEqual(self.cache.path, DiskCache.configure(self.cache.path).path)
+        self.assertIsNone(DiskCache.configure(None))
+        self.assertEqual((self.archive, None), (DiskCache.archiveOf(type('Source', (), {'pakPath': self.archive})()), DiskCache.archiveOf(object())))
+    def test_stale(self):
+        self.cache.put(self.archive, 'a.dds', b'payload')
+        with open(self.archive, 'ab') as f: f.write(b'patched')
+        self.assertIsNone(self.cache.get(self.archive, 'a.dds'))
+        self.assertIsNone(DiskCache(self.cache.path, version='2').get(self.archive, 'a.dds'))
+    def test_corrupt(self):
+        self.cache.put(self.archive, 'a.dds', b'payload')
+        file = self.cache._file(self.cache.key(self.archive, 'a.dds'))
+        with open(file, 'r+b') as f: f.truncate(os.path.getsize(file) - 1)
+        self.assertIsNone(self.cache.get(self.archive, 'a.dds'))
+        with open(file, 'wb'): pass
+        self.assertIsNone(self.cache.get(self.archive, 'a.dds'))
+    def test_getOrCreate(self):
+        calls = []
+        def factory(): calls.append(1); return {'n': 1}, b'x' * 100
+        self.assertEqual(b'x' * 100, self.cache.getOrCreate(self.archive, 'b', factory)[1])
+        self.assertEqual(b'x' * 100, bytes(self.cache.getOrCreate(self.archive, 'b', factory)[1]))
+        self.assertEqual(1, len(calls))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get(self.archive, 'b'))
+
+if __name__ == "__main__":
+    main(verbosity=1)
@@ -0,0 +1,175 @@
+import asyncio, numpy as np
+from time import monotonic
+from types import SimpleNamespace
+from unittest import TestCase, main
+from openstk.core.poly.pool import CoroutineQueue
+from openstk.core.poly.poly import Int3
+from openstk.core.manager import CellManager, CachedQuery, CellPrefetcher, CellBuilder, CellBuilderX
+
+# TestCellBuilder
+class TestCellBuilder(TestCase):
+    def land(self, seed: int, vtex: bool = True) -> object:
+        rng = np.random.default_rng(seed)
+        return SimpleNamespace(heightOffset=float(rng.integers(-500, 500)), heights=rng.integers(-128, 128, 65 * 65).tolist(), vtex=rng.integers(0, 5, 256).tolist() if vtex else None)
+
+    # the per-sample loops decodeLands replaced
+    def decode(self, land: object) -> tuple:
+        heights = np.zeros((65, 65)); rowOffset = land.heightOffset
+        for y in range(65):
+            rowOffset += land.heights[y * 65]; heights[y, 0] = rowOffset * 8; colOffset = rowOffset
+            for x in range(1, 65): colOffset += land.heights[y * 65 + x]; heights[y, x] = colOffset * 8
+        minHeight, maxHeight = heights.min(), heights.max()
+        vtex = land.vtex or [0] * 256; texIndexs = np.zeros((16, 16), dtype=int)
+        for y in range(16):
+            for x in range(16): texIndexs[y, x] = vtex[(y // 4) * 64 + (x // 4) * 16 + (y % 4) * 4 + x % 4] - 1
+        return (heights - minHeight) / (maxHeight - minHeight), minHeight, maxHeight, texIndexs
+
+    def test_decodeLands(self):
+        lands = [self.land(s, s != 2) for s in range(4)]
+        heights, minHeights, maxHeights, texIndexs = CellBuilder.decodeLands(lands)
+        self.assertEqual((4, 65, 65), heights.shape)
+        for i, land in enumerate(lands):
+            expected = self.decode(land)
+            np.testing.assert_allclose(expected[0], heights[i])
+            self.assertEqual((expected[1], expected[2]), (minHeights[i], maxHeights[i]))
+            np.testing.assert_array_equal(expected[3], texIndexs[i])
+        self.assertTrue((texIndexs[2] == -1).all())
+    def test_flat(self):
+        heights, minHeight, maxHeight, _ = CellBuilder.decodeLand(SimpleNamespace(heightOffset=10., heights=[0] * 65 * 65, vtex=None))
+        self.assertEqual((80., 80.), (minHeight, maxHeight))
+        self.assertFalse(heights.any())
+
+# TestCellManager
+class TestCellManager(TestCase):
+    class Query:
+        radius = [2, 1]; world = 0
+        def __init__(self): self.lookups = []; self.batches = 0
+        def getCellId(self, point: tuple) -> Int3: return Int3(int(point[0] // 1), int(point[1] // 1), 0)
+        def findCells(self, cells: list) -> list:
+            self.batches += 1; self.lookups += cells
+            return [SimpleNamespace(gridId=s, isInterior=False) if s.x < 5 else None for s in cells]
+        def findLands(self, cells: list) -> list: return [None for s in cells]
+        def findCell(self, cell: Int3) -> object: return self.findCells([cell])[0]
+        def findLand(self, cell: Int3) -> object: return None
+    class Builder(CellBuilderX):
+        def __init__(self): self.visible = {}; self.destroyed = 0; self.streamed = []
+        def createContainers(self, name: str) -> tuple: return (name, name)
+        def coroutine(self, cell, land, obj, objectsObj, assets = None): yield None
+        def setVisible(self, src: object, visible: bool) -> None: self.visible[src] = visible
+        def destroy(self, src: object) -> None: self.destroyed += 1; self.visible.pop(src, None)
+        def streamCell(self, cell: object, distance: int) -> None: self.streamed.append((cell.obj, distance))
+
+    def setUp(self):
+        self.query = self.Query(); self.builder = self.Builder(); self.queue = CoroutineQueue()
+        self.manager = CellManager(self.query, self.queue, self.builder)
+    def update(self, x: int, y: int = 0) -> int: n = len(self.query.lookups); asyncio.run(self.manager.updateCells((x, y))); return len(self.query.lookups) - n
+
+    def test_updateCells(self):
+        self.assertEqual(25, self.update(0))
+        self.assertEqual(Int3(0, 0, 0), self.query.lookups[0])
+        self.assertEqual((25, 9), (len(self.manager.cells), sum(self.builder.visible.values())))
+        self.assertEqual(0, self.update(0))
+        self.assertEqual((5, 0), (self.update(1), self.builder.destroyed))
+        self.assertEqual((5, 5), (self.update(2), self.builder.destroyed))
+        # hysteresis: walking back reloads nothing
+        self.assertEqual((0, 5), (self.update(1), self.builder.destroyed))
+        self.assertEqual(set(range(-1, 5)), {s.x for s in self.manager.cells})
+        self.assertEqual(Int3(1, 0, 0), self.manager._points[self.queue.tasks[0]])
+        self.assertEqual({'cell 0,0,0', 'cell 1,0,0', 'cell 2,0,0', 'cell 0,1,0', 'cell 1,1,0', 'cell 2,1,0', 'cell 0,-1,0', 'cell 1,-1,0', 'cell 2,-1,0'}, {k for k, v in self.builder.visible.items() if v})
+        self.assertEqual(3, self.query.batches)
+    def test_missing(self):
+        self.update(3); self.assertEqual(20, len(self.manager.cells))
+        self.update(4); self.update(3)
+        self.assertEqual(30, len(self.query.lookups))
+        self.assertEqual(0, self.update(4))
+    def test_streamCells(self):
+        self.update(0)
+        self.assertEqual((25, 9), (len(self.builder.streamed), sum(1 for _, d in self.builder.streamed if d <= 1)))
+        self.update(0); self.assertEqual(25, len(self.builder.streamed))
+        # again once a cell loads more assets, or the center moves
+        self.manager.cells[Int3(1, 0, 0)].assets.append(SimpleNamespace(release=lambda: None)); self.update(0)
+        self.assertEqual(('cell 1,0,0', 1), self.builder.streamed[-1])
+        self.builder.streamed.clear(); self.update(1)
+        self.assertEqual(len(self.manager.cells), len(self.builder.streamed))
+
+        self.update(0)
+        self.manager.beginCell(Int3(0, 4, 0)); self.manager.beginCell(Int3(1, 0, 1))
+        # cells begun outside the plan still unload once past the margin, whatever their world
+        self.update(1); self.assertNotIn(Int3(0, 4, 0), self.manager.cells)
+        self.assertEqual({Int3(1, 0, 1)}, self.manager._strays)
+        self.update(5); self.assertNotIn(Int3(1, 0, 1), self.manager.cells)
+        self.assertEqual((set(), set()), (self.manager._strays, {s for s in self.manager.cells if abs(s.x - 5) > 3 or abs(s.y) > 3}))
+    def test_reset(self):
+        self.update(0); self.manager.destroyAllCells()
+        self.assertEqual((0, 25), (len(self.manager.cells), self.update(0)))
+
+# TestCachedQuery
+class TestCachedQuery(TestCase):
+    class Query:
+        world = 0; meterInUnits = 64.
+        def __init__(self): self.calls = []
+        def findAnyByName(self, name: str) -> object: self.calls.append(name); return None if name == 'missing' else SimpleNamespace(name=name, world=self.world)
+        def findLtex(self, index: int) -> object: self.calls.append(index); return SimpleNamespace(path=f'{index}.dds')
+
+    def test_findAnyByNames(self):
+        inner = self.Query(); query = CachedQuery(inner)
+        self.assertEqual(['a', 'b', 'a'], [s.name for s in query.findAnyByNames(['a', 'b', 'a'])])
+        self.assertEqual([None, 'b'], [s and s.name for s in query.findAnyByNames(['missing', 'b'])])
+        self.assertEqual(['a', 'b', 'missing'], inner.calls)
+        inner.world = 1
+        self.assertEqual(1, query.findAnyByName('a').world)
+        self.assertEqual((64., 4), (query.meterInUnits, len(inner.calls)))
+    def test_findLtex(self):
+        inner = self.Query(); query = CachedQuery(inner)
+        self.assertIs(query.findLtex(3), query.findLtex(3))
+        self.assertEqual([3], inner.calls)
+    def test_getCellRefs(self):
+        class Query(self.Query):
+            def findAnyByNames(self, names: list[str]) -> list[object]: self.calls.append(tuple(names)); return [self.findAnyByName(s) for s in names]
+        inner = Query()
+        builder = CellBuilder.__new__(CellBuilder); builder.query = CachedQuery(inner)
+        cell = SimpleNamespace(Xrefs=[SimpleNamespace(name=s) for s in ('a', 'b', 'a', 'a')])
+        self.assertEqual(['a', 'b', 'a', 'a'], [s.record.name for s in builder.getCellRefs(cell)])
+        builder.getCellRefs(cell)
+        self.assertEqual([('a', 'b'), 'a', 'b'], inner.calls)
+
+# TestCellPrefetcher
+class TestCellPrefetcher(TestCase):
+    class Builder(TestCellManager.Builder):
+        def __init__(self): super().__init__(); self.loads = {}; self.cancelled = []
+        def getCellAssets(self, cell, land) -> list: return [('texture', f'{cell.gridId.x}a'), ('object', f'{cell.gridId.x}b')]
+        def preload(self, kind: str, path: object) -> object:
+            if path not in self.loads: self.loads[path] = asyncio.get_running_loop().create_future()
+            return self.loads[path]
+        def cancelPreload(self, kind: str, path: object) -> bool: self.cancelled.append(path); self.loads.pop(path).cancel(); return True
+
+    def setUp(self):
+        self.query = TestCellManager.Query(); self.query.radius = [1, 1]; self.builder = self.Builder()
+        self.manager = CellManager(self.query, CoroutineQueue(), self.builder)
+        self.prefetcher = self.manager.prefetcher = CellPrefetcher(self.manager, radius=0, lookAhead=2., maxInFlight=1)
+
+    def test_update(self):
+        async def run():
+            self.assertEqual([], self.prefetcher.update((.5, .5), 0.))
+            self.assertEqual([Int3(3, 0, 0)], self.prefetcher.update((1.5, .5), 1.))
+            self.assertEqual((['3a'], 1), (list(self.builder.loads), self.prefetcher.inFlight))
+            self.builder.loads['3a'].set_result(None); await asyncio.sleep(0)
+            self.assertEqual((['3a', '3b'], 1), (list(self.builder.loads), self.prefetcher.inFlight))
+            # turning back cancels the load ahead
+            self.prefetcher.update((1.5, .5), 2.); self.prefetcher.update((.5, .5), 4.)
+            self.assertEqual(['3b'], self.builder.cancelled)
+            self.assertEqual([], list(self.prefetcher._cells))
+            await asyncio.sleep(0)
+            self.assertEqual(0, self.prefetcher.inFlight)
+        asyncio.run(run())
+    def test_updateCells(self):
+        async def run():
+            self.prefetcher.minSpeed = .5; self.prefetcher._positions.append((monotonic() - 1., np.array([-.5, .5])))
+            await self.manager.updateCells((.5, .5))
+            self.assertEqual([Int3(2, 0, 0)], list(self.prefetcher._cells))
+            await self.manager.updateCells((1.5, .5))
+            self.assertEqual([], self.builder.cancelled)
+        asyncio.run(run())
+
+if __name__ == "__main__":
+    main(verbosity=1)
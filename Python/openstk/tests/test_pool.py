@@ -0,0 +1,200 @@
+import io, asyncio, functools, operator, threading, time
+from unittest import TestCase, main
+from openstk.core.poly.pool import CancellationToken, parallelIter, parallelFor, GenericPool, SinglePool, StaticPool, AsyncCoroutineQueue, CoroutineQueue
+from openstk.core.poly.reader import BinaryReader
+
+# TestParallel
+class TestParallel(TestCase):
+    def __init__(self, method: str):
+        TestCase.__init__(self, method)
+
+    def test_ordered(self):
+        def _(i): time.sleep(0.001 * (i % 3)); return i * i
+        self.assertEqual([(i, i * i) for i in range(50)], list(parallelIter(0, 50, _, {'max': 4})))
+    def test_unordered(self):
+        self.assertEqual(list(range(1, 51)), sorted(s for _, s in parallelIter(0, 50, lambda i: i + 1, {'max': 4, 'ordered': False})))
+    def test_errors(self):
+        def _(i):
+            if i % 10 == 3: raise ValueError(i)
+            return i
+        results = []
+        with self.assertRaises(ExceptionGroup) as e:
+            for s in parallelIter(0, 30, _, {'max': 3}): results.append(s)
+        self.assertEqual([3, 13, 23], sorted(s.args[0] for s in e.exception.exceptions))
+        self.assertEqual(27, len(results))
+    def test_cancel(self):
+        cancel = CancellationToken(); count = 0
+        for i, _ in parallelIter(0, 1000, lambda i: time.sleep(0.001), {'max': 2, 'cancel': cancel}):
+            count += 1
+            if i == 5: cancel.cancel()
+        self.assertLess(count, 20)
+    def test_local(self):
+        data = bytes(range(100)); opened = []
+        def local(): r = BinaryReader(io.BytesIO(data)); opened.append(r); return r
+        def _(i, r: BinaryReader): return r.seek(i).readByte(), threading.get_ident()
+        results = list(parallelIter(0, 100, _, {'max': 3, 'local': local}))
+        self.assertEqual(list(range(100)), [s[0] for _, s in results])
+        self.assertEqual(len(opened), len(set(s[1] for _, s in results)))
+        self.assertTrue(all(r.f.closed for r in opened))
+    def test_process(self):
+        self.assertEqual([-i for i in range(20)], [s for _, s in parallelIter(0, 20, operator.neg, {'max': 2, 'executor': 'process'})])
+    def test_async(self):
+        async def _(i): await asyncio.sleep(0); return i * 2
+        self.assertEqual([i * 2 for i in range(10)], asyncio.run(parallelFor(0, 10, {'max': 3}, _)))
+        self.assertEqual([i * 3 for i in range(10)], asyncio.run(parallelFor(0, 10, {'max': 3}, lambda i: i * 3)))
+        self.assertEqual([i * 2 for i in range(10)], asyncio.run(parallelFor(0, 10, {'max': 3}, lambda i: _(i))))
+        self.assertEqual([i * 2 for i in range(10)], asyncio.run(parallelFor(0, 10, {'max': 3}, functools.partial(_))))
+        self.assertEqual([i * 4 for i in range(10)], asyncio.run(parallelFor(0, 10, {'max': 3, 'executor': 'thread'}, lambda i: i * 4)))
+    def test_asyncFailures(self):
+        async def cancel(i):
+            if i == 1: raise asyncio.CancelledError()
+            return i
+        class Abort(BaseException): pass
+        def fail(i):
+            if i == 1: raise Abort()
+            return i
+        with self.assertRaises(asyncio.CancelledError): asyncio.run(parallelFor(0, 3, {'max': 3}, cancel))
+        with self.assertRaises(BaseExceptionGroup) as e: asyncio.run(parallelFor(0, 3, {'max': 3}, fail))
+        self.assertIsInstance(e.exception.exceptions[0], Abort)
+
+# TestGenericPool
+class TestGenericPool(TestCase):
+    class Handle:
+        def __init__(self): self.closed = False; self.uses = 0
+        def close(self): self.closed = True
+    def __init__(self, method: str):
+        TestCase.__init__(self, method)
+
+    def test_reuse(self):
+        pool = GenericPool(self.Handle, reset=lambda s: setattr(s, 'uses', s.uses + 1), retainInPool=1)
+        a = pool.get(); b = pool.get()
+        pool.release(a); pool.release(b)
+        self.assertTrue(b.closed)
+        self.assertIs(a, pool.func(lambda s: s))
+        self.assertEqual({'hits': 1, 'misses': 2, 'waits': 0, 'evictions': 0, 'outstanding': 0, 'idle': 1, 'peak': 2}, pool.stats)
+        self.assertEqual(2, a.uses)
+    def test_bounded(self):
+        pool = GenericPool(self.Handle, maxSize=2); seen = set(); lock = threading.Lock(); active = [0, 0]
+        def _(i):
+            with pool.acquire() as s:
+                with lock: active[0] += 1; active[1] = max(active); seen.add(id(s))
+                time.sleep(0.002)
+                with lock: active[0] -= 1
+        list(parallelIter(0, 40, _, {'max': 8}))
+        self.assertEqual(2, active[1])
+        self.assertEqual(2, len(seen))
+        self.assertGreater(pool.stats['waits'], 0)
+        a = pool.get(); pool.get()
+        with self.assertRaises(TimeoutError): pool.get(timeout=0.01)
+    def test_async(self):
+        pool = GenericPool(self.Handle, maxSize=1)
+        async def _(i):
+            async with pool.acquire() as s: await asyncio.sleep(0.001); return s
+        async def run(): return await asyncio.gather(*[_(i) for i in range(5)])
+        self.assertEqual(1, len(set(map(id, asyncio.run(run())))))
+        self.assertEqual(0, pool.stats['outstanding'])
+    def test_asyncWaiters(self):
+        pool = GenericPool(self.Handle, maxSize=1)
+        async def _(i):
+            async with pool.acquire() as s: await asyncio.sleep(0); return threading.get_ident()
+        async def run():
+            threads = await asyncio.gather(*[_(i) for i in range(100)])
+            a = await pool.getAsync()
+            with self.assertRaises(TimeoutError): await pool.getAsync(timeout=0.01)
+            task = asyncio.ensure_future(pool.getAsync()); await asyncio.sleep(0); task.cancel()
+            await asyncio.sleep(0); pool.release(a)
+            return threads
+        self.assertEqual({threading.get_ident()}, set(asyncio.run(run())))
+        self.assertEqual((0, 1, 0), (pool.stats['outstanding'], pool.stats['idle'], len(pool._waiters)))
+    def test_evict(self):
+        pool = GenericPool(self.Handle, idleTimeout=0.01, check=lambda s: s.uses < 1)
+        a = pool.get(); pool.release(a); time.sleep(0.02)
+        self.assertIsNot(a, pool.get()); self.assertTrue(a.closed)
+        b = pool.get(); b.uses = 1; pool.release(b)
+        self.assertIsNot(b, pool.get()); self.assertTrue(b.closed)
+        self.assertEqual(1, pool.stats['evictions'])
+    def test_single(self):
+        single = self.Handle()
+        with SinglePool(single) as pool: pool.func(lambda s: s); self.assertFalse(single.closed)
+        self.assertTrue(single.closed)
+        self.assertIs(single, StaticPool(single).get())
+
+# TestCoroutineQueue
+class TestCoroutineQueue(TestCase):
+    def __init__(self, method: str):
+        TestCase.__init__(self, method)
+
+    def task(self, name: str, steps: int, log: list, sleep: float = 0):
+        for i in range(steps): time.sleep(sleep); log.append(name); yield None
+    def test_roundRobin(self):
+        queue = CoroutineQueue(); log = []
+        queue.add(self.task('a', 3, log)); queue.add(self.task('b', 2, log))
+        queue.run(1.)
+        self.assertEqual(['a', 'b', 'a', 'b', 'a'], log)
+        self.assertEqual(0, len(queue))
+    def test_priority(self):
+        queue = CoroutineQueue(); log = []
+        far = queue.add(self.task('far', 2, log), 2); queue.add(self.task('near', 2, log), 1)
+        queue.setPriority(far, 0)
+        queue.waitForAll()
+        self.assertEqual(['far', 'far', 'near', 'near'], log)
+    def test_cancel(self):
+        queue = CoroutineQueue(); log = []
+        a = queue.add(self.task('a', 3, log)); queue.add(self.task('b', 3, log))
+        queue.cancel(a); queue.run(1.)
+        self.assertEqual(['b'] * 3, log)
+    def test_budget(self):
+        queue = CoroutineQueue(); log = []; overruns = []
+        queue.onOverrun = lambda task, ns: overruns.append(ns)
+        slow = queue.add(self.task('slow', 5, log, 0.005)); queue.add(self.task('fast', 5, log))
+        queue.run(0.001)
+        self.assertEqual(['slow'], log)
+        self.assertEqual(1, len(overruns)); self.assertEqual(1, len(queue.overruns))
+        time_, steps = queue.stats(slow)
+        self.assertEqual(1, steps); self.assertGreaterEqual(time_, 5000000)
+        queue.run(0.001)
+        self.assertEqual(['slow', 'fast', 'slow'], log)
+    def test_async(self):
+        queue = AsyncCoroutineQueue(); log = []
+        async def task(name, steps):
+            for i in range(steps): await asyncio.sleep(0); log.append(name); yield None
+        async def run():
+            a = queue.add(task('a', 2)); queue.add(task('b', 2), -1)
+            await queue.waitFor(a); await queue.run(1.)
+        asyncio.run(run())
+        self.assertEqual(['a', 'a', 'b', 'b'], log)
+
+# TestAsyncLoader
+class TestAsyncLoader(TestCase):
+    def __init__(self, method: str):
+        TestCase.__init__(self, method)
+
+    def test_prefetch(self):
+        log = []
+        async def task(name):
+            log.append(name); yield None
+        async def run():
+            queue = AsyncCoroutineQueue(concurrency=2, maxInFlight=8); loads = {}
+            def prefetch(name): loads[name] = asyncio.ensure_future(asyncio.sleep(0.01 if name == 'slow' else 0)); return [loads[name]]
+            for name in ['slow', 'a', 'b']: queue.add(task(name), prefetch=lambda name=name: prefetch(name))
+            await queue.run(1.)
+            self.assertEqual((['a', 'slow'], 2), (sorted(loads), queue.inFlight))
+            await asyncio.sleep(0.001); await queue.run(1.)
+            self.assertEqual(['a'], log)
+            await asyncio.sleep(0.02); await queue.run(1.); await asyncio.sleep(0.001); await queue.run(1.)
+            self.assertEqual(['a', 'slow', 'b'], log)
+            self.assertEqual(0, len(queue))
+        asyncio.run(run())
+    def test_saturated(self):
+        async def task(): yield None
+        async def run():
+            queue = AsyncCoroutineQueue(concurrency=4, maxInFlight=2); event = asyncio.Event()
+            for i in range(3): queue.add(task(), prefetch=lambda: [event.wait(), event.wait()])
+            await queue.run(1.)
+            self.assertTrue(queue.saturated); self.assertEqual((3, 2), (len(queue), queue.inFlight))
+            event.set(); await queue.waitForAll()
+            self.assertEqual(0, len(queue))
+        asyncio.run(run())
+
+if __name__ == "__main__":
+    main(verbosity=1)
@@ -0,0 +1,60 @@
+import asyncio, json, os, tempfile
+from io import BytesIO
+from contextlib import nullcontext
+from unittest import TestCase, main
+from openstk.core import BinaryReader, MemoryReader, Histogram, Metrics
+
+# TestMetrics
+class TestMetrics(TestCase):
+    def setUp(self): Metrics.reset(); Metrics.enable(); self.addCleanup(Metrics.enable, False); self.addCleanup(Metrics.reset)
+
+    def test_disabled(self):
+        Metrics.enable(False)
+        self.assertIsInstance(Metrics.span('a'), nullcontext)
+        Metrics.count('a'); Metrics.observe('b', 1.)
+        self.assertEqual({'counters': {}, 'histograms': {}}, Metrics.toJson())
+    def test_histogram(self):
+        h = Histogram()
+        for s in (1., 2., 3., 100.): h.add(s)
+        self.assertEqual((4, 106., 1., 100.), (h.count, h.total, h.min, h.max))
+        self.assertEqual((4., 100.), (h.percentile(.5), h.percentile(.99)))
+    def test_spans(self):
+        with Metrics.span('texture.load', path='a.dds'):
+            with Metrics.span('texture.upload'): pass
+        with self.assertRaises(KeyError):
+            with Metrics.span('model.load'): raise KeyError()
+        Metrics.count('texture.bytes', 16); Metrics.count('texture.bytes', 16)
+        upload, load, model = Metrics.events
+        self.assertEqual(('texture.upload', 'texture', {'parent': 'texture.load'}), (upload['name'], upload['cat'], upload['args']))
+        self.assertEqual(({'path': 'a.dds'}, {'error': 'KeyError'}), (load['args'], model['args']))
+        z = Metrics.toJson()
+        self.assertEqual({'texture.bytes': 32}, z['counters'])
+        self.assertEqual(1, z['histograms']['texture.load']['count'])
+    def test_tasks(self):
+        async def load(name):
+            with Metrics.span(name): await asyncio.sleep(0)
+        async def run():
+            with Metrics.span('cell'): await asyncio.gather(load('a'), load('b'))
+        asyncio.run(run())
+        a, b, cell = sorted(Metrics.events, key=lambda s: s['name'])
+        self.assertEqual(('cell', 'cell'), (a['args']['parent'], b['args']['parent']))
+        self.assertNotEqual(a['tid'], b['tid'])
+    def test_save(self):
+        with Metrics.span('a'): pass
+        Metrics.count('b', 2)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'trace.json'); Metrics.save(path, trace=True)
+            with open(path) as f: z = json.load(f)
+        self.assertEqual(['X', 'C'], [s['ph'] for s in z['traceEvents']])
+    def test_reader(self):
+        with BinaryReader(BytesIO(b'\x01\x00\x00\x00abcd')) as r: r.readUInt32(); r.readBytes(2)
+        self.assertEqual({'reader.opens': 1, 'reader.bytes': 6}, Metrics.counters)
+    def test_memoryReader(self):
+        with MemoryReader(b'\0\0\0\0\x03abczz') as r:
+            r.skip(4)
+            self.assertEqual(('abc', 8), (r.readString(), r.tell()))
+            self.assertEqual((b'zz', 10), (bytes(r.readBytes(2)), r.tell()))
+        self.assertEqual({'reader.opens': 1, 'reader.bytes': 5}, Metrics.counters)
+
+if __name__ == "__main__":
+    main(verbosity=1)
@@ -0,0 +1,77 @@
+import io, os, tempfile
+import numpy as np
+from struct import pack
+from unittest import TestCase, main
+from openstk.core.poly.reader import BinaryReader, MemoryReader, StructView
+
+DATA = pack('<BhIfd', 7, -2, 0xDEADBEEF, 1.5, -0.25) + pack('>I', 0x01020304) + b'\x96\x01' + b'\x03abc' + b'tail'
+
+# TestMemoryReader
+class TestMemoryReader(TestCase):
+    def _verify(self, r: BinaryReader):
+        self.assertEqual(len(DATA), r.length)
+        self.assertEqual(7, r.readByte())
+        self.assertEqual(-2, r.readInt16())
+        self.assertEqual(0xDEADBEEF, r.readUInt32())
+        self.assertEqual(1.5, r.readSingle())
+        self.assertEqual(-0.25, r.readDouble())
+        self.assertEqual(0x01020304, r.readUInt32X(True))
+        self.assertEqual(150, r.readIntV7())
+        self.assertEqual('abc', r.readL8AString())
+        self.assertEqual(b'tail', bytes(r.peek(lambda s: s.readBytes(4))))
+        self.assertEqual(b'tail', bytes(r.readToEnd()))
+        self.assertTrue(r.atEnd())
+
+    def test_binaryReader(self): self._verify(BinaryReader(io.BytesIO(DATA)))
+    def test_bytes(self): self._verify(MemoryReader(DATA))
+    def test_readBytes(self):
+        r = MemoryReader(bytearray(DATA))
+        s = r.seek(len(DATA) - 4).readBytes(4)
+        self.assertIsInstance(s, memoryview)
+        self.assertEqual(b'tail', s.tobytes())
+    def test_mmap(self):
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, 'wb') as f: f.write(DATA)
+            with MemoryReader(open(path, 'rb')) as r: self._verify(r)
+        finally: os.remove(path)
+
+# Vertex
+class Vertex:
+    _struct = ('<3fH', 14)
+    def __init__(self, tuple): self.x, self.y, self.z, self.color = tuple
+
+# TestNArray
+class TestNArray(TestCase):
+    VERTS = [(float(i), i + .5, -i, i) for i in range(5)]
+    DATA = pack('<I', 5) + b''.join(pack('<3fH', *s) for s in VERTS)
+
+    def _verify(self, r: BinaryReader):
+        a = r.peek(lambda s: s.readL32NArray(Vertex))
+        self.assertEqual(5, len(a))
+        self.assertEqual(TestNArray.VERTS[3], a[3].item())
+        self.assertEqual((5, 3), r.peek(lambda s: s.readL32NArray('<3f')).shape)
+        h = r.peek(lambda s: s.readL32NArray(np.uint16))
+        self.assertEqual(np.uint16, h.dtype)
+        s = r.readL32SView(Vertex)
+        self.assertIsInstance(s, StructView)
+        self.assertEqual(4.5, s[4].y)
+        self.assertEqual([0, 1, 2, 3, 4], [x.color for x in s])
+        self.assertTrue(r.atEnd())
+
+    def test_binaryReader(self): self._verify(BinaryReader(io.BytesIO(TestNArray.DATA)))
+    def test_memoryReader(self): self._verify(MemoryReader(TestNArray.DATA))
+    def test_readSArray(self):
+        s = BinaryReader(io.BytesIO(TestNArray.DATA)).readL32SArray(Vertex)
+        self.assertEqual([2., 2.5, -2., 2], [s[2].x, s[2].y, s[2].z, s[2].color])
+    def test_empty(self):
+        self.assertEqual(0, len(MemoryReader(b'').readNArray(np.float32, 0)))
+        self.assertEqual(0, len(BinaryReader(io.BytesIO(b'')).readNArray(np.float32, 0)))
+    def test_strided(self):
+        for r in (BinaryReader(io.BytesIO(np.arange(4, dtype=np.float32).tobytes())), MemoryReader(np.arange(4, dtype=np.float32).tobytes())):
+            obj = np.zeros((4, 2), dtype=np.float32); z = obj[:, 1]
+            self.assertIs(z, r.readNArray(np.float32, 4, obj=z))
+            self.assertEqual([[0, 0], [0, 1], [0, 2], [0, 3]], obj.tolist())
+
+if __name__ == "__main__":
+    main(verbosity=1)
@@ -0,0 +1,44 @@
+import io
+from enum import Enum
+from unittest import TestCase, main
+from openstk.core.poly.reader import BinaryReader, MemoryReader
+from openstk.core.poly.schema import schema
+from openstk.core.poly.writer import Writer
+
+class Kind(Enum): A = 1; B = 2
+
+# Record
+@schema('<IHh', 'id', 'kind', 'delta')
+class Record: pass
+
+# Remapped
+@schema('<I', 'kind')
+class Remapped:
+    def __init__(self, tuple): self.kind = Kind(tuple)
+
+# TestSchema
+class TestSchema(TestCase):
+    def test_record(self):
+        s = Record((1, 2, -3))
+        self.assertEqual(('id', 'kind', 'delta'), Record.__slots__)
+        self.assertFalse(hasattr(s, '__dict__'))
+        self.assertEqual(('<IHh', 8), Record._struct)
+        self.assertEqual(('id', 'kind', 'delta'), Record._schema.dtype.names)
+        self.assertEqual((1, 2, -3), Record._schema.tuple(Record._schema.unpack(Record._schema.pack(s))))
+    def test_readWrite(self):
+        f = io.BytesIO(); w = Writer(f)
+        w.writeS(Remapped, Remapped(2)); w.writeSArray(Record, [Record((i, i, -i)) for i in range(3)]); w.flush()
+        data = f.getvalue()
+        for r in [BinaryReader(io.BytesIO(data)), MemoryReader(data)]:
+            self.assertEqual(Kind.B, r.readS(Remapped).kind)
+            a = r.peek(lambda s: Record._schema.readArray(s, 3))
+            self.assertEqual([0, 1, 2], a['id'].tolist())
+            self.assertEqual([-0, -1, -2], [s.delta for s in r.readSArray(Record, 3)])
+    def test_writeArray(self):
+        f = io.BytesIO(); w = Writer(f)
+        a = Record._schema.readArray(MemoryReader(Record._schema.pack(Record((7, 1, 1))) * 2), 2)
+        w.writeSArray(Record, a); w.flush()
+        self.assertEqual(Record._schema.pack(Record((7, 1, 1))) * 2, f.getvalue())
+
+if __name__ == "__main__":
+    main(verbosity=1)
@@ -0,0 +1,79 @@
+import io, os, zlib
+from unittest import TestCase, main
+from openstk.core.stream import StreamIterators, ForwardStream, SeekableStream
+
+# TestSeekableStream
+class TestSeekableStream(TestCase):
+    def __init__(self, method: str):
+        TestCase.__init__(self, method)
+        self.data = os.urandom(10000)
+        self.pulls = 0
+
+    def blocks(self, size: int = 1000):
+        for i in range(0, len(self.data), size): self.pulls += 1; yield self.data[i:i+size]
+    def test_read(self):
+        s = SeekableStream(self.blocks(), len(self.data))
+        self.assertEqual(self.data[:1500], s.read(1500))
+        self.assertEqual(self.data[1500:], s.read())
+        self.assertEqual(b'', s.read(10))
+        s.seek(-10, io.SEEK_END)
+        self.assertEqual(self.data[-10:], s.read(100))
+    def test_readinto(self):
+        s = SeekableStream(self.blocks(333)); b = bytearray(2500)
+        s.seek(100)
+        self.assertEqual(2500, s.readinto(b))
+        self.assertEqual(self.data[100:2600], bytes(b))
+    def test_evict(self):
+        s = SeekableStream(self.blocks(), len(self.data), reopen=self.blocks, cacheSize=2000)
+        self.assertEqual(self.data[9000:], s.read()[-1000:])
+        self.assertEqual(2000, s._cached)
+        s.seek(500)
+        self.assertEqual(self.data[500:1500], s.read(1000))
+        self.assertEqual(12, self.pulls)
+    def test_keep(self):
+        s = SeekableStream(self.blocks(), cacheSize=2000)
+        s.seek(9500); s.read(10); s.seek(0)
+        self.assertEqual(self.data, s.read())
+        self.assertEqual(10, self.pulls)
+    def test_fromStream(self):
+        source = io.BytesIO(b'head' + bytes(s ^ 0x5a for s in self.data)); source.seek(4); ciphers = []
+        def stages(): ciphers.append(TestStreamIterators.Xor(0x5a)); return ciphers[-1:]
+        s = SeekableStream.fromStream(source, stages, len(self.data), cacheSize=2000, chunkSize=1000)
+        self.assertEqual(self.data[9000:], s.read()[-1000:])
+        self.assertLessEqual(s._cached, 2000)
+        s.seek(500)
+        self.assertEqual(self.data[500:1500], s.read(1000))
+        self.assertEqual(2, len(ciphers))
+        with self.assertRaises(Exception): SeekableStream.fromStream(ForwardStream(iter([])))
+
+# TestStreamIterators
+class TestStreamIterators(TestCase):
+    class Xor:
+        def __init__(self, key: int): self.key = key; self.calls = 0
+        def decrypt(self, data: bytes, output: bytearray = None) -> bytes:
+            self.calls += 1; z = bytes(s ^ self.key for s in data)
+            if output is None: return z
+            output[:] = z
+    def __init__(self, method: str):
+        TestCase.__init__(self, method)
+        self.data = os.urandom(100000)
+
+    def test_blocks(self):
+        blocks = list(StreamIterators.Blocks(io.BytesIO(self.data), 65536))
+        self.assertEqual([65536, 34464], [len(s) for s in blocks])
+        self.assertEqual(self.data, b''.join(blocks))
+    def test_cipher(self):
+        cipher = self.Xor(0x5a)
+        z = ForwardStream(StreamIterators.StreamCipher(io.BytesIO(self.data), cipher, 16384))
+        self.assertEqual(self.Xor(0x5a).decrypt(self.data[:10]), z.read(10))
+        self.assertEqual(self.Xor(0x5a).decrypt(self.data[10:]), z.read())
+        self.assertEqual(7, cipher.calls)
+    def test_pipeline(self):
+        data = self.Xor(0x33).decrypt(zlib.compress(self.data))
+        z = ForwardStream(StreamIterators.Pipeline(io.BytesIO(data), self.Xor(0x33), zlib.decompressobj(), chunkSize=4096))
+        b = bytearray(1000)
+        self.assertEqual(1000, z.readinto(b))
+        self.assertEqual(self.data, bytes(b) + z.read())
+
+if __name__ == "__main__":
+    main(verbosity=1)
@@ -0,0 +1,43 @@
+import io, numpy as np
+from unittest import TestCase, main
+from openstk.core.poly.reader import BinaryReader, MemoryReader
+from openstk.core.poly.writer import Writer
+
+# TestWriter
+class TestWriter(TestCase):
+    def __init__(self, method: str):
+        TestCase.__init__(self, method)
+
+    def write(self, action: callable, bufferSize: int = 65536) -> bytes:
+        f = io.BytesIO()
+        with Writer(f, leaveOpen=True, bufferSize=bufferSize) as w: action(w)
+        return f.getvalue()
+    def test_primitives(self):
+        def _(w):
+            w.writeByte(0xff); w.writeSByte(-2); w.writeInt16(-3); w.writeUInt16(4); w.writeInt32(-5); w.writeUInt32(6)
+            w.writeInt64(-7); w.writeUInt64(8); w.writeSingle(1.5); w.writeDouble(-2.25); w.writeUInt32E(0x01020304)
+            w.writeIntV7(300); w.writeUInt32X(9, endian=False)
+        for r in [BinaryReader(io.BytesIO(self.write(_))), MemoryReader(self.write(_, bufferSize=4))]:
+            self.assertEqual((0xff, -2, -3, 4, -5, 6), (r.readByte(), r.readSByte(), r.readInt16(), r.readUInt16(), r.readInt32(), r.readUInt32()))
+            self.assertEqual((-7, 8, 1.5, -2.25, 0x01020304), (r.readInt64(), r.readUInt64(), r.readSingle(), r.readDouble(), r.readUInt32E()))
+            self.assertEqual((300, 9), (r.readIntV7(), r.readUInt32X(endian=False)))
+            self.assertTrue(r.atEnd())
+    def test_strings(self):
+        def _(w): w.writeL8AString('abc'); w.writeL32UString('défg'); w.writeVAString('zz'); w.writeFAString('hi', 4)
+        r = MemoryReader(self.write(_))
+        self.assertEqual(('abc', 'défg', 'zz', 'hi'), (r.readL8AString(), r.readL32UString(), r.readVAString(), r.readFAString(4)))
+    def test_arrays(self):
+        a = np.arange(5, dtype='<u2')
+        def _(w): w.writeL32NArray('<H', a); w.writeL16PArray('<i', [1, -2, 3]); w.seek(0); w.writeUInt32(5)
+        r = MemoryReader(self.write(_))
+        self.assertEqual(a.tolist(), r.readL32NArray('<H').tolist())
+        self.assertEqual([1, -2, 3], r.readL16PArray(None, '<i'))
+    def test_positions(self):
+        f = io.BytesIO(); w = Writer(f, bufferSize=8)
+        w.writeUInt64(1); w.writeUInt16(2)
+        self.assertEqual(10, w.tell())
+        w.align(4)
+        self.assertEqual((12, 12), (w.tell(), w.length))
+
+if __name__ == "__main__":
+    main(verbosity=1)